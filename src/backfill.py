@@ -0,0 +1,161 @@
+"""
+保存済みのランキングページを再解析して履歴に登録するモジュール
+Amazonのページ構造の変更に合わせてセレクタを修正した後、過去のページからランキングを作り直す際に使用
+
+使用方法:
+  uv run python src/backfill.py --archive-dir snapshots
+  uv run python src/backfill.py --archive-dir snapshots --workers 4 --batch-size 100
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from config import config
+from history_manager import compute_ranking_fingerprint
+from history_store import HistoryStore, create_history_store
+from scraper import RANKING_PAGE_SIZE, ScraperError, get_kindle_ranking_from_html
+from snapshot_archive import SnapshotNotFoundError, load_snapshot, read_manifest
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BackfillStats:
+    """再解析の実行結果"""
+
+    pages: int = 0
+    parsed: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def _parse_snapshot(archive_dir: str, digest: str, fetched_at: str, limit: int) -> Optional[dict]:
+    """
+    保存済みのページを1件解析して履歴エントリを作成（ワーカープロセスで実行）
+
+    Returns:
+        履歴エントリ（解析に失敗した場合はNone）
+    """
+    try:
+        content = load_snapshot(archive_dir, digest)
+        _, ranking_data = get_kindle_ranking_from_html(content, limit=limit)
+    except (ScraperError, SnapshotNotFoundError, OSError) as e:
+        logging.getLogger(__name__).warning(f"ページの解析に失敗しました: {digest[:12]} ({str(e)})")
+        return None
+
+    return {
+        "timestamp": fetched_at,
+        "fingerprint": compute_ranking_fingerprint(ranking_data),
+        "rankings": ranking_data,
+    }
+
+
+def backfill_history(
+    archive_dir: str,
+    url: str,
+    limit: int,
+    workers: Optional[int] = None,
+    batch_size: int = 50,
+    store: Optional[HistoryStore] = None,
+) -> BackfillStats:
+    """
+    保存済みのページをプロセスプールで並列に再解析し、バッチ単位で履歴に登録する
+
+    Args:
+        archive_dir: ページの保存先ディレクトリ
+        url: 対象のランキングページURL（マニフェストのURLと一致するものだけを解析）
+        limit: 1ページあたりの取得件数
+        workers: ワーカープロセス数（Noneの場合はCPUコア数）
+        batch_size: 履歴にまとめて登録する件数
+        store: 登録先の履歴（Noneの場合は設定の保存先）
+
+    Returns:
+        実行結果
+    """
+    records = [record for record in read_manifest(archive_dir) if record.url == url]
+    stats = BackfillStats(pages=len(records))
+    if not records:
+        logger.info(f"再解析の対象となるページがありません: {url}")
+        return stats
+
+    owns_store = store is None
+    store = store or create_history_store()
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"{len(records)}ページを{workers}プロセスで再解析します...")
+
+    start_time = time.perf_counter()
+    batch = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                _parse_snapshot,
+                [archive_dir] * len(records),
+                [record.digest for record in records],
+                [record.fetched_at for record in records],
+                [limit] * len(records),
+                chunksize=max(1, len(records) // (workers * 4)),
+            )
+            for entry in results:
+                if entry is None:
+                    stats.failed += 1
+                    continue
+
+                stats.parsed += 1
+                batch.append(entry)
+                if len(batch) >= batch_size:
+                    store.add_snapshots(batch)
+                    store.flush()
+                    batch = []
+
+        store.add_snapshots(batch)
+        if not owns_store:
+            store.flush()
+    finally:
+        # 途中で失敗しても、作成した保存先は閉じる（登録済みのバッチは保存される）
+        if owns_store:
+            store.close()
+    stats.elapsed = time.perf_counter() - start_time
+
+    logger.info(
+        f"再解析が完了しました: {stats.parsed}/{stats.pages}ページ成功、{stats.failed}ページ失敗、"
+        f"{stats.elapsed:.2f}秒（{stats.pages_per_second:.1f}ページ/秒）"
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="保存済みのランキングページを再解析して履歴に登録")
+    parser.add_argument(
+        "--archive-dir", default=config.snapshot_archive_dir, help="ページの保存先（デフォルト: SNAPSHOT_ARCHIVE_DIR）"
+    )
+    parser.add_argument("--url", default=config.kindle_ranking_url, help="対象のランキングページURL")
+    parser.add_argument("--workers", type=int, help="ワーカープロセス数（デフォルト: CPUコア数）")
+    parser.add_argument("--batch-size", type=int, default=50, help="履歴にまとめて登録する件数（デフォルト: 50）")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, config.log_level),
+        format=config.log_format,
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+
+    if not args.archive_dir:
+        parser.error("--archive-dir または環境変数 SNAPSHOT_ARCHIVE_DIR を指定してください")
+
+    # 保存されているのは1ページ分なので、1ページの件数を上限にする
+    limit = min(config.kindle_ranking_limit, RANKING_PAGE_SIZE)
+    backfill_history(args.archive_dir, args.url, limit, workers=args.workers, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+ホストごとのサーキットブレーカーを管理するモジュール
+ブロックページなどの失敗が続いたホストへのリクエストを一定時間止め、
+クールダウン後は1件だけ試行して復旧を確認する
+"""
+
+import threading
+import time
+from typing import Optional
+
+from config import config
+
+_breakers: dict[str, "CircuitBreaker"] = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitBreaker:
+    """
+    サーキットブレーカー
+
+    closed: 通常どおりリクエストを許可する
+    open: クールダウンが終わるまでリクエストを許可しない
+    half_open: クールダウン後、結果が出るまで1件だけリクエストを許可する
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        """
+        Args:
+            failure_threshold: 回路を開くまでの連続失敗回数
+            cooldown_seconds: 回路を開いてから試行を再開するまでの秒数
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_reason: Optional[str] = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    def remaining_cooldown(self) -> float:
+        """クールダウンの残り秒数（回路が開いていない場合は0）"""
+        if self.state != self.OPEN or self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown_seconds - time.monotonic())
+
+    def allow_request(self) -> bool:
+        """リクエストを送ってよいかを判定（クールダウンが終わっていれば試行の1件を許可する）"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.remaining_cooldown() > 0:
+                return False
+            if self._trial_in_progress:
+                return False
+            self.state = self.HALF_OPEN
+            self._trial_in_progress = True
+            return True
+
+    def record_success(self) -> None:
+        """成功を記録して回路を閉じる"""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_progress = False
+
+    def release(self) -> None:
+        """成否を判定できなかったリクエストの試行枠を返す（状態は変えない）"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+            self._trial_in_progress = False
+
+    def record_failure(self, reason: str) -> None:
+        """失敗を記録（連続失敗が閾値に達した場合や試行が失敗した場合は回路を開く）"""
+        with self._lock:
+            self.failures += 1
+            self.last_reason = reason
+            self._trial_in_progress = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+def get_circuit_breaker(host: str) -> CircuitBreaker:
+    """ホストのサーキットブレーカーを取得（同じホストにはプロセス全体で同じものを返す）"""
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(config.circuit_breaker_threshold, config.circuit_breaker_cooldown)
+        return _breakers[host]
@@ -3,7 +3,7 @@
 """
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 @dataclass
@@ -13,10 +13,56 @@ class Config:
     # Kindle ランキング設定
     kindle_ranking_limit: int = 10
     kindle_ranking_url: str = "https://www.amazon.co.jp/gp/bestsellers/digital-text/2275256051/"
+    kindle_category_urls: list[str] = field(default_factory=list)
 
     # HTTP リクエスト設定
     request_timeout: int = 10
     max_retries: int = 3
+    max_concurrent_requests: int = 8
+    max_requests_per_host: int = 4
+    http_pool_connections: int = 10
+    http_pool_maxsize: int = 10
+    http_backoff_base: float = 1.0
+    http_backoff_max: float = 30.0
+    http_retry_budget: int = 10
+
+    # ホストごとのレート制限（リクエスト数/秒, バースト数）
+    rate_limits: dict[str, tuple[float, float]] = field(default_factory=lambda: {"www.amazon.co.jp": (2.0, 5.0)})
+
+    # ブロックページ（ロボット確認など）を検出したホストへのリクエストを止める設定
+    circuit_breaker_threshold: int = 1
+    circuit_breaker_cooldown: float = 600.0
+
+    # HTML パーサー設定（auto: lxmlがあれば使用し、なければhtml.parser）
+    html_parser_backend: str = "auto"
+    # 1ページで収まる件数の場合、ページを逐次読み込みながら解析し、必要な件数で受信を打ち切る
+    streaming_parse: bool = False
+
+    # 商品詳細（著者・出版社・発売日・カテゴリ）の取得設定
+    enable_detail_enrichment: bool = False
+    max_detail_requests: int = 4
+    detail_cache_file: str = "book_details_cache.json"
+    detail_cache_ttl_days: int = 30
+    detail_cache_max_entries: int = 2000
+
+    # ランキング履歴の保存先
+    # json: 直近3回分をJSONファイルに保存 / sqlite: 全件をSQLiteに保存 / log: 全件を追記専用のログに保存
+    history_backend: str = "json"
+    history_db_file: str = "ranking_history.db"
+    history_log_dir: str = "ranking_history_log"
+    # 追記専用ログの current.ndjson がこのバイト数を超えたら自動でコンパクションする（0の場合はしない）
+    history_log_compact_bytes: int = 1_048_576
+    # SQLiteの履歴の保存期間（日数）
+    # スナップショットはfull日分をそのまま残し、それより前は日ごと、dailyの日数より前は週ごとに集約する（0の場合は集約しない）
+    history_full_retention_days: int = 45
+    history_daily_retention_days: int = 365
+    # 変化の分析で比較する期間（何日前のランキングと比較するか）
+    diff_window_days: list[int] = field(default_factory=lambda: [1, 7, 30])
+    # 順位の推移の分析に使う履歴の最大件数
+    trajectory_history_limit: int = 90
+
+    # 取得したページのHTMLを保存するディレクトリ（空の場合は保存しない）
+    snapshot_archive_dir: str = ""
 
     # Discord WebHook 設定
     discord_webhook_url: str = ""
@@ -27,6 +73,26 @@ class Config:
     gemini_model: str = "gemini-2.5-pro"
     enable_gemini_summary: bool = True
     gemini_summary_ranking_limit: int = 5
+    # プロンプト全体の推定トークン数の上限（今回のランキングは優先度の高い書籍から収まるだけ含める、0の場合は全件）
+    gemini_prompt_token_budget: int = 1500
+    # メインのモデルが応答時間の予算（1回の実行全体の秒数）を超えた場合や失敗した場合に、
+    # 同時にリクエストを送る予備のモデル（空の場合は使わない）
+    gemini_fallback_model: str = "gemini-2.5-flash"
+    gemini_latency_budget_seconds: float = 30.0
+    # Gemini APIの接続先（空の場合は既定の接続先、テスト用のスタブサーバーやプロキシを使う場合に指定）
+    gemini_base_url: str = ""
+    # 複数カテゴリの要約を並行して生成する際のGemini APIの最大同時呼び出し数
+    gemini_max_concurrent_requests: int = 4
+    # 複数カテゴリの要約を1回のGemini API呼び出しでまとめて生成するか
+    gemini_batch_summaries: bool = False
+    # 同じプロンプトの要約を再利用するキャッシュ（空の場合はキャッシュしない）
+    summary_cache_file: str = "summary_cache.json"
+    summary_cache_ttl_hours: int = 24
+    summary_cache_max_entries: int = 100
+
+    # ランキングが前回と同じだった場合の通知方針
+    # full: 通常どおり要約して送信 / notify: 要約を省略して変動なしを送信 / skip: 何も送信しない
+    unchanged_ranking_policy: str = "notify"
 
     # ログ設定
     log_level: str = "INFO"
@@ -37,22 +103,123 @@ class Config:
         """環境変数から設定を読み込む"""
         return cls(
             kindle_ranking_limit=int(os.getenv("KINDLE_RANKING_LIMIT", "10")),
+            kindle_category_urls=_split_env_list(os.getenv("KINDLE_CATEGORY_URLS", "")),
+            max_concurrent_requests=int(os.getenv("MAX_CONCURRENT_REQUESTS", "8")),
+            max_requests_per_host=int(os.getenv("MAX_REQUESTS_PER_HOST", "4")),
+            http_pool_connections=int(os.getenv("HTTP_POOL_CONNECTIONS", "10")),
+            http_pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "10")),
+            http_retry_budget=int(os.getenv("HTTP_RETRY_BUDGET", "10")),
+            rate_limits=_parse_rate_limits(os.getenv("RATE_LIMITS", "www.amazon.co.jp=2:5")),
+            circuit_breaker_threshold=int(os.getenv("CIRCUIT_BREAKER_THRESHOLD", "1")),
+            circuit_breaker_cooldown=float(os.getenv("CIRCUIT_BREAKER_COOLDOWN", "600")),
+            html_parser_backend=os.getenv("HTML_PARSER_BACKEND", "auto"),
+            streaming_parse=os.getenv("STREAMING_PARSE", "false").lower() == "true",
+            enable_detail_enrichment=os.getenv("ENABLE_DETAIL_ENRICHMENT", "false").lower() == "true",
+            max_detail_requests=int(os.getenv("MAX_DETAIL_REQUESTS", "4")),
+            detail_cache_file=os.getenv("DETAIL_CACHE_FILE", "book_details_cache.json"),
+            detail_cache_ttl_days=int(os.getenv("DETAIL_CACHE_TTL_DAYS", "30")),
+            history_backend=os.getenv("HISTORY_BACKEND", "json").lower(),
+            history_db_file=os.getenv("HISTORY_DB_FILE", "ranking_history.db"),
+            history_log_dir=os.getenv("HISTORY_LOG_DIR", "ranking_history_log"),
+            history_log_compact_bytes=int(os.getenv("HISTORY_LOG_COMPACT_BYTES", "1048576")),
+            history_full_retention_days=int(os.getenv("HISTORY_FULL_RETENTION_DAYS", "45")),
+            history_daily_retention_days=int(os.getenv("HISTORY_DAILY_RETENTION_DAYS", "365")),
+            diff_window_days=[int(days) for days in _split_env_list(os.getenv("DIFF_WINDOW_DAYS", "1,7,30"))],
+            trajectory_history_limit=int(os.getenv("TRAJECTORY_HISTORY_LIMIT", "90")),
+            snapshot_archive_dir=os.getenv("SNAPSHOT_ARCHIVE_DIR", ""),
             discord_webhook_url=os.getenv("DISCORD_WEBHOOK_URL", ""),
             discord_thread_id=os.getenv("DISCORD_THREAD_ID"),
             gemini_api_key=os.getenv("GEMINI_API_KEY", ""),
             enable_gemini_summary=os.getenv("ENABLE_GEMINI_SUMMARY", "true").lower() == "true",
+            gemini_prompt_token_budget=int(os.getenv("GEMINI_PROMPT_TOKEN_BUDGET", "1500")),
+            gemini_fallback_model=os.getenv("GEMINI_FALLBACK_MODEL", "gemini-2.5-flash"),
+            gemini_latency_budget_seconds=float(os.getenv("GEMINI_LATENCY_BUDGET_SECONDS", "30")),
+            gemini_base_url=os.getenv("GEMINI_BASE_URL", ""),
+            gemini_max_concurrent_requests=int(os.getenv("GEMINI_MAX_CONCURRENT_REQUESTS", "4")),
+            gemini_batch_summaries=os.getenv("GEMINI_BATCH_SUMMARIES", "false").lower() == "true",
+            summary_cache_file=os.getenv("SUMMARY_CACHE_FILE", "summary_cache.json"),
+            summary_cache_ttl_hours=int(os.getenv("SUMMARY_CACHE_TTL_HOURS", "24")),
+            unchanged_ranking_policy=os.getenv("UNCHANGED_RANKING_POLICY", "notify").lower(),
             log_level=os.getenv("LOG_LEVEL", "INFO"),
         )
 
-    def validate(self) -> None:
-        """設定の妥当性を検証"""
-        if not self.discord_webhook_url:
+    def validate(self, require_webhook: bool = True, require_gemini_api_key: bool = True) -> None:
+        """
+        設定の妥当性を検証
+
+        require_webhook=Falseの場合はDiscord送信の設定を、require_gemini_api_key=Falseの場合はGemini APIキーを検証しない
+        """
+        if require_webhook and not self.discord_webhook_url:
             raise ValueError("環境変数 DISCORD_WEBHOOK_URL が設定されていません")
         if self.kindle_ranking_limit <= 0:
             raise ValueError("KINDLE_RANKING_LIMIT は1以上である必要があります")
-        if self.enable_gemini_summary and not self.gemini_api_key:
+        if self.max_concurrent_requests <= 0 or self.max_requests_per_host <= 0:
+            raise ValueError("MAX_CONCURRENT_REQUESTS と MAX_REQUESTS_PER_HOST は1以上である必要があります")
+        for host, (rate, burst) in self.rate_limits.items():
+            if rate <= 0 or burst < 1:
+                raise ValueError(
+                    f"RATE_LIMITS の {host} はリクエスト数/秒が0より大きく、バースト数が1以上である必要があります"
+                )
+        if self.circuit_breaker_threshold <= 0:
+            raise ValueError("CIRCUIT_BREAKER_THRESHOLD は1以上である必要があります")
+        if self.html_parser_backend not in ("auto", "lxml", "html.parser"):
+            raise ValueError("HTML_PARSER_BACKEND は auto / lxml / html.parser のいずれかである必要があります")
+        if self.history_backend not in ("json", "sqlite", "log"):
+            raise ValueError("HISTORY_BACKEND は json / sqlite / log のいずれかである必要があります")
+        if self.history_log_compact_bytes < 0:
+            raise ValueError("HISTORY_LOG_COMPACT_BYTES は0以上である必要があります")
+        if self.history_full_retention_days < 0 or self.history_daily_retention_days < 0:
+            raise ValueError("HISTORY_FULL_RETENTION_DAYS と HISTORY_DAILY_RETENTION_DAYS は0以上である必要があります")
+        if 0 < self.history_daily_retention_days < self.history_full_retention_days:
+            raise ValueError("HISTORY_DAILY_RETENTION_DAYS は HISTORY_FULL_RETENTION_DAYS 以上である必要があります")
+        # 集約したスナップショットは期間ごとの比較に使えないため、比較する期間はそのまま残す日数に収める
+        if (
+            self.history_backend == "sqlite"
+            and self.history_full_retention_days
+            and any(days > self.history_full_retention_days for days in self.diff_window_days)
+        ):
+            raise ValueError("DIFF_WINDOW_DAYS は HISTORY_FULL_RETENTION_DAYS 以下である必要があります")
+        if any(days <= 0 for days in self.diff_window_days):
+            raise ValueError("DIFF_WINDOW_DAYS は1以上の日数のカンマ区切りである必要があります")
+        if self.trajectory_history_limit < 0:
+            raise ValueError("TRAJECTORY_HISTORY_LIMIT は0以上である必要があります")
+        if self.unchanged_ranking_policy not in ("full", "notify", "skip"):
+            raise ValueError("UNCHANGED_RANKING_POLICY は full / notify / skip のいずれかである必要があります")
+        if self.gemini_prompt_token_budget < 0:
+            raise ValueError("GEMINI_PROMPT_TOKEN_BUDGET は0以上である必要があります")
+        if self.gemini_latency_budget_seconds < 0:
+            raise ValueError("GEMINI_LATENCY_BUDGET_SECONDS は0以上である必要があります")
+        if self.gemini_max_concurrent_requests <= 0:
+            raise ValueError("GEMINI_MAX_CONCURRENT_REQUESTS は1以上である必要があります")
+        if require_gemini_api_key and self.enable_gemini_summary and not self.gemini_api_key:
             raise ValueError("Gemini要約が有効ですが、環境変数 GEMINI_API_KEY が設定されていません")
 
 
+def _split_env_list(value: str) -> list[str]:
+    """カンマ区切りの環境変数をリストに変換（空要素は除外）"""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _parse_rate_limits(value: str) -> dict[str, tuple[float, float]]:
+    """
+    ホストごとのレート制限の環境変数を解析
+
+    Args:
+        value: "ホスト=リクエスト数/秒:バースト数" のカンマ区切り（例: "www.amazon.co.jp=2:5"）
+
+    Returns:
+        ホストをキーにした (リクエスト数/秒, バースト数) の辞書
+    """
+    limits = {}
+    for item in _split_env_list(value):
+        host, _, spec = item.partition("=")
+        rate, _, burst = spec.partition(":")
+        try:
+            limits[host.strip()] = (float(rate), float(burst) if burst else 1.0)
+        except ValueError as e:
+            raise ValueError(f"RATE_LIMITS の形式が正しくありません: {item}") from e
+    return limits
+
+
 # グローバル設定インスタンス
 config = Config.from_env()
@@ -0,0 +1,99 @@
+"""
+JSONファイルに保存するキャッシュを管理するモジュール
+エントリごとに有効期限（TTL）を持ち、最大件数を超えた場合は最も長く参照されていないものから削除する（LRU）
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """TTLとLRUによる削除を行うJSONファイルのキャッシュ"""
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int):
+        """
+        Args:
+            path: キャッシュファイルのパス
+            ttl_seconds: エントリの有効期限（秒）
+            max_entries: 保持する最大件数
+        """
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries: dict[str, dict] = self._load()
+
+    def _load(self) -> dict[str, dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f).get("entries", {})
+        except Exception as e:
+            logger.warning(f"キャッシュファイルの読み込みでエラー（空のキャッシュで続行）: {self.path}: {e}")
+            return {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        キャッシュから値を取得
+
+        参照日時はメモリ上だけで更新し、参照しただけではファイルを書き換えない
+        （次にエントリの追加・削除で保存する時に一緒に書き込む）
+
+        Returns:
+            キャッシュされた値（存在しない、または期限切れの場合はNone）
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry["stored_at"] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                    self._dirty = True
+                self.misses += 1
+                return None
+
+            entry["accessed_at"] = now
+            self.hits += 1
+            return entry["value"]
+
+    def set(self, key: str, value: Any) -> None:
+        """キャッシュに値を保存（最大件数を超えた場合は最も長く参照されていないエントリを削除）"""
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {"value": value, "stored_at": now, "accessed_at": now}
+            self._dirty = True
+            if len(self._entries) > self.max_entries:
+                overflow = len(self._entries) - self.max_entries
+                for old_key, _ in sorted(self._entries.items(), key=lambda item: item[1]["accessed_at"])[:overflow]:
+                    del self._entries[old_key]
+
+    def save(self) -> None:
+        """変更があればキャッシュファイルに保存（一時ファイルからの置き換えで書き込む）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            # 期限切れのエントリは保存しない
+            now = time.time()
+            self._entries = {
+                key: entry for key, entry in self._entries.items() if now - entry["stored_at"] <= self.ttl_seconds
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": self._entries}, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            self._dirty = False
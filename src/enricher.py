@@ -0,0 +1,148 @@
+"""
+ランキングの書籍に商品詳細（著者・出版社・発売日・カテゴリ）を追加するモジュール
+商品ページ（/dp/<ASIN>）を並行取得し、解析結果をASINごとにディスクへキャッシュする
+"""
+
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from bs4 import BeautifulSoup
+
+from config import config
+from disk_cache import DiskCache
+from history_manager import extract_asin
+from scraper import REQUEST_HEADERS, ScraperError, request_page, select_parser_backend
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_URL_TEMPLATE = "https://www.amazon.co.jp/dp/{asin}"
+
+# 登録情報の見出しに含まれる方向制御文字や区切り記号
+_LABEL_NOISE_PATTERN = re.compile(r"[\u200e\u200f:：\s]")
+
+
+@dataclass
+class BookDetails:
+    """商品ページから取得した書籍の詳細情報"""
+
+    author: Optional[str] = None
+    publisher: Optional[str] = None
+    release_date: Optional[str] = None
+    categories: list[str] = field(default_factory=list)
+
+
+def _clean_text(text: str) -> str:
+    return " ".join(text.replace("\u200e", "").replace("\u200f", "").split())
+
+
+def _extract_product_info(soup: BeautifulSoup) -> dict[str, str]:
+    """登録情報（見出しと値の組）を抽出"""
+    info = {}
+
+    # 箇条書き形式の登録情報（例: 「出版社 ‏ : ‎ 新潮社」）
+    for item in soup.select("#detailBullets_feature_div li span.a-list-item"):
+        label_span = item.find("span", class_="a-text-bold")
+        if not label_span:
+            continue
+        value_span = label_span.find_next_sibling("span")
+        if value_span:
+            info[_LABEL_NOISE_PATTERN.sub("", label_span.get_text())] = _clean_text(value_span.get_text())
+
+    # カルーセル形式の登録情報
+    for attribute in soup.select("[id^=rpi-attribute-book_details]"):
+        label = attribute.select_one(".rpi-attribute-label")
+        value = attribute.select_one(".rpi-attribute-value")
+        if label and value:
+            info.setdefault(_LABEL_NOISE_PATTERN.sub("", label.get_text()), _clean_text(value.get_text()))
+
+    return info
+
+
+def _parse_book_details(soup: BeautifulSoup) -> BookDetails:
+    """商品ページから書籍の詳細情報を抽出"""
+    authors = [_clean_text(a.get_text()) for a in soup.select("#bylineInfo .author a")]
+    authors = list(dict.fromkeys(author for author in authors if author))
+
+    info = _extract_product_info(soup)
+    breadcrumbs = soup.select("#wayfinding-breadcrumbs_feature_div ul li a")
+    categories = [_clean_text(a.get_text()) for a in breadcrumbs if a.get_text(strip=True)]
+
+    return BookDetails(
+        author="、".join(authors) if authors else None,
+        publisher=info.get("出版社"),
+        release_date=info.get("発売日") or info.get("出版日"),
+        categories=categories,
+    )
+
+
+def _fetch_book_details(asin: str) -> Optional[BookDetails]:
+    """
+    商品ページを取得して書籍の詳細情報を返す
+
+    Returns:
+        書籍の詳細情報（取得に失敗した場合はNone）
+    """
+    url = PRODUCT_URL_TEMPLATE.format(asin=asin)
+    try:
+        response = request_page(url, REQUEST_HEADERS)
+    except ScraperError as e:
+        logger.warning(f"商品ページの取得に失敗しました: {asin} ({str(e)})")
+        return None
+
+    return _parse_book_details(BeautifulSoup(response.content, select_parser_backend()))
+
+
+def enrich_rankings(
+    ranking_data: list[dict], cache: Optional[DiskCache] = None, max_workers: Optional[int] = None
+) -> list[dict]:
+    """
+    ランキングデータに書籍の詳細情報を追加する
+
+    キャッシュにない（または期限切れの）ASINだけを並行取得し、取得結果をキャッシュに保存する
+
+    Args:
+        ranking_data: ランキングデータ
+        cache: 詳細情報のキャッシュ（Noneの場合は設定のキャッシュファイルを使用）
+        max_workers: 商品ページの最大同時取得数（Noneの場合は設定値）
+
+    Returns:
+        author, publisher, release_date, categoriesを追加したランキングデータ
+    """
+    if cache is None:
+        cache = DiskCache(
+            config.detail_cache_file,
+            ttl_seconds=config.detail_cache_ttl_days * 24 * 60 * 60,
+            max_entries=config.detail_cache_max_entries,
+        )
+    max_workers = max_workers or config.max_detail_requests
+
+    details_by_asin: dict[str, dict] = {}
+    missing_asins = []
+    for item in ranking_data:
+        asin = extract_asin(item.get("url"))
+        if not asin or asin in details_by_asin or asin in missing_asins:
+            continue
+        cached = cache.get(asin)
+        if cached is not None:
+            details_by_asin[asin] = cached
+        else:
+            missing_asins.append(asin)
+
+    if missing_asins:
+        logger.info(f"商品詳細を取得します: {len(missing_asins)}件（キャッシュ済み{len(details_by_asin)}件）")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for asin, details in zip(missing_asins, executor.map(_fetch_book_details, missing_asins), strict=True):
+                if details is not None:
+                    details_by_asin[asin] = asdict(details)
+                    cache.set(asin, details_by_asin[asin])
+
+    try:
+        cache.save()
+    except OSError as e:
+        logger.warning(f"商品詳細のキャッシュの保存に失敗しました: {str(e)}")
+
+    empty_details = asdict(BookDetails())
+    return [{**item, **details_by_asin.get(extract_asin(item.get("url")), empty_details)} for item in ranking_data]
@@ -0,0 +1,222 @@
+"""
+ランキングの商品セルから各項目を抽出する戦略を管理するモジュール
+項目ごとに優先順の戦略（難読化されたクラス名 → クラス名の安定した部分・data属性 → 構造・aria属性）を持ち、
+ページのレイアウトごとに最後に成功した戦略を記憶して、次の解析ではその戦略から試す
+（最優先の戦略と同じ値を返す戦略以外は、最優先の戦略の次に試す代替の戦略の順序だけを記憶する）
+"""
+
+import hashlib
+import logging
+import re
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from bs4 import Tag
+
+logger = logging.getLogger(__name__)
+
+RATING_PATTERN = re.compile(r"5つ星のうち([0-9.]+)、([0-9,]+)件")
+_PRICE_TEXT_PATTERN = re.compile(r"^[￥¥][0-9,]+$")
+_DP_LINK_PATTERN = re.compile(r"/dp/([A-Z0-9]{10})")
+
+
+def _text(tag: Optional[Tag]) -> Optional[str]:
+    text = tag.get_text(strip=True) if tag else ""
+    return text or None
+
+
+def _text_of(tag_name: str, class_) -> Callable[[Tag], Optional[str]]:
+    """クラス名（文字列または正規表現）で見つけた要素のテキストを返す抽出関数を作成"""
+    return lambda item: _text(item.find(tag_name, class_=class_))
+
+
+def _image_alt(item: Tag) -> Optional[str]:
+    image = item.find("img", alt=True)
+    return (image.get("alt") or None) if image else None
+
+
+def _rating_from_label(label: Optional[str]) -> Optional[tuple[float, int]]:
+    match = RATING_PATTERN.search(label) if label else None
+    if not match:
+        return None
+    return float(match.group(1)), int(match.group(2).replace(",", ""))
+
+
+def _rating_from_icon_row(item: Tag) -> Optional[tuple[float, int]]:
+    rating_row = item.find("div", {"class": "a-icon-row"})
+    rating_link = rating_row.find("a") if rating_row else None
+    return _rating_from_label(rating_link.get("aria-label")) if rating_link else None
+
+
+def _rating_from_any_label(item: Tag) -> Optional[tuple[float, int]]:
+    tag = item.find(attrs={"aria-label": RATING_PATTERN})
+    return _rating_from_label(tag.get("aria-label")) if tag else None
+
+
+def _price_from_text(item: Tag) -> Optional[str]:
+    span = item.find("span", string=lambda text: bool(text and _PRICE_TEXT_PATTERN.match(text.strip())))
+    return _text(span)
+
+
+def _product_id_from_faceout(item: Tag) -> Optional[str]:
+    url_div = item.find("div", class_="p13n-sc-uncoverable-faceout")
+    return (url_div.get("id") or None) if url_div else None
+
+
+def _product_id_from_data_asin(item: Tag) -> Optional[str]:
+    parent_div = item.find("div", {"data-asin": True})
+    return (parent_div.get("data-asin") or None) if parent_div else None
+
+
+def _product_id_from_link(item: Tag) -> Optional[str]:
+    link = item.find("a", href=_DP_LINK_PATTERN)
+    return _DP_LINK_PATTERN.search(link["href"]).group(1) if link else None
+
+
+@dataclass(frozen=True)
+class Strategy:
+    """項目を抽出する戦略（抽出できなかった場合はNoneを返す）"""
+
+    name: str
+    extract: Callable[[Tag], Optional[Any]]
+    # 通常のページでは使われない代替の戦略か（使われた場合はページ構造の変化の兆候として警告する）
+    fallback: bool = False
+    # 最優先の戦略と同じ値を返すか（記憶した場合は最優先の戦略より先に試す）
+    same_value: bool = False
+
+
+# 項目ごとの戦略（先頭ほど優先）
+FIELD_STRATEGIES: dict[str, tuple[Strategy, ...]] = {
+    "title": (
+        Strategy("line_clamp_class", _text_of("div", "_cDEzb_p13n-sc-css-line-clamp-1_1Fn1y")),
+        Strategy("line_clamp_pattern", _text_of("div", re.compile(r"p13n-sc-css-line-clamp")), fallback=True),
+        Strategy("image_alt", _image_alt, fallback=True),
+    ),
+    "rating": (
+        Strategy("icon_row_aria_label", _rating_from_icon_row),
+        Strategy("any_aria_label", _rating_from_any_label, fallback=True),
+    ),
+    "price": (
+        Strategy("price_class", _text_of("span", "_cDEzb_p13n-sc-price_3mJ9Z")),
+        Strategy("price_pattern", _text_of("span", re.compile(r"p13n-sc-price")), fallback=True),
+        Strategy("color_price", _text_of("span", "a-color-price"), fallback=True),
+        Strategy("yen_text", _price_from_text, fallback=True),
+    ),
+    "product_id": (
+        Strategy("faceout_id", _product_id_from_faceout),
+        Strategy("data_asin", _product_id_from_data_asin, same_value=True),
+        Strategy("dp_link", _product_id_from_link, fallback=True, same_value=True),
+    ),
+}
+
+
+@dataclass
+class FieldStats:
+    """項目ごとの抽出結果の統計"""
+
+    attempts: int = 0
+    misses: int = 0
+    # 戦略名ごとの成功回数
+    hits: dict[str, int] = field(default_factory=dict)
+    # 代替の戦略で抽出できた回数
+    fallback_hits: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return (self.attempts - self.misses) / self.attempts if self.attempts else 0.0
+
+
+# (レイアウトの指紋, 項目名) ごとに最後に成功した戦略の位置
+_winners: dict[tuple[str, str], int] = {}
+_stats: dict[str, FieldStats] = {}
+_lock = threading.Lock()
+
+
+def layout_fingerprint(item: Tag) -> str:
+    """商品セルに含まれるクラス名の集合からレイアウトの指紋を作成"""
+    classes = set()
+    for tag in item.find_all(class_=True):
+        classes.update(tag.get("class", []))
+    return hashlib.sha1(" ".join(sorted(classes)).encode("utf-8")).hexdigest()[:12]
+
+
+def extract_field(name: str, item: Tag, layout: str) -> Optional[Any]:
+    """
+    項目を抽出（レイアウトで前回成功した戦略から試し、失敗したら優先順に残りの戦略を試す）
+
+    前回成功した戦略が最優先の戦略と異なる値を返しうる場合は、最優先の戦略を先に試す
+    （タイトルのないセルで画像の代替テキストが使われても、後のセルのタイトルの抽出は変わらない）
+
+    Args:
+        name: 項目名（FIELD_STRATEGIESのキー）
+        item: 商品セルの要素
+        layout: レイアウトの指紋
+
+    Returns:
+        抽出した値（どの戦略でも抽出できなかった場合はNone）
+    """
+    strategies = FIELD_STRATEGIES[name]
+    winner = _winners.get((layout, name), 0)
+    leads_primary = winner == 0 or strategies[winner].same_value
+    first = [winner] if leads_primary else [0, winner]
+    order = [*first, *(i for i in range(len(strategies)) if i not in first)]
+
+    for index in order:
+        value = strategies[index].extract(item)
+        if value is not None:
+            with _lock:
+                # 最優先の戦略の成功では、記憶した代替の戦略の順序を変えない
+                if index != winner and (index != 0 or leads_primary):
+                    _winners[(layout, name)] = index
+                stats = _stats.setdefault(name, FieldStats())
+                stats.attempts += 1
+                stats.hits[strategies[index].name] = stats.hits.get(strategies[index].name, 0) + 1
+                if strategies[index].fallback:
+                    stats.fallback_hits += 1
+            return value
+
+    with _lock:
+        stats = _stats.setdefault(name, FieldStats())
+        stats.attempts += 1
+        stats.misses += 1
+    return None
+
+
+def get_extraction_stats() -> dict[str, dict]:
+    """
+    項目ごとの抽出統計を取得
+
+    Returns:
+        項目名をキーにした辞書（attempts: 抽出回数、hit_rate: 抽出できた割合、
+        hits: 戦略名ごとの成功回数、fallback_hits: 代替の戦略で抽出できた回数）
+    """
+    with _lock:
+        return {
+            name: {
+                "attempts": stats.attempts,
+                "hit_rate": stats.hit_rate,
+                "hits": dict(stats.hits),
+                "fallback_hits": stats.fallback_hits,
+            }
+            for name, stats in _stats.items()
+        }
+
+
+def reset_extraction_stats() -> None:
+    """抽出統計と記憶した戦略をリセット"""
+    with _lock:
+        _stats.clear()
+        _winners.clear()
+
+
+def log_extraction_stats() -> None:
+    """項目ごとの抽出統計をログに出力（代替の戦略が使われた項目は警告する）"""
+    for name, stats in get_extraction_stats().items():
+        hits = "、".join(f"{strategy}={count}" for strategy, count in stats["hits"].items())
+        message = f"抽出統計 {name}: {stats['attempts']}件中{stats['hit_rate']:.0%}を抽出（{hits or 'なし'}）"
+        if stats["fallback_hits"]:
+            logger.warning(f"{message} - 代替の抽出方法が使われました。ページ構造が変わり始めている可能性があります")
+        else:
+            logger.info(message)
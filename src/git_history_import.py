@@ -0,0 +1,226 @@
+"""
+gitの履歴に残っている過去のランキング履歴ファイルを取り込むモジュール
+定期実行のたびにコミットされる ranking_history.json の各リビジョンを読み出し、
+タイムスタンプで重複を除いて全件保存の履歴（SQLite・追記専用ログ）に登録する
+
+使用方法:
+  HISTORY_BACKEND=sqlite uv run python src/git_history_import.py
+  HISTORY_BACKEND=sqlite uv run python src/git_history_import.py --file ranking_history.json --workers 4
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import history_manager
+from config import config
+from history_manager import decode_history
+from history_store import HistoryStore, JsonHistoryStore, create_history_store
+
+logger = logging.getLogger(__name__)
+
+# ファイルが削除されたコミットのblob
+_NULL_OID = "0" * 40
+
+
+class GitHistoryError(Exception):
+    """gitからの読み出しに失敗した場合のエラー"""
+
+    pass
+
+
+@dataclass
+class GitImportStats:
+    """取り込みの実行結果"""
+
+    revisions: int = 0
+    blobs: int = 0
+    failed: int = 0
+    snapshots: int = 0
+    elapsed: float = 0.0
+
+
+def _run_git(args: list[str], repo: str, input_data: Optional[bytes] = None) -> bytes:
+    try:
+        result = subprocess.run(["git", "-C", repo, *args], input=input_data, capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        stderr = getattr(e, "stderr", b"") or b""
+        raise GitHistoryError(f"gitの実行に失敗しました: git {' '.join(args)} {stderr.decode(errors='replace')}") from e
+    return result.stdout
+
+
+def list_revisions(path: str, repo: str = ".") -> list[tuple[str, str]]:
+    """
+    ファイルを変更したコミットとその時点のファイルのblobを取得
+
+    Args:
+        path: リポジトリ内のファイルパス
+        repo: リポジトリのディレクトリ
+
+    Returns:
+        (コミットのハッシュ, blobのハッシュ) のリスト（新しい順、ファイルを削除したコミットは除く）
+    """
+    output = _run_git(["log", "--format=commit %H", "--raw", "--no-abbrev", "--no-renames", "--", path], repo)
+    revisions = []
+    commit = None
+    for line in output.decode("utf-8").splitlines():
+        if line.startswith("commit "):
+            commit = line.split()[1]
+        elif line.startswith(":") and commit:
+            # :100644 100644 <変更前のblob> <変更後のblob> M\t<パス>
+            new_oid = line.split("\t", 1)[0].split()[3]
+            if new_oid != _NULL_OID:
+                revisions.append((commit, new_oid))
+    return revisions
+
+
+def read_blobs(oids: list[str], repo: str = ".") -> dict[str, bytes]:
+    """
+    blobの内容を1回のgit cat-fileでまとめて読み出す
+
+    Returns:
+        blobのハッシュをキーにした内容の辞書（読み出せなかったblobは含まない）
+    """
+    if not oids:
+        return {}
+    output = _run_git(["cat-file", "--batch"], repo, input_data="".join(f"{oid}\n" for oid in oids).encode())
+
+    blobs = {}
+    position = 0
+    while position < len(output):
+        header_end = output.index(b"\n", position)
+        header = output[position:header_end].decode().split()
+        position = header_end + 1
+        if len(header) < 3:
+            # "<オブジェクト> missing" など
+            logger.warning(f"blobを読み出せませんでした: {' '.join(header)}")
+            continue
+        size = int(header[2])
+        blobs[header[0]] = output[position : position + size]
+        # 内容の後ろに改行が1つ付く
+        position += size + 1
+    return blobs
+
+
+def _decode_revision(content: bytes) -> Optional[list[dict]]:
+    """
+    1リビジョン分の履歴ファイルを解析（ワーカープロセスで実行）
+
+    Returns:
+        履歴エントリのリスト（解析できなかった場合はNone）
+    """
+    try:
+        return decode_history(json.loads(content))
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        logging.getLogger(__name__).warning(f"履歴ファイルのリビジョンを解析できませんでした: {str(e)}")
+        return None
+
+
+def import_git_history(
+    path: str = history_manager.HISTORY_FILE,
+    repo: str = ".",
+    store: Optional[HistoryStore] = None,
+    workers: Optional[int] = None,
+    batch_size: int = 500,
+) -> GitImportStats:
+    """
+    gitの履歴にある履歴ファイルの全リビジョンを解析し、タイムスタンプで重複を除いて履歴に登録する
+
+    同じタイムスタンプのエントリは新しいリビジョンのものを使う。登録先でも同じタイムスタンプのエントリは置き換えるため、
+    再実行しても重複しない
+
+    Args:
+        path: リポジトリ内の履歴ファイルのパス
+        repo: リポジトリのディレクトリ
+        store: 登録先の履歴（Noneの場合は設定の保存先）
+        workers: 解析に使うワーカープロセス数（Noneの場合はCPUコア数）
+        batch_size: 履歴にまとめて登録する件数
+
+    Returns:
+        実行結果
+    """
+    start_time = time.perf_counter()
+    revisions = list_revisions(path, repo)
+    stats = GitImportStats(revisions=len(revisions))
+    if not revisions:
+        logger.info(f"gitの履歴に {path} のリビジョンがありません")
+        return stats
+
+    # 内容が同じリビジョン（blobが同じ）は1回だけ解析する
+    oids = list(dict.fromkeys(oid for _, oid in revisions))
+    blobs = read_blobs(oids, repo)
+    oids = [oid for oid in oids if oid in blobs]
+    stats.blobs = len(oids)
+
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"{stats.revisions}リビジョン（{stats.blobs}種類）を{workers}プロセスで解析します...")
+
+    entries: dict[str, dict] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            _decode_revision, [blobs[oid] for oid in oids], chunksize=max(1, len(oids) // (workers * 4))
+        )
+        # 新しいリビジョンから順に処理し、最初に見つかったエントリを残す
+        for history in results:
+            if history is None:
+                stats.failed += 1
+                continue
+            for entry in history:
+                entries.setdefault(entry["timestamp"], entry)
+
+    owns_store = store is None
+    store = store or create_history_store()
+    try:
+        ordered = sorted(entries.values(), key=lambda entry: entry["timestamp"])
+        for start in range(0, len(ordered), batch_size):
+            store.add_snapshots(ordered[start : start + batch_size])
+            store.flush()
+    finally:
+        if owns_store:
+            store.close()
+    stats.snapshots = len(entries)
+    stats.elapsed = time.perf_counter() - start_time
+
+    logger.info(
+        f"gitの履歴から取り込みました: {stats.snapshots}件（{stats.revisions}リビジョン、"
+        f"解析失敗{stats.failed}件）、{stats.elapsed:.2f}秒"
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gitの履歴にある過去のランキング履歴ファイルを取り込む")
+    parser.add_argument("--file", default=history_manager.HISTORY_FILE, help="リポジトリ内の履歴ファイルのパス")
+    parser.add_argument("--repo", default=".", help="リポジトリのディレクトリ（デフォルト: カレントディレクトリ）")
+    parser.add_argument("--workers", type=int, help="ワーカープロセス数（デフォルト: CPUコア数）")
+    parser.add_argument("--batch-size", type=int, default=500, help="履歴にまとめて登録する件数（デフォルト: 500）")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, config.log_level),
+        format=config.log_format,
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+
+    store = create_history_store()
+    if isinstance(store, JsonHistoryStore):
+        parser.error("JSONの履歴は直近の数回分しか保存しないため、HISTORY_BACKEND=sqlite または log を指定してください")
+
+    try:
+        import_git_history(args.file, args.repo, store=store, workers=args.workers, batch_size=args.batch_size)
+    except GitHistoryError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+ランキング履歴を追記専用のログとして保存するモジュール
+
+1回の実行ごとに1行（改行区切りのJSON）を current.ndjson に追記してfsyncする。
+compactで月ごとのセグメントファイルに書き直し、各エントリのバイト位置を index.json に記録するため、
+「最新N件」「指定日時点」の読み込みはファイル全体を走査せずに該当箇所だけを読む
+（current.ndjson が compact_bytes を超えた場合は、追記後に自動でコンパクションする）
+
+使用方法:
+  uv run python src/history_log.py compact --dir ranking_history_log
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import logging
+import os
+import sys
+from dataclasses import astuple, dataclass
+from pathlib import Path
+from typing import Optional
+
+from config import config
+from history_manager import entry_bound
+
+logger = logging.getLogger(__name__)
+
+CURRENT_LOG = "current.ndjson"
+INDEX_FILE = "index.json"
+SEGMENTS_DIR = "segments"
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    """セグメント内の1エントリの位置"""
+
+    timestamp: str
+    category: str
+    segment: str
+    offset: int
+    length: int
+
+
+def _encode(entry: dict, category: str) -> bytes:
+    record = {"category": category, **entry}
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _decode(line: bytes) -> tuple[str, dict]:
+    record = json.loads(line)
+    return record.pop("category", ""), record
+
+
+def _segment_month(timestamp: str) -> str:
+    """タイムスタンプ（ISO形式）からセグメントの年月を取り出す"""
+    return timestamp[:7]
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(temp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class HistoryLog:
+    """追記専用のランキング履歴ログ"""
+
+    def __init__(self, directory: str, compact_bytes: int = 0):
+        self.directory = Path(directory)
+        # 追記後のログがこのバイト数を超えたら自動でコンパクションする（0の場合はしない）
+        self.compact_bytes = compact_bytes
+        self._index: Optional[list[IndexEntry]] = None
+
+    @property
+    def current_path(self) -> Path:
+        return self.directory / CURRENT_LOG
+
+    def append(self, entries: list[dict], category: str = "") -> None:
+        """エントリをまとめてログに追記してfsyncする（ログがcompact_bytesを超えた場合はコンパクションする）"""
+        if not entries:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data = b"".join(_encode(entry, category) for entry in entries)
+        with open(self.current_path, "ab+") as f:
+            # 前回の書き込みが途中で切れていた場合は、その行と混ざらないよう改行してから追記する
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    data = b"\n" + data
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+
+        if self.compact_bytes and size > self.compact_bytes:
+            logger.info(f"履歴ログが{size:,}バイトを超えたため、コンパクションします")
+            self.compact()
+
+    def _load_index(self) -> list[IndexEntry]:
+        if self._index is None:
+            index_path = self.directory / INDEX_FILE
+            if index_path.exists():
+                with open(index_path, encoding="utf-8") as f:
+                    self._index = [IndexEntry(*row) for row in json.load(f)["entries"]]
+            else:
+                self._index = []
+        return self._index
+
+    def _read_current(self) -> list[tuple[str, dict]]:
+        """未コンパクションのログを読み込む（途中で切れた最終行は無視する）"""
+        if not self.current_path.exists():
+            return []
+        records = []
+        with open(self.current_path, "rb") as f:
+            for line in f:
+                try:
+                    records.append(_decode(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"履歴ログの壊れた行を無視します: {self.current_path}")
+        return records
+
+    def _read_indexed(self, index_entries: list[IndexEntry]) -> list[dict]:
+        """索引の位置からセグメントのエントリを読み込む"""
+        entries = []
+        handles = {}
+        try:
+            for index_entry in index_entries:
+                f = handles.get(index_entry.segment)
+                if f is None:
+                    f = handles[index_entry.segment] = open(self.directory / SEGMENTS_DIR / index_entry.segment, "rb")
+                f.seek(index_entry.offset)
+                entries.append(_decode(f.read(index_entry.length))[1])
+        finally:
+            for f in handles.values():
+                f.close()
+        return entries
+
+    def _merge(self, indexed: list[IndexEntry], category: str) -> list[tuple]:
+        """
+        索引とログのエントリを、同じタイムスタンプはログを優先して古い順に並べる
+
+        Returns:
+            (タイムスタンプ, 索引の位置またはNone, ログのエントリまたはNone) のリスト
+        """
+        merged: dict[str, tuple[Optional[IndexEntry], Optional[dict]]] = {
+            index_entry.timestamp: (index_entry, None) for index_entry in indexed
+        }
+        for record_category, entry in self._read_current():
+            if record_category == category:
+                merged[entry["timestamp"]] = (None, entry)
+        return [(timestamp, *merged[timestamp]) for timestamp in sorted(merged)]
+
+    def _resolve(self, items: list[tuple]) -> list[dict]:
+        """_mergeの結果から、索引の位置のエントリをセグメントから読み込んで履歴エントリのリストにする"""
+        loaded = iter(self._read_indexed([index_entry for _, index_entry, _ in items if index_entry is not None]))
+        return [entry if entry is not None else next(loaded) for _, _, entry in items]
+
+    def read_latest(self, limit: Optional[int] = None, category: str = "") -> list[dict]:
+        """
+        最新のエントリを読み込む
+
+        Args:
+            limit: 読み込む最大件数（Noneの場合は全件）
+            category: カテゴリキー
+
+        Returns:
+            履歴エントリのリスト（新しい順）
+        """
+        indexed = [index_entry for index_entry in self._load_index() if index_entry.category == category]
+        if limit is not None:
+            # 索引は古い順なので、末尾のlimit件だけを候補にする（ログ側のエントリとあわせて絞り込む）
+            indexed = indexed[-limit:] if limit > 0 else []
+        items = self._merge(indexed, category)
+        if limit is not None:
+            items = items[-limit:] if limit > 0 else []
+        return list(reversed(self._resolve(items)))
+
+    def read_at(self, timestamp: str, category: str = "") -> Optional[dict]:
+        """
+        指定日時の時点で最新だったエントリを読み込む
+
+        Args:
+            timestamp: ISO形式の日時（日付のみも可）
+
+        Returns:
+            指定日時以前で最新の履歴エントリ（存在しない場合はNone）
+        """
+        bound = entry_bound(timestamp)
+        indexed = [index_entry for index_entry in self._load_index() if index_entry.category == category]
+        position = bisect.bisect_right([index_entry.timestamp for index_entry in indexed], bound)
+        items = [item for item in self._merge(indexed[max(0, position - 1) : position], category) if item[0] <= bound]
+        return self._resolve(items[-1:])[0] if items else None
+
+    def compact(self) -> int:
+        """
+        ログとセグメントを月ごとのセグメントファイルに書き直し、索引を作り直す
+
+        新しいセグメント、索引の順に書き込んでからログを空にするため、途中で中断しても読み込みは整合し、
+        再実行すれば完了する
+
+        Returns:
+            コンパクション後のエントリ数
+        """
+        records: dict[tuple[str, str], dict] = {}
+        index = self._load_index()
+        for index_entry, entry in zip(index, self._read_indexed(index), strict=True):
+            records[(index_entry.category, index_entry.timestamp)] = entry
+        for category, entry in self._read_current():
+            records[(category, entry["timestamp"])] = entry
+
+        months: dict[str, list[tuple[str, dict]]] = {}
+        for (category, timestamp), entry in sorted(records.items(), key=lambda item: (item[0][1], item[0][0])):
+            months.setdefault(_segment_month(timestamp), []).append((category, entry))
+
+        segments_dir = self.directory / SEGMENTS_DIR
+        segments_dir.mkdir(parents=True, exist_ok=True)
+        new_index = []
+        segments = set()
+        for month, month_records in months.items():
+            chunks = []
+            positions = []
+            offset = 0
+            for category, entry in month_records:
+                data = _encode(entry, category)
+                positions.append((entry["timestamp"], category, offset, len(data)))
+                chunks.append(data)
+                offset += len(data)
+
+            # 内容のハッシュをファイル名に含め、既存のセグメントは上書きしない
+            # （索引を置き換えるまでは古い索引が指すセグメントがそのまま読める）
+            content = b"".join(chunks)
+            segment = f"{month}-{hashlib.sha256(content).hexdigest()[:8]}.ndjson"
+            if not (segments_dir / segment).exists():
+                _write_atomic(segments_dir / segment, content)
+            segments.add(segment)
+            new_index.extend(
+                IndexEntry(timestamp, category, segment, *span) for timestamp, category, *span in positions
+            )
+
+        new_index.sort(key=lambda index_entry: (index_entry.timestamp, index_entry.category))
+        index_data = {"version": 1, "entries": [astuple(index_entry) for index_entry in new_index]}
+        _write_atomic(self.directory / INDEX_FILE, json.dumps(index_data, ensure_ascii=False).encode("utf-8"))
+        _write_atomic(self.current_path, b"")
+
+        # 索引に載らなくなったセグメントを削除
+        for path in segments_dir.glob("*.ndjson"):
+            if path.name not in segments:
+                path.unlink()
+
+        self._index = new_index
+        logger.info(f"履歴ログをコンパクションしました: {len(new_index)}件、{len(segments)}セグメント")
+        return len(new_index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="追記専用のランキング履歴ログを管理")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compact_parser = subparsers.add_parser("compact", help="ログを月ごとのセグメントと索引に書き直す")
+    compact_parser.add_argument("--dir", default=config.history_log_dir, help="履歴ログのディレクトリ")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, config.log_level),
+        format=config.log_format,
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+
+    HistoryLog(args.dir).compact()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 """
 ランキング履歴を管理するモジュール
-直近3回分のランキングデータをJSONファイルに保存
+直近3回分のランキングデータをJSONファイルに保存（書籍のタイトル・URLはASINごとのカタログにまとめる）
 """
 
+import hashlib
 import json
 import logging
+import os
+import re
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
@@ -14,15 +17,118 @@ logger = logging.getLogger(__name__)
 HISTORY_FILE = "ranking_history.json"
 MAX_HISTORY_COUNT = 3
 
+# 商品URL（https://www.amazon.co.jp/dp/XXXXXXXXXX）からASINを取り出すパターン
+ASIN_PATTERN = re.compile(r"/dp/([A-Z0-9]{10})")
 
-def load_history() -> list[dict]:
+
+# 履歴ファイルの形式のバージョン
+# 1: 各エントリのrankingsに書籍データをそのまま保存
+# 2: 書籍のタイトル・URLをカタログ（ASINごと）にまとめ、各エントリのrowsには順位・評価・価格などだけを保存
+HISTORY_FORMAT_VERSION = 2
+
+# カタログにまとめる書籍の項目（スナップショット間で変わらない項目）
+CATALOG_FIELDS = ("title", "url")
+
+
+def _expand_row(row: dict, catalog: dict[str, dict]) -> dict:
+    """スナップショットの行をカタログの項目と合わせて書籍データに戻す"""
+    asin = row.get("asin")
+    book = catalog.get(asin) if asin else None
+    if book is None:
+        return dict(row)
+    item = {key: value for key, value in row.items() if key != "asin"}
+    for key in CATALOG_FIELDS:
+        item.setdefault(key, book[key])
+    return item
+
+
+def encode_history(history: list[dict]) -> dict:
+    """
+    履歴を形式バージョン2（カタログ＋スナップショットの行）に変換
+
+    カタログには各ASINの最も新しいエントリでのタイトル・URLを保存し、それと異なる行だけが自分の値を持つ。
+    ASINが取れない書籍はそのまま行に保存する
+
+    Args:
+        history: 履歴エントリのリスト（新しい順）
+    """
+    catalog: dict[str, dict] = {}
+    snapshots = []
+    for entry in history:
+        rows = []
+        for item in entry["rankings"]:
+            asin = extract_asin(item.get("url"))
+            if asin is None or "asin" in item or any(key not in item for key in CATALOG_FIELDS):
+                rows.append(item)
+                continue
+            book = catalog.setdefault(asin, {key: item[key] for key in CATALOG_FIELDS})
+            row = {"asin": asin}
+            row.update((key, value) for key, value in item.items() if key not in CATALOG_FIELDS or value != book[key])
+            rows.append(row)
+        snapshot = {key: value for key, value in entry.items() if key != "rankings"}
+        snapshot["rows"] = rows
+        snapshots.append(snapshot)
+    return {"version": HISTORY_FORMAT_VERSION, "catalog": catalog, "history": snapshots}
+
+
+def decode_history(data: dict) -> list[dict]:
+    """
+    履歴ファイルの内容から履歴エントリのリストを取得（形式バージョン1・2に対応）
+
+    バージョン2の各エントリのrankingsは、スナップショットの行とカタログから組み立てる
+    """
+    if data.get("version", 1) < 2:
+        return data.get("history", [])
+
+    catalog = data.get("catalog", {})
+    history = []
+    for snapshot in data.get("history", []):
+        entry = {key: value for key, value in snapshot.items() if key != "rows"}
+        entry["rankings"] = [_expand_row(row, catalog) for row in snapshot.get("rows", [])]
+        history.append(entry)
+    return history
+
+
+def _dump_history(data: dict) -> str:
+    """
+    形式バージョン2の履歴をJSON文字列にする
+
+    カタログの1冊・スナップショットの1行をそれぞれ1行に収め、差分を追いやすく、かつサイズを小さくする
+    """
+
+    def compact(value) -> str:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+    def block(open_bracket: str, lines: list[str], close_bracket: str, indent: str) -> str:
+        if not lines:
+            return open_bracket + close_bracket
+        return open_bracket + "\n" + ",\n".join(lines) + "\n" + indent + close_bracket
+
+    catalog_lines = [f"    {compact(asin)}:{compact(book)}" for asin, book in data["catalog"].items()]
+    snapshot_lines = []
+    for snapshot in data["history"]:
+        fields = [f"{compact(key)}:{compact(value)}" for key, value in snapshot.items() if key != "rows"]
+        rows = block("[", [f"      {compact(row)}" for row in snapshot["rows"]], "]", "    ")
+        snapshot_lines.append("    {" + ",".join([*fields, f'"rows":{rows}']) + "}")
+
+    return (
+        f'{{\n  "version":{data["version"]},\n'
+        f'  "catalog":{block("{", catalog_lines, "}", "  ")},\n'
+        f'  "history":{block("[", snapshot_lines, "]", "  ")}\n}}\n'
+    )
+
+
+def load_history(path: Optional[str] = None) -> list[dict]:
     """
     履歴ファイルからランキング履歴を読み込む
 
+    Args:
+        path: 履歴ファイルのパス（Noneの場合はHISTORY_FILE）
+
     Returns:
         履歴データのリスト（新しい順）
     """
-    history_path = Path(HISTORY_FILE)
+    history_path = Path(path or HISTORY_FILE)
 
     if not history_path.exists():
         logger.info("履歴ファイルが存在しません。新規作成します。")
@@ -30,49 +136,101 @@ def load_history() -> list[dict]:
 
     try:
         with open(history_path, encoding="utf-8") as f:
-            data = json.load(f)
-            return data.get("history", [])
+            return decode_history(json.load(f))
     except Exception as e:
         logger.error(f"履歴ファイルの読み込みでエラー: {e}")
         return []
 
 
-def save_history(history: list[dict]) -> None:
+def save_history(history: list[dict], path: Optional[str] = None) -> None:
     """
-    履歴データをファイルに保存
+    履歴データをファイルに保存（形式バージョン2）
+
+    同じディレクトリの一時ファイルに書き込んでから置き換えるため、書き込み中に中断しても既存の履歴は壊れない
 
     Args:
         history: 保存する履歴データ
+        path: 履歴ファイルのパス（Noneの場合はHISTORY_FILE）
     """
+    history_path = Path(path or HISTORY_FILE)
+    temp_path = history_path.with_name(f"{history_path.name}.{os.getpid()}.tmp")
     try:
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump({"history": history}, f, ensure_ascii=False, indent=2)
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(_dump_history(encode_history(history)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, history_path)
         logger.info(f"履歴ファイルを保存しました: {len(history)}件")
     except Exception as e:
         logger.error(f"履歴ファイルの保存でエラー: {e}")
+        temp_path.unlink(missing_ok=True)
         raise
 
 
-def add_ranking_to_history(ranking_data: list[dict]) -> None:
+def create_history_entry(ranking_data: list[dict], validators: Optional[dict] = None) -> dict:
     """
-    新しいランキングデータを履歴に追加
+    ランキングデータから履歴エントリを作成
 
     Args:
         ranking_data: スクレイピングで取得したランキングデータ
+        validators: 取得元ページのETag/Last-Modified（次回の条件付きリクエスト用）
     """
-    history = load_history()
+    # フィンガープリントは次回の変化判定に使う
+    entry = {
+        "timestamp": datetime.now().isoformat(),
+        "fingerprint": compute_ranking_fingerprint(ranking_data),
+        "rankings": ranking_data,
+    }
+    if validators:
+        entry["validators"] = validators
+    return entry
+
 
-    # 新しいエントリを作成
-    new_entry = {"timestamp": datetime.now().isoformat(), "rankings": ranking_data}
+def prepend_history_entry(history: list[dict], entry: dict) -> list[dict]:
+    """履歴の先頭にエントリを追加し、最大保存数を超えた分を削除した履歴を返す"""
+    return [entry, *history][:MAX_HISTORY_COUNT]
+
+
+def merge_history_entries(history: list[dict], entries: list[dict]) -> list[dict]:
+    """
+    履歴に複数のエントリをまとめた履歴を返す
+
+    同じタイムスタンプのエントリは置き換え、新しい順に並べて最大保存数までを残す
+    """
+    merged = {entry["timestamp"]: entry for entry in history}
+    for entry in entries:
+        merged[entry["timestamp"]] = entry
+    return sorted(merged.values(), key=lambda entry: entry["timestamp"], reverse=True)[:MAX_HISTORY_COUNT]
+
+
+def extract_asin(url: Optional[str]) -> Optional[str]:
+    """商品URLからASINを取り出す（取り出せない場合はNone）"""
+    if not url:
+        return None
+    match = ASIN_PATTERN.search(url)
+    return match.group(1) if match else None
+
+
+def compute_ranking_fingerprint(ranking_data: list[dict]) -> str:
+    """
+    ランキングの内容（ASINと順位の組）からフィンガープリントを計算
+
+    ASINが取れない書籍はタイトルで代用する。価格や評価数の変化は順位の変化とみなさない
+
+    Args:
+        ranking_data: ランキングデータ
 
-    # 履歴の先頭に追加
-    history.insert(0, new_entry)
+    Returns:
+        SHA-256のハッシュ文字列
+    """
+    pairs = [[extract_asin(item.get("url")) or item["title"], item["rank"]] for item in ranking_data]
+    payload = json.dumps(pairs, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
-    # 最大保存数を超えた分を削除
-    if len(history) > MAX_HISTORY_COUNT:
-        history = history[:MAX_HISTORY_COUNT]
 
-    save_history(history)
+def get_entry_fingerprint(entry: dict) -> str:
+    """履歴エントリのフィンガープリントを取得（保存されていない古いエントリは計算する）"""
+    return entry.get("fingerprint") or compute_ranking_fingerprint(entry["rankings"])
 
 
 def get_previous_rankings() -> Optional[list[dict]]:
@@ -94,10 +252,62 @@ def get_previous_rankings() -> Optional[list[dict]]:
         return None
 
 
+def ranking_key(item: dict) -> str:
+    """書籍を同定するキー（商品URLのASIN、取り出せない場合はタイトル）"""
+    return extract_asin(item.get("url")) or item["title"]
+
+
+def build_rank_map(rankings: list[dict]) -> dict[str, dict]:
+    """
+    ランキングデータからキー（ranking_key）→ 書籍データの辞書を作成
+
+    同じキーの書籍が複数ある場合は上位のものを使う
+    """
+    rank_map: dict[str, dict] = {}
+    for item in rankings:
+        rank_map.setdefault(ranking_key(item), item)
+    return rank_map
+
+
+def diff_rank_maps(current_map: dict[str, dict], previous_map: dict[str, dict]) -> dict:
+    """
+    2つのランキングの辞書（build_rank_map）を比較して変化を分析
+
+    Returns:
+        new_entries・rank_changes・dropped_out を持つ辞書（各項目はkeyとtitleを持つ。titleは今回の表記）
+    """
+    analysis = {"new_entries": [], "rank_changes": [], "dropped_out": []}
+
+    for key, item in current_map.items():
+        previous_item = previous_map.get(key)
+        if previous_item is None:
+            analysis["new_entries"].append({"key": key, "title": item["title"], "rank": item["rank"]})
+        elif item["rank"] != previous_item["rank"]:
+            analysis["rank_changes"].append(
+                {
+                    "key": key,
+                    "title": item["title"],
+                    "current_rank": item["rank"],
+                    "previous_rank": previous_item["rank"],
+                    "change": previous_item["rank"] - item["rank"],  # 正の値は上昇
+                }
+            )
+
+    for key, previous_item in previous_map.items():
+        if key not in current_map:
+            analysis["dropped_out"].append(
+                {"key": key, "title": previous_item["title"], "previous_rank": previous_item["rank"]}
+            )
+
+    return analysis
+
+
 def analyze_ranking_changes(current: list[dict], previous: list[dict]) -> dict:
     """
     現在と過去のランキングを比較して変化を分析
 
+    書籍は商品URLのASINで同定するため、タイトルの表記が変わっても同じ書籍として扱う
+
     Args:
         current: 現在のランキングデータ
         previous: 過去のランキングデータ
@@ -105,35 +315,58 @@ def analyze_ranking_changes(current: list[dict], previous: list[dict]) -> dict:
     Returns:
         分析結果を含む辞書
     """
-    analysis = {"new_entries": [], "rank_changes": [], "dropped_out": []}
+    return diff_rank_maps(build_rank_map(current), build_rank_map(previous))
 
-    # タイトルをキーにした辞書を作成
-    current_dict = {item["title"]: item for item in current}
-    previous_dict = {item["title"]: item for item in previous}
-
-    # 新規エントリーを検出
-    for title in current_dict:
-        if title not in previous_dict:
-            analysis["new_entries"].append({"title": title, "rank": current_dict[title]["rank"]})
-
-    # ランク変動を検出
-    for title in current_dict:
-        if title in previous_dict:
-            current_rank = current_dict[title]["rank"]
-            previous_rank = previous_dict[title]["rank"]
-            if current_rank != previous_rank:
-                analysis["rank_changes"].append(
-                    {
-                        "title": title,
-                        "current_rank": current_rank,
-                        "previous_rank": previous_rank,
-                        "change": previous_rank - current_rank,  # 正の値は上昇
-                    }
-                )
-
-    # ランキング外に落ちた作品を検出
-    for title in previous_dict:
-        if title not in current_dict:
-            analysis["dropped_out"].append({"title": title, "previous_rank": previous_dict[title]["rank"]})
 
-    return analysis
+def analyze_ranking_windows(current: list[dict], baselines: dict[int, Optional[dict]]) -> dict[int, dict]:
+    """
+    現在のランキングを複数の時点（昨日・7日前・30日前など）の履歴エントリと1回で比較
+
+    現在のランキングの辞書は1回だけ作成し、比較元の辞書は履歴エントリ（タイムスタンプ）ごとに1回だけ作成する
+
+    Args:
+        current: 現在のランキングデータ
+        baselines: 何日前かをキーにした比較元の履歴エントリ（Noneの期間は結果に含めない）
+
+    Returns:
+        何日前かをキーにした辞書（比較元のtimestampと、analyze_ranking_changesと同じ形式の分析結果を持つ）
+    """
+    current_map = build_rank_map(current)
+    analyses: dict[str, dict] = {}
+    results = {}
+    for days, entry in sorted(baselines.items()):
+        if entry is None:
+            continue
+        timestamp = entry["timestamp"]
+        if timestamp not in analyses:
+            analyses[timestamp] = diff_rank_maps(current_map, build_rank_map(entry["rankings"]))
+        results[days] = {"timestamp": timestamp, **analyses[timestamp]}
+    return results
+
+
+def entry_bound(timestamp: str) -> str:
+    """
+    指定日時の時点の履歴を探すための上限のタイムスタンプ（これ以下のタイムスタンプのエントリが対象）
+
+    Args:
+        timestamp: ISO形式の日時（日付のみの場合はその日の終わりまでを含める）
+
+    Returns:
+        文字列として比較する上限（日付のみの場合はどの時刻よりも大きくなる "T99" を付ける）
+    """
+    return timestamp if "T" in timestamp else f"{timestamp}T99"
+
+
+def find_entry_at(history: list[dict], timestamp: str) -> Optional[dict]:
+    """
+    履歴から指定日時の時点で最新だったエントリを探す
+
+    Args:
+        history: 履歴エントリのリスト（新しい順）
+        timestamp: ISO形式の日時（日付のみの場合はその日の終わりまでを含める）
+
+    Returns:
+        指定日時以前で最新の履歴エントリ（存在しない場合はNone）
+    """
+    bound = entry_bound(timestamp)
+    return next((entry for entry in history if entry["timestamp"] <= bound), None)
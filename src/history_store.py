@@ -0,0 +1,603 @@
+"""
+ランキング履歴の保存先を切り替えるモジュール
+JSONファイル（直近数回分）、SQLite（ASIN・カテゴリごとに索引付き、古い分は日・週ごとに集約）、
+追記専用のログ（全件、1回の実行で1行を追記）の3種類のバックエンドを提供する
+
+使用方法:
+  # 既存のJSON履歴をSQLiteに取り込む
+  uv run python src/history_store.py import --json ranking_history.json --db ranking_history.db
+  # 保存期間を過ぎたSQLiteの履歴を集約する（通常の実行でも履歴の保存後に行う）
+  uv run python src/history_store.py retention --db ranking_history.db
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+import history_manager
+from config import config
+from history_log import HistoryLog
+from history_manager import (
+    compute_ranking_fingerprint,
+    create_history_entry,
+    decode_history,
+    entry_bound,
+    extract_asin,
+    find_entry_at,
+    merge_history_entries,
+    prepend_history_entry,
+)
+
+logger = logging.getLogger(__name__)
+
+# カテゴリを指定しない場合（メインのランキング）のカテゴリキー
+DEFAULT_CATEGORY = ""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    category TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    validators TEXT,
+    UNIQUE (category, timestamp)
+);
+CREATE TABLE IF NOT EXISTS books (
+    asin TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rankings (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    asin TEXT,
+    title TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (snapshot_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_category_timestamp ON snapshots (category, timestamp);
+CREATE INDEX IF NOT EXISTS idx_rankings_asin_timestamp ON rankings (asin, timestamp);
+CREATE INDEX IF NOT EXISTS idx_rankings_category_timestamp ON rankings (category, timestamp);
+CREATE TABLE IF NOT EXISTS rollups (
+    category TEXT NOT NULL,
+    period TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    key TEXT NOT NULL,
+    asin TEXT,
+    title TEXT NOT NULL,
+    best_rank INTEGER NOT NULL,
+    worst_rank INTEGER NOT NULL,
+    closing_rank INTEGER NOT NULL,
+    closing_timestamp TEXT NOT NULL,
+    samples INTEGER NOT NULL,
+    PRIMARY KEY (category, period, period_start, key)
+);
+CREATE INDEX IF NOT EXISTS idx_rollups_asin ON rollups (asin, period_start);
+"""
+
+# 集約済みの行に新しく集約した行を合わせる（最高・最低順位は広げ、終値は新しい方を使う）
+_ROLLUP_UPSERT = """
+ON CONFLICT (category, period, period_start, key) DO UPDATE SET
+    best_rank = MIN(rollups.best_rank, excluded.best_rank),
+    worst_rank = MAX(rollups.worst_rank, excluded.worst_rank),
+    asin = CASE WHEN excluded.closing_timestamp >= rollups.closing_timestamp THEN excluded.asin ELSE rollups.asin END,
+    title = CASE WHEN excluded.closing_timestamp >= rollups.closing_timestamp THEN excluded.title ELSE rollups.title END,
+    closing_rank = CASE
+        WHEN excluded.closing_timestamp >= rollups.closing_timestamp THEN excluded.closing_rank
+        ELSE rollups.closing_rank
+    END,
+    closing_timestamp = MAX(rollups.closing_timestamp, excluded.closing_timestamp),
+    samples = rollups.samples + excluded.samples
+"""
+
+# 保存期間を過ぎたスナップショットを日ごと・書籍ごとに集約する
+_DAILY_ROLLUP = (
+    """
+WITH aged AS (
+    SELECT
+        substr(timestamp, 1, 10) AS period_start,
+        COALESCE(asin, title) AS key,
+        asin,
+        title,
+        rank,
+        timestamp,
+        ROW_NUMBER() OVER (
+            PARTITION BY substr(timestamp, 1, 10), COALESCE(asin, title) ORDER BY timestamp DESC, rank
+        ) AS recency
+    FROM rankings
+    WHERE category = :category AND timestamp < :cutoff
+)
+INSERT INTO rollups (
+    category, period, period_start, key, asin, title, best_rank, worst_rank, closing_rank, closing_timestamp, samples
+)
+SELECT
+    :category, 'daily', period_start, key,
+    MAX(CASE WHEN recency = 1 THEN asin END),
+    MAX(CASE WHEN recency = 1 THEN title END),
+    MIN(rank), MAX(rank),
+    MAX(CASE WHEN recency = 1 THEN rank END),
+    MAX(timestamp), COUNT(*)
+FROM aged
+WHERE true
+GROUP BY period_start, key
+"""
+    + _ROLLUP_UPSERT
+)
+
+# 保存期間を過ぎた日ごとの集約を週（月曜始まり）ごとに集約する
+_WEEKLY_ROLLUP = (
+    """
+WITH aged AS (
+    SELECT
+        date(period_start, 'weekday 0', '-6 days') AS week_start,
+        key,
+        asin,
+        title,
+        best_rank,
+        worst_rank,
+        closing_rank,
+        closing_timestamp,
+        samples,
+        ROW_NUMBER() OVER (
+            PARTITION BY date(period_start, 'weekday 0', '-6 days'), key ORDER BY closing_timestamp DESC
+        ) AS recency
+    FROM rollups
+    WHERE category = :category AND period = 'daily' AND period_start < :cutoff
+)
+INSERT INTO rollups (
+    category, period, period_start, key, asin, title, best_rank, worst_rank, closing_rank, closing_timestamp, samples
+)
+SELECT
+    :category, 'weekly', week_start, key,
+    MAX(CASE WHEN recency = 1 THEN asin END),
+    MAX(CASE WHEN recency = 1 THEN title END),
+    MIN(best_rank), MAX(worst_rank),
+    MAX(CASE WHEN recency = 1 THEN closing_rank END),
+    MAX(closing_timestamp), SUM(samples)
+FROM aged
+WHERE true
+GROUP BY week_start, key
+"""
+    + _ROLLUP_UPSERT
+)
+
+
+@dataclass
+class RetentionStats:
+    """保存期間の整理の実行結果"""
+
+    # 日ごとに集約して削除したスナップショット数
+    snapshots: int = 0
+    # 週ごとに集約して削除した日ごとの集約の行数
+    daily_rows: int = 0
+
+
+def _week_start(day: date) -> date:
+    """その日を含む週（月曜始まり）の初日"""
+    return day - timedelta(days=day.weekday())
+
+
+class HistoryStore(ABC):
+    """ランキング履歴の保存先の基底クラス（履歴エントリはtimestamp・fingerprint・rankingsを持つ辞書）"""
+
+    @abstractmethod
+    def load_history(self, limit: Optional[int] = None, category: str = DEFAULT_CATEGORY) -> list[dict]:
+        """
+        ランキング履歴を読み込む
+
+        Args:
+            limit: 読み込む最大件数（Noneの場合は全件）
+            category: カテゴリキー
+
+        Returns:
+            履歴エントリのリスト（新しい順）
+        """
+
+    @abstractmethod
+    def add_snapshots(self, entries: list[dict], category: str = DEFAULT_CATEGORY) -> None:
+        """複数の履歴エントリをまとめて追加（同じタイムスタンプのエントリは置き換える）"""
+
+    def add_ranking(
+        self, ranking_data: list[dict], validators: Optional[dict] = None, category: str = DEFAULT_CATEGORY
+    ) -> None:
+        """
+        新しいランキングデータを履歴に追加
+
+        Args:
+            ranking_data: スクレイピングで取得したランキングデータ
+            validators: 取得元ページのETag/Last-Modified（次回の条件付きリクエスト用）
+            category: カテゴリキー
+        """
+        self.add_snapshots([create_history_entry(ranking_data, validators)], category)
+
+    def get_latest_entry(self, category: str = DEFAULT_CATEGORY) -> Optional[dict]:
+        """最新の履歴エントリを取得（存在しない場合はNone）"""
+        history = self.load_history(limit=1, category=category)
+        return history[0] if history else None
+
+    def get_previous_rankings(self, category: str = DEFAULT_CATEGORY) -> Optional[list[dict]]:
+        """直前のランキングデータを取得（history_manager.get_previous_rankingsと同じ規則）"""
+        history = self.load_history(limit=2, category=category)
+        if not history:
+            return None
+        return history[min(1, len(history) - 1)]["rankings"]
+
+    def get_entry_at(self, timestamp: str, category: str = DEFAULT_CATEGORY) -> Optional[dict]:
+        """
+        指定日時の時点で最新だった履歴エントリを取得
+
+        Args:
+            timestamp: ISO形式の日時（日付のみの場合はその日の終わりまでを含める）
+            category: カテゴリキー
+
+        Returns:
+            指定日時以前で最新の履歴エントリ（存在しない場合はNone）
+        """
+        return find_entry_at(self.load_history(category=category), timestamp)
+
+    def apply_retention(self, now: Optional[datetime] = None) -> RetentionStats:
+        """
+        保存期間を過ぎた履歴を集約する（全件を保存しない保存先では何もしない）
+
+        Args:
+            now: 保存期間の基準日時（Noneの場合は現在日時）
+        """
+        return RetentionStats()
+
+    def flush(self) -> None:
+        """未保存の変更を書き込む（追加のたびに書き込む保存先では何もしない）"""
+        return
+
+    def close(self) -> None:
+        """未保存の変更を書き込んで保存先を閉じる"""
+        self.flush()
+
+
+class JsonHistoryStore(HistoryStore):
+    """
+    従来のJSONファイル（history_manager）に直近数回分を保存するバックエンド
+
+    カテゴリを指定した履歴は、カテゴリキーを付けた別のファイル（ranking_history.<カテゴリキー>.json）に保存する。
+    ファイルは最初に必要になった時に1回だけ読み込み、以降の参照と追加はメモリ上で行う。
+    変更はflush（close）の時にまとめて書き込む
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or history_manager.HISTORY_FILE
+        self._histories: dict[str, list[dict]] = {}
+        self._dirty: set[str] = set()
+
+    def category_path(self, category: str = DEFAULT_CATEGORY) -> str:
+        """カテゴリの履歴ファイルのパス"""
+        if category == DEFAULT_CATEGORY:
+            return self.path
+        path = Path(self.path)
+        return str(path.with_name(f"{path.stem}.{category}{path.suffix}"))
+
+    def _load(self, category: str) -> list[dict]:
+        if category not in self._histories:
+            self._histories[category] = history_manager.load_history(self.category_path(category))
+        return self._histories[category]
+
+    def load_history(self, limit: Optional[int] = None, category: str = DEFAULT_CATEGORY) -> list[dict]:
+        history = self._load(category)
+        return list(history) if limit is None else history[:limit]
+
+    def add_snapshots(self, entries: list[dict], category: str = DEFAULT_CATEGORY) -> None:
+        if not entries:
+            return
+        self._histories[category] = merge_history_entries(self._load(category), entries)
+        self._dirty.add(category)
+
+    def add_ranking(
+        self, ranking_data: list[dict], validators: Optional[dict] = None, category: str = DEFAULT_CATEGORY
+    ) -> None:
+        entry = create_history_entry(ranking_data, validators)
+        self._histories[category] = prepend_history_entry(self._load(category), entry)
+        self._dirty.add(category)
+
+    def flush(self) -> None:
+        for category in sorted(self._dirty):
+            history_manager.save_history(self._histories[category], self.category_path(category))
+            self._dirty.discard(category)
+
+
+class SqliteHistoryStore(HistoryStore):
+    """SQLiteに全件を保存するバックエンド（1回の追加は1トランザクションで書き込む）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.executescript(_SCHEMA)
+
+    def load_history(self, limit: Optional[int] = None, category: str = DEFAULT_CATEGORY) -> list[dict]:
+        snapshots = self._conn.execute(
+            "SELECT id, timestamp, fingerprint, validators FROM snapshots WHERE category = ? "
+            "ORDER BY timestamp DESC LIMIT ?",
+            (category, -1 if limit is None else limit),
+        ).fetchall()
+        return self._build_entries(snapshots)
+
+    def get_entry_at(self, timestamp: str, category: str = DEFAULT_CATEGORY) -> Optional[dict]:
+        bound = entry_bound(timestamp)
+        snapshots = self._conn.execute(
+            "SELECT id, timestamp, fingerprint, validators FROM snapshots WHERE category = ? AND timestamp <= ? "
+            "ORDER BY timestamp DESC LIMIT 1",
+            (category, bound),
+        ).fetchall()
+        entries = self._build_entries(snapshots)
+        return entries[0] if entries else None
+
+    def _build_entries(self, snapshots: list[tuple]) -> list[dict]:
+        """snapshotsテーブルの行に順位の行を読み込んで履歴エントリにする"""
+        if not snapshots:
+            return []
+
+        placeholders = ",".join("?" * len(snapshots))
+        rankings: dict[int, list[dict]] = {snapshot_id: [] for snapshot_id, *_ in snapshots}
+        for snapshot_id, data in self._conn.execute(
+            f"SELECT snapshot_id, data FROM rankings WHERE snapshot_id IN ({placeholders}) "
+            "ORDER BY snapshot_id, position",
+            [snapshot_id for snapshot_id, *_ in snapshots],
+        ):
+            rankings[snapshot_id].append(json.loads(data))
+
+        history = []
+        for snapshot_id, timestamp, fingerprint, validators in snapshots:
+            entry = {"timestamp": timestamp, "fingerprint": fingerprint, "rankings": rankings[snapshot_id]}
+            if validators:
+                entry["validators"] = json.loads(validators)
+            history.append(entry)
+        return history
+
+    def add_snapshots(self, entries: list[dict], category: str = DEFAULT_CATEGORY) -> None:
+        if not entries:
+            return
+
+        with self._conn:
+            for entry in entries:
+                self._insert_entry(entry, category)
+        logger.info(f"履歴をSQLiteに保存しました: {len(entries)}件（{self.path}）")
+
+    def _insert_entry(self, entry: dict, category: str) -> None:
+        timestamp = entry["timestamp"]
+        ranking_data = entry["rankings"]
+        validators = entry.get("validators")
+
+        # 同じタイムスタンプのエントリは置き換える（順位の行は外部キーで削除される）
+        self._conn.execute("DELETE FROM snapshots WHERE category = ? AND timestamp = ?", (category, timestamp))
+        cursor = self._conn.execute(
+            "INSERT INTO snapshots (category, timestamp, fingerprint, validators) VALUES (?, ?, ?, ?)",
+            (
+                category,
+                timestamp,
+                entry.get("fingerprint") or compute_ranking_fingerprint(ranking_data),
+                json.dumps(validators, ensure_ascii=False) if validators else None,
+            ),
+        )
+        snapshot_id = cursor.lastrowid
+
+        rows = []
+        books = []
+        for position, item in enumerate(ranking_data):
+            asin = extract_asin(item.get("url"))
+            rows.append(
+                (
+                    snapshot_id,
+                    position,
+                    category,
+                    timestamp,
+                    item["rank"],
+                    asin,
+                    item["title"],
+                    json.dumps(item, ensure_ascii=False),
+                )
+            )
+            if asin:
+                books.append((asin, item["title"], item["url"], timestamp, timestamp))
+
+        self._conn.executemany(
+            "INSERT INTO rankings (snapshot_id, position, category, timestamp, rank, asin, title, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self._conn.executemany(
+            "INSERT INTO books (asin, title, url, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (asin) DO UPDATE SET "
+            "title = CASE WHEN excluded.last_seen >= books.last_seen THEN excluded.title ELSE books.title END, "
+            "first_seen = MIN(books.first_seen, excluded.first_seen), "
+            "last_seen = MAX(books.last_seen, excluded.last_seen)",
+            books,
+        )
+
+    def get_book_history(self, asin: str) -> list[dict]:
+        """
+        書籍の順位の推移を取得
+
+        Returns:
+            timestamp・category・rankを持つ辞書のリスト（古い順）
+        """
+        rows = self._conn.execute(
+            "SELECT timestamp, category, rank FROM rankings WHERE asin = ? ORDER BY timestamp", (asin,)
+        )
+        return [{"timestamp": timestamp, "category": category, "rank": rank} for timestamp, category, rank in rows]
+
+    def apply_retention(
+        self,
+        now: Optional[datetime] = None,
+        full_days: Optional[int] = None,
+        daily_days: Optional[int] = None,
+    ) -> RetentionStats:
+        """
+        保存期間を過ぎた履歴を段階的に集約する
+
+        full_days日より前のスナップショットは日ごと・書籍ごとの集約（最高・最低・その日の最後の順位）に、
+        daily_days日より前の日ごとの集約は週ごとの集約にまとめて、元の行を削除する。
+        集約済みの行は削除されるため、毎回の処理は新しく保存期間を過ぎた分だけを対象にする
+
+        Args:
+            now: 保存期間の基準日時（Noneの場合は現在日時）
+            full_days: スナップショットをそのまま残す日数（Noneの場合は設定値、0の場合は集約しない）
+            daily_days: 日ごとの集約を残す日数（Noneの場合は設定値、0の場合は週ごとに集約しない）
+
+        Returns:
+            実行結果
+        """
+        now = now or datetime.now()
+        full_days = config.history_full_retention_days if full_days is None else full_days
+        daily_days = config.history_daily_retention_days if daily_days is None else daily_days
+        stats = RetentionStats()
+        if full_days <= 0:
+            return stats
+
+        # 1日・1週間の途中で集約しないよう、区切りは日・週の初めにそろえる
+        daily_cutoff = (now - timedelta(days=full_days)).date().isoformat()
+        weekly_cutoff = _week_start((now - timedelta(days=daily_days)).date()).isoformat() if daily_days > 0 else None
+
+        categories = [row[0] for row in self._conn.execute("SELECT DISTINCT category FROM snapshots")]
+        with self._conn:
+            for category in categories:
+                params = {"category": category, "cutoff": daily_cutoff}
+                self._conn.execute(_DAILY_ROLLUP, params)
+                stats.snapshots += self._conn.execute(
+                    "DELETE FROM snapshots WHERE category = :category AND timestamp < :cutoff", params
+                ).rowcount
+
+            if weekly_cutoff is not None:
+                categories = [row[0] for row in self._conn.execute("SELECT DISTINCT category FROM rollups")]
+                for category in categories:
+                    params = {"category": category, "cutoff": weekly_cutoff}
+                    self._conn.execute(_WEEKLY_ROLLUP, params)
+                    stats.daily_rows += self._conn.execute(
+                        "DELETE FROM rollups WHERE category = :category AND period = 'daily' AND period_start < :cutoff",
+                        params,
+                    ).rowcount
+
+        if stats.snapshots or stats.daily_rows:
+            logger.info(
+                f"保存期間を過ぎた履歴を集約しました: スナップショット{stats.snapshots}件を日ごとに、"
+                f"日ごとの集約{stats.daily_rows}件を週ごとに集約"
+            )
+        return stats
+
+    def get_rollups(self, period: str, category: str = DEFAULT_CATEGORY, asin: Optional[str] = None) -> list[dict]:
+        """
+        集約した順位を取得
+
+        Args:
+            period: daily（日ごと）または weekly（週ごと）
+            category: カテゴリキー
+            asin: 書籍のASIN（Noneの場合は全書籍）
+
+        Returns:
+            period_start・key・asin・title・best_rank・worst_rank・closing_rank・samplesを持つ辞書のリスト（古い順）
+        """
+        query = (
+            "SELECT period_start, key, asin, title, best_rank, worst_rank, closing_rank, samples FROM rollups "
+            "WHERE category = ? AND period = ?"
+        )
+        params: list = [category, period]
+        if asin is not None:
+            query += " AND asin = ?"
+            params.append(asin)
+        columns = ("period_start", "key", "asin", "title", "best_rank", "worst_rank", "closing_rank", "samples")
+        rows = self._conn.execute(query + " ORDER BY period_start, closing_rank", params)
+        return [dict(zip(columns, row, strict=True)) for row in rows]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class LogHistoryStore(HistoryStore):
+    """追記専用のログ（history_log）に全件を保存するバックエンド（1回の追加は1回の追記とfsync）"""
+
+    def __init__(self, directory: str):
+        self.log = HistoryLog(directory, config.history_log_compact_bytes)
+
+    def load_history(self, limit: Optional[int] = None, category: str = DEFAULT_CATEGORY) -> list[dict]:
+        return self.log.read_latest(limit, category)
+
+    def add_snapshots(self, entries: list[dict], category: str = DEFAULT_CATEGORY) -> None:
+        self.log.append(entries, category)
+
+    def get_entry_at(self, timestamp: str, category: str = DEFAULT_CATEGORY) -> Optional[dict]:
+        return self.log.read_at(timestamp, category)
+
+
+def create_history_store(path: Optional[str] = None) -> HistoryStore:
+    """
+    設定に応じた履歴の保存先を作成
+
+    Args:
+        path: 履歴ファイルのパス（Noneの場合はバックエンドごとの設定値）
+    """
+    if config.history_backend == "sqlite":
+        return SqliteHistoryStore(path or config.history_db_file)
+    if config.history_backend == "log":
+        return LogHistoryStore(path or config.history_log_dir)
+    return JsonHistoryStore(path)
+
+
+def import_json_history(store: HistoryStore, json_path: str) -> int:
+    """
+    既存のJSON履歴ファイルを取り込む（同じタイムスタンプのエントリは置き換えるため、再実行しても重複しない）
+
+    Returns:
+        取り込んだエントリ数
+    """
+    with open(json_path, encoding="utf-8") as f:
+        entries = decode_history(json.load(f))
+    store.add_snapshots(entries)
+    return len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ランキング履歴の保存先を管理")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="JSON履歴ファイルをSQLiteに取り込む")
+    import_parser.add_argument("--json", default=history_manager.HISTORY_FILE, help="取り込むJSON履歴ファイル")
+    import_parser.add_argument("--db", default=config.history_db_file, help="取り込み先のSQLiteファイル")
+    retention_parser = subparsers.add_parser("retention", help="保存期間を過ぎたSQLiteの履歴を集約する")
+    retention_parser.add_argument("--db", default=config.history_db_file, help="SQLiteファイル")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, config.log_level),
+        format=config.log_format,
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+
+    if args.command == "retention":
+        store = SqliteHistoryStore(args.db)
+        try:
+            store.apply_retention()
+        finally:
+            store.close()
+        return
+
+    if not Path(args.json).exists():
+        parser.error(f"JSON履歴ファイルが見つかりません: {args.json}")
+
+    store = SqliteHistoryStore(args.db)
+    try:
+        count = import_json_history(store, args.json)
+    finally:
+        store.close()
+    logger.info(f"{count}件の履歴を取り込みました: {args.json} → {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+HTTP通信を共通化するモジュール
+Keep-Aliveの接続プールを持つセッションをスクレイパーと通知で共有し、
+ジッター付き指数バックオフのリトライと、1回の実行あたりのリトライ予算を一元管理する
+レート制限が設定されたホストへのリクエストは、すべてトークンバケットを通して送信する
+"""
+
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from config import config
+from rate_limiter import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+@dataclass
+class RetryPolicy:
+    """リトライ方針"""
+
+    # 最大試行回数（初回を含む）
+    max_retries: int = 3
+    # バックオフの基準秒数（試行ごとに2倍）と上限秒数
+    backoff_base: float = 1.0
+    backoff_max: float = 30.0
+    # リトライ対象のステータスコード
+    retry_statuses: tuple[int, ...] = (429, 500, 502, 503, 504)
+    # リトライ対象のステータスのレスポンスをリトライするかを判定する関数（Noneの場合はすべてリトライする）
+    retry_response: Optional[Callable[[requests.Response], bool]] = None
+    # 接続エラーをリトライするかを判定する関数（Noneの場合はすべてリトライする）
+    retry_error: Optional[Callable[[requests.exceptions.RequestException], bool]] = None
+
+    @classmethod
+    def from_config(cls, max_retries: Optional[int] = None, idempotent: bool = True) -> "RetryPolicy":
+        """
+        設定からリトライ方針を作成
+
+        Args:
+            max_retries: 最大試行回数（Noneの場合は設定値）
+            idempotent: Falseの場合（POSTなど）は二重に処理されないよう、
+                送信前に失敗した場合（接続の確立に失敗）と429だけをリトライする
+        """
+        policy = cls(
+            max_retries=max_retries if max_retries is not None else config.max_retries,
+            backoff_base=config.http_backoff_base,
+            backoff_max=config.http_backoff_max,
+        )
+        if not idempotent:
+            policy.retry_statuses = (429,)
+            policy.retry_error = is_connect_error
+        return policy
+
+    def backoff(self, attempt: int) -> float:
+        """attempt回目（0始まり）の失敗後の待機秒数（フルジッター）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+
+def is_connect_error(error: requests.exceptions.RequestException) -> bool:
+    """接続の確立に失敗したエラーか（リクエストがサーバーに届いていないため、POSTでも再送できる）"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.exceptions.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+def _parse_retry_after(response: requests.Response) -> Optional[float]:
+    """Retry-Afterヘッダー（秒数またはHTTP日付）の待機秒数（ない場合や解析できない場合はNone）"""
+    value = response.headers.get("Retry-After")
+    if not isinstance(value, str):
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(UTC)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryBudget:
+    """1回の実行全体で消費できるリトライ回数の上限（障害時に全リクエストがリトライし続けるのを防ぐ）"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def try_consume(self) -> bool:
+        """リトライを1回分消費する（予算が尽きている場合はFalse）"""
+        with self._lock:
+            if self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+
+@dataclass
+class _HostStats:
+    requests: int = 0
+    retries: int = 0
+
+
+_retry_budget = RetryBudget(config.http_retry_budget)
+_host_stats: dict[str, _HostStats] = {}
+_stats_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """ホストごとの接続プールを持つ共有セッションを取得"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # リトライはこのモジュールで行うため、urllib3側のリトライは無効にする
+            adapter = HTTPAdapter(
+                pool_connections=config.http_pool_connections,
+                pool_maxsize=config.http_pool_maxsize,
+                max_retries=0,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def reset_retry_budget(limit: Optional[int] = None) -> None:
+    """リトライ予算をリセット（実行の開始時に呼び出す）"""
+    global _retry_budget
+    _retry_budget = RetryBudget(config.http_retry_budget if limit is None else limit)
+
+
+def _record(host: str, retried: bool = False) -> None:
+    with _stats_lock:
+        stats = _host_stats.setdefault(host, _HostStats())
+        if retried:
+            stats.retries += 1
+        else:
+            stats.requests += 1
+
+
+def request(method: str, url: str, retry_policy: Optional[RetryPolicy] = None, **kwargs) -> requests.Response:
+    """
+    共有セッションでHTTPリクエストを送信（接続エラーとリトライ対象のステータスはリトライする）
+
+    リトライ対象のステータスのレスポンスにRetry-Afterがあれば、その秒数だけ待つ
+    （待機の上限 backoff_max を超える場合はリトライせずにレスポンスを返す）
+
+    Args:
+        method: HTTPメソッド
+        url: リクエスト先URL
+        retry_policy: リトライ方針（Noneの場合は設定から作成）
+        **kwargs: requests.Session.requestに渡す引数
+
+    Returns:
+        レスポンス（リトライし尽くした場合はリトライ対象のステータスのレスポンスも返す）
+
+    Raises:
+        requests.exceptions.RequestException: 接続エラーでリトライし尽くした場合
+    """
+    policy = retry_policy or RetryPolicy.from_config()
+    host = urlparse(url).netloc
+    rate_limiter = get_rate_limiter(urlparse(url).hostname or host)
+
+    for attempt in range(policy.max_retries):
+        is_last = attempt == policy.max_retries - 1
+        response = None
+        try:
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            _record(host)
+            response = get_session().request(method, url, **kwargs)
+            if response.status_code not in policy.retry_statuses or is_last:
+                return response
+            if policy.retry_response is not None and not policy.retry_response(response):
+                return response
+            reason = f"ステータスコード={response.status_code}"
+        except requests.exceptions.RequestException as e:
+            if is_last or (policy.retry_error is not None and not policy.retry_error(e)):
+                raise
+            reason = str(e)
+
+        wait_time = policy.backoff(attempt)
+        retry_after = _parse_retry_after(response) if response is not None else None
+        if retry_after is not None:
+            if retry_after > policy.backoff_max:
+                logger.warning(
+                    f"Retry-After（{retry_after:.0f}秒）が待機の上限を超えるため、リトライを中止します: {host}"
+                )
+                return response
+            wait_time = retry_after
+
+        if not _retry_budget.try_consume():
+            logger.warning(f"リトライ予算（{_retry_budget.limit}回）を使い切ったため、リトライを中止します: {host}")
+            if response is not None:
+                return response
+            raise requests.exceptions.RetryError(f"リトライ予算を使い切りました: {reason}")
+
+        _record(host, retried=True)
+        logger.warning(
+            f"リトライ {attempt + 1}/{policy.max_retries} - {wait_time:.1f}秒待機中... ({host}, エラー: {reason})"
+        )
+        time.sleep(wait_time)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """共有セッションでGETリクエストを送信"""
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    """共有セッションでPOSTリクエストを送信（既定では接続の確立に失敗した場合と429だけをリトライする）"""
+    kwargs.setdefault("retry_policy", RetryPolicy.from_config(idempotent=False))
+    return request("POST", url, **kwargs)
+
+
+def get_http_metrics() -> dict[str, dict]:
+    """
+    ホストごとの通信統計を取得
+
+    Returns:
+        ホストをキーにした辞書（requests: リクエスト数、retries: リトライ数、
+        connections: 新規に張った接続数、reused: 接続を再利用したリクエスト数）
+    """
+    connections: dict[str, int] = {}
+    if _session is not None:
+        for adapter in set(_session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    connections[pool.host] = connections.get(pool.host, 0) + pool.num_connections
+
+    metrics = {}
+    with _stats_lock:
+        for host, stats in _host_stats.items():
+            opened = connections.get(urlparse(f"//{host}").hostname, 0)
+            metrics[host] = {
+                "requests": stats.requests,
+                "retries": stats.retries,
+                "connections": opened,
+                "reused": max(stats.requests - opened, 0),
+            }
+    return metrics
+
+
+def log_http_metrics() -> None:
+    """ホストごとの通信統計をログに出力"""
+    for host, stats in get_http_metrics().items():
+        logger.info(
+            f"HTTP統計 {host}: リクエスト{stats['requests']}回、リトライ{stats['retries']}回、"
+            f"新規接続{stats['connections']}回、接続再利用{stats['reused']}回"
+        )
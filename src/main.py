@@ -1,18 +1,43 @@
+import argparse
 import logging
 import sys
+from collections.abc import Callable
+from datetime import date, timedelta
+from typing import Optional
 
+import http_client
+import rate_limiter
 from config import config
+from enricher import enrich_rankings
+from extraction_strategies import log_extraction_stats
 from history_manager import (
-    add_ranking_to_history,
     analyze_ranking_changes,
-    get_previous_rankings,
+    analyze_ranking_windows,
+    compute_ranking_fingerprint,
+    get_entry_fingerprint,
 )
+from history_store import DEFAULT_CATEGORY, HistoryStore, create_history_store
 from notifier import NotifierError, send_main_message, send_thread_message
-from scraper import get_amazon_kindle_ranking_with_data
+from rank_analytics import BookTrajectory, analyze_trajectories
+from scraper import (
+    RankingNotModifiedError,
+    format_ranking_text,
+    get_amazon_kindle_ranking_with_data,
+    get_amazon_kindle_rankings_with_data_by_category,
+    get_kindle_ranking_from_html,
+    get_response_validators,
+)
+from snapshot_archive import load_snapshot
 from summarizer import (
+    CategorySummaryRequest,
+    close_client,
     format_summary_only_message,
+    format_unchanged_message,
+    generate_category_summaries,
     generate_first_ranking_summary,
     generate_ranking_changes_summary,
+    log_latency_stats,
+    log_summary_cache_stats,
 )
 
 # ロガーの設定
@@ -24,65 +49,258 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def main():
+def _fetch_ranking(latest_entry: Optional[dict]) -> tuple[str, list[dict], Optional[dict]]:
+    """
+    ランキングを取得する（前回の取得結果があれば条件付きリクエストを使う）
+
+    Returns:
+        tuple: (表示用文字列, 構造化データのリスト, 取得元ページのETag/Last-Modified)
+    """
+    limit = config.kindle_ranking_limit
+    previous_rankings = latest_entry["rankings"] if latest_entry else []
+    validators = latest_entry.get("validators") if latest_entry else None
+
+    # 前回の件数が今回の指定件数に満たない場合は、304でも再利用できないため通常のリクエストにする
+    if len(previous_rankings) < limit:
+        validators = None
+
     try:
-        # 設定の妥当性を検証
-        config.validate()
+        ranking_text, ranking_data = get_amazon_kindle_ranking_with_data(limit=limit, validators=validators)
+        return ranking_text, ranking_data, get_response_validators() or None
+    except RankingNotModifiedError:
+        logger.info("ランキングページは前回から更新されていません。前回のランキングを再利用します")
+        ranking_data = previous_rankings[:limit]
+        return format_ranking_text(ranking_data), ranking_data, validators
+
+
+def _analyze_windows(
+    store: HistoryStore, ranking_data: list[dict], category: str = DEFAULT_CATEGORY
+) -> dict[int, dict]:
+    """設定された期間（何日前）ごとに、その日の時点で最新だった履歴と今回のランキングを比較する"""
+    today = date.today()
+    baselines = {
+        days: store.get_entry_at((today - timedelta(days=days)).isoformat(), category)
+        for days in config.diff_window_days
+    }
+    window_analyses = analyze_ranking_windows(ranking_data, baselines)
+    if window_analyses:
+        logger.info(f"期間ごとの比較: {', '.join(f'{days}日前' for days in window_analyses)}")
+    return window_analyses
+
+
+def _analyze_trajectories(
+    store: HistoryStore, ranking_data: list[dict], category: str = DEFAULT_CATEGORY
+) -> list[BookTrajectory]:
+    """直近の履歴と今回のランキングから、今回ランクインした書籍の順位の推移を分析する"""
+    if config.trajectory_history_limit == 0:
+        return []
+    history = store.load_history(limit=config.trajectory_history_limit, category=category)
+    trajectories = analyze_trajectories(history, ranking_data)
+    logger.info(f"順位の推移を分析しました: {len(trajectories)}冊、{len(history) + 1}回分")
+    return trajectories
+
+
+def _save_ranking(store: HistoryStore, ranking_data: list[dict], validators: Optional[dict]) -> None:
+    """ランキングを履歴に追加し、保存期間を過ぎた履歴を集約する"""
+    store.add_ranking(ranking_data, validators)
+    logger.info("ランキングデータを履歴に追加しました")
+    store.apply_retention()
+
+
+def _load_replay_ranking(snapshot: str) -> tuple[str, list[dict]]:
+    """保存済みのページからランキングを取得する（ネットワーク不要）"""
+    # latestはメインのランキングの1ページ目（2ページ目やカテゴリ別のページを除く）
+    content = load_snapshot(config.snapshot_archive_dir, snapshot, url=config.kindle_ranking_url)
+    logger.info(f"保存済みのページを読み込みました: {snapshot}（{len(content):,}バイト）")
+    return get_kindle_ranking_from_html(content, limit=config.kindle_ranking_limit)
+
+
+def _print_notifications(main_message: str, ranking_text: str) -> None:
+    """リプレイ時はDiscordに送信せず、送信内容を標準出力に表示"""
+    print(main_message)
+    print("\n---\n")
+    print(ranking_text)
+
+
+def _send_notifications(main_message: str, ranking_text: str) -> None:
+    """メインチャンネルに要約を、スレッドにランキング詳細を送信"""
+    logger.info("Discordへの送信を開始します...")
+
+    # メインチャンネルに要約を送信
+    send_main_message(main_message)
+    logger.info("メインチャンネルへの要約送信完了")
+
+    # スレッドにランキング詳細を送信
+    try:
+        send_thread_message(ranking_text)
+        logger.info("スレッドへのランキング送信完了")
+    except NotifierError as e:
+        logger.warning(f"スレッドへの送信に失敗しました: {e}")
+        logger.info("フォールバック: メインチャンネルにランキング詳細も送信します")
+        fallback_message = f"⚠️ **スレッド送信失敗のため、ここにランキング詳細を表示します**\n\n{ranking_text}"
+        send_main_message(fallback_message)
+
+
+def _run_ranking(
+    store: HistoryStore, replay: Optional[str], save_history: bool, notify: Callable[[str, str], None]
+) -> None:
+    """メインのランキングを取得し、前回と比較して要約を生成・通知する"""
+    # Kindleランキング情報を取得（構造化データも含む）
+    latest_entry = store.get_latest_entry()
+    if replay:
+        ranking_text, ranking_data = _load_replay_ranking(replay)
+        validators = None
+    else:
+        ranking_text, ranking_data, validators = _fetch_ranking(latest_entry)
+    logger.info(f"ランキング取得成功: {len(ranking_text)}文字")
+
+    # 商品詳細を追加（リプレイ時はネットワークを使わないため行わない）
+    if config.enable_detail_enrichment and not replay:
+        ranking_data = enrich_rankings(ranking_data)
+
+    # 前回とランキングが同じ場合は要約（LLM呼び出し）を省略する
+    unchanged = latest_entry is not None and compute_ranking_fingerprint(ranking_data) == get_entry_fingerprint(
+        latest_entry
+    )
+    if unchanged and config.unchanged_ranking_policy != "full":
+        logger.info(f"ランキングは前回から変動していません（方針: {config.unchanged_ranking_policy}）")
+        if save_history:
+            _save_ranking(store, ranking_data, validators)
+
+        if config.unchanged_ranking_policy == "notify":
+            notify(format_unchanged_message(), ranking_text)
+        else:
+            logger.info("変動がないため、Discordへの送信を省略します")
+
+        return
+
+    # 履歴から前回のランキングを取得
+    previous_rankings = store.get_previous_rankings()
+
+    # Gemini APIで要約を生成（設定が有効な場合）
+    summary = None
+    if config.enable_gemini_summary:
+        logger.info("Gemini要約機能が有効です...")
+        # リプレイ時はネットワークを使わないため、キャッシュにある要約だけを使う
+        cache_only = bool(replay)
+        if cache_only:
+            logger.info("リプレイ時はGemini APIを呼び出さず、キャッシュにある要約のみを使います")
+
+        if previous_rankings:
+            # 前回のデータがある場合は変化を分析
+            logger.info("前回のランキングデータが存在します。変化を分析中...")
+            changes_analysis = analyze_ranking_changes(ranking_data, previous_rankings)
+            window_analyses = _analyze_windows(store, ranking_data)
+            trajectories = _analyze_trajectories(store, ranking_data)
+            summary = generate_ranking_changes_summary(
+                changes_analysis, ranking_data, window_analyses, trajectories, cache_only=cache_only
+            )
+        else:
+            # 初回実行の場合は通常の要約
+            logger.info("初回実行のため、通常の要約を生成します...")
+            summary = generate_first_ranking_summary(ranking_data, cache_only=cache_only)
+
+        if summary:
+            logger.info(f"要約生成成功: {len(summary)}文字")
+        else:
+            logger.warning("要約生成に失敗しました（従来のランキングのみ送信）")
+
+    # ランキングデータを履歴に保存
+    if save_history:
+        _save_ranking(store, ranking_data, validators)
+
+    # メインメッセージ（要約のみ）を作成
+    main_message = format_summary_only_message(summary)
+    logger.info(f"メインメッセージ作成完了: {len(main_message)}文字")
+
+    # Discordに送信（リプレイ時は表示のみ）
+    notify(main_message, ranking_text)
+
+
+def _run_category_rankings(store: HistoryStore, save_history: bool, notify: Callable[[str, str], None]) -> None:
+    """KINDLE_CATEGORY_URLSのカテゴリごとにランキングを取得し、カテゴリごとの履歴と比較して要約を生成・通知する"""
+    logger.info(f"カテゴリ別ランキングの取得を開始します: {len(config.kindle_category_urls)}件")
+    results = get_amazon_kindle_rankings_with_data_by_category(
+        config.kindle_category_urls, limit=config.kindle_ranking_limit, max_retries=config.max_retries
+    )
+
+    requests: dict[str, CategorySummaryRequest] = {}
+    for category, (ranking_text, ranking_data) in results.items():
+        latest_entry = store.get_latest_entry(category)
+        unchanged = latest_entry is not None and compute_ranking_fingerprint(ranking_data) == get_entry_fingerprint(
+            latest_entry
+        )
+        if unchanged and config.unchanged_ranking_policy != "full":
+            logger.info(f"カテゴリ {category} のランキングは前回から変動していません")
+            if save_history:
+                store.add_ranking(ranking_data, category=category)
+            if config.unchanged_ranking_policy == "notify":
+                notify(format_unchanged_message(category), ranking_text)
+            continue
+
+        previous_rankings = store.get_previous_rankings(category)
+        if previous_rankings:
+            requests[category] = CategorySummaryRequest(
+                rankings=ranking_data,
+                changes_analysis=analyze_ranking_changes(ranking_data, previous_rankings),
+                window_analyses=_analyze_windows(store, ranking_data, category),
+                trajectories=_analyze_trajectories(store, ranking_data, category),
+            )
+        else:
+            requests[category] = CategorySummaryRequest(rankings=ranking_data)
+
+    # 全カテゴリの要約をまとめて生成（GEMINI_BATCH_SUMMARIES=trueの場合は1回のAPI呼び出し）
+    summaries: dict[str, Optional[str]] = {}
+    if config.enable_gemini_summary and requests:
+        summaries = generate_category_summaries(requests)
+
+    for category, request in requests.items():
+        if save_history:
+            store.add_ranking(request.rankings, category=category)
+        notify(format_summary_only_message(summaries.get(category), category), results[category][0])
+    logger.info(f"カテゴリ別ランキングの処理が完了しました: {len(results)}件")
+
+
+def _parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Kindle売れ筋ランキングを取得してDiscordに通知")
+    parser.add_argument(
+        "--replay",
+        metavar="SNAPSHOT",
+        help="保存済みのページ（ファイルパス、ダイジェスト、latest）からネットワークを使わずに実行し、結果を表示",
+    )
+    parser.add_argument(
+        "--history-file",
+        metavar="PATH",
+        help="履歴ファイル（HISTORY_BACKEND=sqliteの場合はデータベース）のパス（--replay時はこのオプションを指定した場合のみ履歴を保存）",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None):
+    args = _parse_args(argv)
+    store = None
+
+    try:
+        # 設定の妥当性を検証（リプレイ時はDiscordに送信せず、Gemini APIも呼び出さない）
+        config.validate(require_webhook=not args.replay, require_gemini_api_key=not args.replay)
+
+        store = create_history_store(args.history_file)
+
+        # リトライ予算は1回の実行単位で管理する
+        http_client.reset_retry_budget()
+
+        # リプレイ時は本番の履歴を書き換えないよう、履歴ファイルが指定された場合のみ保存する
+        save_history = not args.replay or bool(args.history_file)
+        notify = _print_notifications if args.replay else _send_notifications
 
         logger.info("Kindleランキング取得処理を開始します...")
         logger.info(f"ランキング取得件数: {config.kindle_ranking_limit}")
 
-        # Kindleランキング情報を取得（構造化データも含む）
-        ranking_text, ranking_data = get_amazon_kindle_ranking_with_data(limit=config.kindle_ranking_limit)
-        logger.info(f"ランキング取得成功: {len(ranking_text)}文字")
-
-        # 履歴から前回のランキングを取得
-        previous_rankings = get_previous_rankings()
-
-        # Gemini APIで要約を生成（設定が有効な場合）
-        summary = None
-        if config.enable_gemini_summary:
-            logger.info("Gemini要約機能が有効です...")
-
-            if previous_rankings:
-                # 前回のデータがある場合は変化を分析
-                logger.info("前回のランキングデータが存在します。変化を分析中...")
-                changes_analysis = analyze_ranking_changes(ranking_data, previous_rankings)
-                summary = generate_ranking_changes_summary(changes_analysis, ranking_text)
-            else:
-                # 初回実行の場合は通常の要約
-                logger.info("初回実行のため、通常の要約を生成します...")
-                summary = generate_first_ranking_summary(ranking_text)
-
-            if summary:
-                logger.info(f"要約生成成功: {len(summary)}文字")
-            else:
-                logger.warning("要約生成に失敗しました（従来のランキングのみ送信）")
-
-        # ランキングデータを履歴に保存
-        add_ranking_to_history(ranking_data)
-        logger.info("ランキングデータを履歴に保存しました")
-
-        # メインメッセージ（要約のみ）を作成
-        main_message = format_summary_only_message(summary)
-        logger.info(f"メインメッセージ作成完了: {len(main_message)}文字")
-
-        # Discordに送信
-        logger.info("Discordへの送信を開始します...")
-
-        # メインチャンネルに要約を送信
-        send_main_message(main_message)
-        logger.info("メインチャンネルへの要約送信完了")
-
-        # スレッドにランキング詳細を送信
-        try:
-            send_thread_message(ranking_text)
-            logger.info("スレッドへのランキング送信完了")
-        except NotifierError as e:
-            logger.warning(f"スレッドへの送信に失敗しました: {e}")
-            logger.info("フォールバック: メインチャンネルにランキング詳細も送信します")
-            fallback_message = f"⚠️ **スレッド送信失敗のため、ここにランキング詳細を表示します**\n\n{ranking_text}"
-            send_main_message(fallback_message)
+        _run_ranking(store, args.replay, save_history, notify)
+
+        # カテゴリ別のランキング（リプレイ時は保存済みのページがないため行わない）
+        if config.kindle_category_urls and not args.replay:
+            _run_category_rankings(store, save_history, notify)
 
         logger.info("処理が正常に完了しました")
 
@@ -93,6 +311,21 @@ def main():
         # GitHub Actionsのワークフローを失敗させる
         sys.exit(1)
 
+    finally:
+        # 履歴は実行の最後に1回だけ書き込む
+        if store is not None:
+            try:
+                store.close()
+            except Exception as e:
+                logger.error(f"履歴の保存でエラーが発生しました - {type(e).__name__}: {str(e)}")
+                sys.exit(1)
+        http_client.log_http_metrics()
+        rate_limiter.log_rate_limit_stats()
+        log_extraction_stats()
+        log_summary_cache_stats()
+        log_latency_stats()
+        close_client()
+
 
 if __name__ == "__main__":
     main()
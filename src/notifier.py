@@ -4,6 +4,7 @@ from typing import Optional
 
 import requests
 
+import http_client
 from config import config
 
 logger = logging.getLogger(__name__)
@@ -43,7 +44,9 @@ def send_discord_message(message: str, thread_id: Optional[str] = None) -> None:
 
     try:
         # POSTリクエストを送信
-        response = requests.post(webhook_url, headers=headers, data=json.dumps(payload), timeout=config.request_timeout)
+        response = http_client.post(
+            webhook_url, headers=headers, data=json.dumps(payload), timeout=config.request_timeout
+        )
 
         # 結果を表示
         if response.status_code in (200, 204):
@@ -0,0 +1,135 @@
+"""
+ランキングの構造化データからGemini API用のプロンプトを組み立てるモジュール
+書籍ごとに1行の要約行（URLなどの要約に不要な項目は省く）を作り、
+新規ランクイン・大きな順位変動・上位N位の順に、トークン数の予算に収まるだけ詰め込む
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+from history_manager import ranking_key
+
+# 「大きな順位変動」とみなす順位の変化
+BIG_CHANGE_THRESHOLD = 3
+
+# この文字コード以上の文字（かな・漢字・全角記号など）は1文字1トークンとして数える
+_WIDE_CHAR_START = 0x2E80
+# それ以外の文字（英数字・記号・空白）は何文字で1トークンとして数えるか
+_NARROW_CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class BuiltPrompt:
+    """組み立てたプロンプト"""
+
+    text: str
+    # 推定トークン数（estimate_tokens）
+    tokens: int
+    # プロンプトに含めた書籍数と、ランキング全体の書籍数
+    rows: int
+    total_rows: int
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    テキストのトークン数を推定（APIを呼び出さずに概算する）
+
+    日本語の文字は1文字1トークン、英数字などは4文字1トークンとして数える。
+    実際のトークン数は応答の usage_metadata で確認できる
+
+    Args:
+        text: 対象のテキスト
+
+    Returns:
+        推定トークン数
+    """
+    wide = sum(1 for char in text if ord(char) >= _WIDE_CHAR_START)
+    return wide + math.ceil((len(text) - wide) / _NARROW_CHARS_PER_TOKEN)
+
+
+def format_ranking_row(item: dict) -> str:
+    """
+    書籍を要約用の1行に整形（URLは含めない）
+
+    Args:
+        item: ランキングデータの1件（商品詳細を追加済みの場合は著者・カテゴリも含める）
+
+    Returns:
+        "1位 タイトル / 著者 / ⭐️4.5(1,234件) / ¥500 / カテゴリ" の形式の文字列
+    """
+    parts = [f"{item['rank']}位 {item['title']}"]
+    if item.get("author"):
+        parts.append(item["author"])
+    if item.get("rating") and item.get("review_count"):
+        parts.append(f"⭐️{item['rating']}({item['review_count']:,}件)")
+    if item.get("price") and item["price"] != "価格不明":
+        parts.append(item["price"])
+    if item.get("categories"):
+        # パンくずの末尾（最も細かいカテゴリ）だけを使う
+        parts.append(item["categories"][-1])
+    return " / ".join(parts)
+
+
+def prioritize_rankings(rankings: list[dict], changes_analysis: Optional[dict] = None, top_n: int = 5) -> list[dict]:
+    """
+    プロンプトに含める優先順に書籍を並べる
+
+    新規ランクイン（順位順）、大きな順位変動（変動幅の大きい順）、上位N位、残り（順位順）の順
+
+    Args:
+        rankings: 今回のランキングデータ
+        changes_analysis: 変化分析の結果（Noneの場合は順位順）
+        top_n: 優先する上位の件数
+
+    Returns:
+        並べ替えたランキングデータ
+    """
+    by_rank = sorted(rankings, key=lambda item: item["rank"])
+    priorities: dict[str, int] = {}
+    if changes_analysis:
+        for entry in sorted(changes_analysis["new_entries"], key=lambda entry: entry["rank"]):
+            priorities.setdefault(entry.get("key") or ranking_key(entry), len(priorities))
+        big_changes = [c for c in changes_analysis["rank_changes"] if abs(c["change"]) >= BIG_CHANGE_THRESHOLD]
+        for change in sorted(big_changes, key=lambda c: abs(c["change"]), reverse=True):
+            priorities.setdefault(change.get("key") or ranking_key(change), len(priorities))
+    for item in by_rank[:top_n]:
+        priorities.setdefault(ranking_key(item), len(priorities))
+
+    # 優先する書籍の後は順位順（sortedは安定ソートなので同じ優先度の書籍は順位順のまま）
+    return sorted(by_rank, key=lambda item: priorities.get(ranking_key(item), len(priorities)))
+
+
+def build_ranking_prompt(
+    template: str, ranking_field: str, rankings: list[dict], token_budget: int, **fields: str
+) -> BuiltPrompt:
+    """
+    テンプレートにランキングの要約行を予算内に収まるだけ詰め込んでプロンプトを作成
+
+    要約行は rankings の順（優先順）に追加し、予算を超える行は飛ばす。プロンプトの中では順位順に並べる
+
+    Args:
+        template: プロンプトのテンプレート
+        ranking_field: ランキングの要約行を埋め込むテンプレートのフィールド名
+        rankings: 優先順に並べたランキングデータ（prioritize_rankings）
+        token_budget: プロンプト全体の推定トークン数の上限（0の場合は全件を含める）
+        **fields: テンプレートのその他のフィールドの値
+
+    Returns:
+        組み立てたプロンプト
+    """
+    rows = [(item["rank"], format_ranking_row(item)) for item in rankings]
+    if token_budget > 0:
+        # 行は改行で区切るため、1行あたり改行1文字分を加えて数える
+        remaining = token_budget - estimate_tokens(template.format(**fields, **{ranking_field: ""}))
+        selected = []
+        for rank, row in rows:
+            cost = estimate_tokens(row + "\n")
+            if cost <= remaining:
+                selected.append((rank, row))
+                remaining -= cost
+        rows = selected
+
+    ranking_text = "\n".join(row for _, row in sorted(rows, key=lambda row: row[0]))
+    text = template.format(**fields, **{ranking_field: ranking_text})
+    return BuiltPrompt(text=text, tokens=estimate_tokens(text), rows=len(rows), total_rows=len(rankings))
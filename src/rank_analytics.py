@@ -0,0 +1,175 @@
+"""
+ランキング履歴から書籍ごとの順位の推移を分析するモジュール
+履歴を「書籍 × スナップショット」の順位の行列（ランク外は0）にまとめ、
+ランクイン日数・最高順位・平均順位・順位の変化速度・最長連続ランクイン日数・最高順位までの日数を
+行列演算でまとめて計算する
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+from history_manager import ranking_key
+
+# ランク外を表す値（順位は1以上）
+NOT_RANKED = 0
+
+
+@dataclass
+class RankMatrix:
+    """書籍 × スナップショットの順位の行列"""
+
+    # 書籍のキー（ranking_key）とタイトル（最新の表記）
+    keys: list[str]
+    titles: list[str]
+    # スナップショットのタイムスタンプ（古い順）
+    timestamps: list[str]
+    # 順位（行: 書籍、列: スナップショット、ランク外はNOT_RANKED）
+    ranks: np.ndarray
+
+
+@dataclass(frozen=True)
+class BookTrajectory:
+    """書籍の順位の推移の指標"""
+
+    key: str
+    title: str
+    # ランクインした日数（同じ日の複数のスナップショットは1日と数える）
+    days_in_chart: int
+    best_rank: int
+    average_rank: float
+    # 1日あたりの順位の変化（正の値は上昇）
+    velocity: float
+    # 連続してランクインした最長の日数（スナップショットのある日を連続とみなす）
+    longest_streak: int
+    # 初めてランクインしてから最高順位に達するまでの日数
+    days_to_peak: float
+
+
+def build_rank_matrix(history: list[dict]) -> RankMatrix:
+    """
+    履歴から順位の行列を作成
+
+    Args:
+        history: 履歴エントリのリスト（順不同）
+
+    Returns:
+        スナップショットを古い順に並べた順位の行列
+    """
+    entries = sorted(history, key=lambda entry: entry["timestamp"])
+    index: dict[str, int] = {}
+    titles: list[str] = []
+    rows, cols, values = [], [], []
+    for col, entry in enumerate(entries):
+        for item in entry["rankings"]:
+            key = ranking_key(item)
+            row = index.setdefault(key, len(index))
+            if row == len(titles):
+                titles.append(item["title"])
+            else:
+                titles[row] = item["title"]
+            rows.append(row)
+            cols.append(col)
+            values.append(item["rank"])
+
+    # 同じスナップショットに重複した書籍は上位の順位を残す
+    unranked = np.iinfo(np.int32).max
+    ranks = np.full((len(index), len(entries)), unranked, dtype=np.int32)
+    np.minimum.at(ranks, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), values)
+    ranks[ranks == unranked] = NOT_RANKED
+    return RankMatrix(list(index), titles, [entry["timestamp"] for entry in entries], ranks)
+
+
+def _elapsed_days(timestamps: list[str]) -> np.ndarray:
+    """最初のスナップショットからの経過日数"""
+    seconds = np.array([datetime.fromisoformat(timestamp).timestamp() for timestamp in timestamps])
+    return (seconds - seconds[0]) / 86400 if len(seconds) else seconds
+
+
+def _daily_mask(matrix: RankMatrix, ranked: np.ndarray) -> np.ndarray:
+    """スナップショットごとのランクインの有無を日ごとにまとめる（書籍 × 日）"""
+    days = np.array([timestamp[:10] for timestamp in matrix.timestamps])
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    return np.maximum.reduceat(ranked, starts, axis=1)
+
+
+def _longest_runs(mask: np.ndarray) -> np.ndarray:
+    """行ごとにTrueが連続する最長の長さ"""
+    counts = np.cumsum(mask, axis=1)
+    # Falseの位置でのカウントを繰り越し、そこからの増分を連続の長さとする
+    resets = np.maximum.accumulate(np.where(mask, 0, counts), axis=1)
+    return (counts - resets).max(axis=1)
+
+
+def compute_trajectories(matrix: RankMatrix) -> list[BookTrajectory]:
+    """
+    書籍ごとの順位の推移の指標を計算
+
+    Args:
+        matrix: 順位の行列
+
+    Returns:
+        書籍ごとの指標のリスト（行列の行の順）
+    """
+    if matrix.ranks.size == 0:
+        return []
+
+    ranks = matrix.ranks
+    ranked = ranks != NOT_RANKED
+    counts = ranked.sum(axis=1)
+    elapsed = _elapsed_days(matrix.timestamps)
+
+    best = np.where(ranked, ranks, np.iinfo(ranks.dtype).max).min(axis=1)
+    average = ranks.sum(axis=1) / counts
+
+    # ランクインしたスナップショットの順位を経過日数で回帰した傾き（順位は小さいほど上位なので符号を反転）
+    weights = ranked.astype(float)
+    sum_x = weights @ elapsed
+    sum_y = (weights * ranks).sum(axis=1)
+    sum_xx = weights @ (elapsed**2)
+    sum_xy = (weights * ranks) @ elapsed
+    denominator = counts * sum_xx - sum_x**2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(denominator > 0, (counts * sum_xy - sum_x * sum_y) / denominator, 0.0)
+    velocity = 0.0 - slope
+
+    first_seen = ranked.argmax(axis=1)
+    first_peak = (ranked & (ranks == best[:, None])).argmax(axis=1)
+    days_to_peak = elapsed[first_peak] - elapsed[first_seen]
+
+    daily = _daily_mask(matrix, ranked)
+    days_in_chart = daily.sum(axis=1)
+    streaks = _longest_runs(daily)
+
+    return [
+        BookTrajectory(
+            key=key,
+            title=title,
+            days_in_chart=int(days_in_chart[row]),
+            best_rank=int(best[row]),
+            average_rank=float(average[row]),
+            velocity=float(velocity[row]),
+            longest_streak=int(streaks[row]),
+            days_to_peak=float(days_to_peak[row]),
+        )
+        for row, (key, title) in enumerate(zip(matrix.keys, matrix.titles, strict=True))
+    ]
+
+
+def analyze_trajectories(history: list[dict], current: list[dict]) -> list[BookTrajectory]:
+    """
+    現在のランキングの書籍について、履歴と今回のランキングから順位の推移の指標を計算
+
+    Args:
+        history: 履歴エントリのリスト（今回のランキングは含まない）
+        current: 今回のランキングデータ
+
+    Returns:
+        今回のランキングの順に並べた書籍ごとの指標
+    """
+    current_entry = {"timestamp": datetime.now().isoformat(), "rankings": current}
+    matrix = build_rank_matrix([*history, current_entry])
+    trajectories = {trajectory.key: trajectory for trajectory in compute_trajectories(matrix)}
+    keys = dict.fromkeys(ranking_key(item) for item in current)
+    return [trajectories[key] for key in keys]
@@ -0,0 +1,127 @@
+"""
+ホストごとのリクエスト数を制限するトークンバケットを管理するモジュール
+プロセス全体で1つのバケットをホストごとに共有し、スレッドからもasyncioからも利用できる
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+_buckets: dict[str, "TokenBucket"] = {}
+_buckets_lock = threading.Lock()
+
+
+@dataclass
+class RateLimitStats:
+    """待機時間の統計"""
+
+    acquisitions: int = 0
+    waits: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.acquisitions if self.acquisitions else 0.0
+
+
+class TokenBucket:
+    """
+    トークンバケットによるレート制限
+
+    トークンを先に予約してから待機するため、待機中にロックを保持せず、
+    スレッドとasyncioのどちらの呼び出し元が混在しても予約順に間隔が空く
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: 1秒あたりに補充されるトークン数（定常時の最大リクエスト数/秒）
+            capacity: バケットの容量（連続して送れる最大リクエスト数）
+        """
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate は0より大きく、capacity は1以上である必要があります")
+        self.rate = rate
+        self.capacity = capacity
+        self.stats = RateLimitStats()
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """トークンを1つ予約し、使えるようになるまでの待機秒数を返す"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            wait = max(0.0, -self._tokens / self.rate)
+
+            self.stats.acquisitions += 1
+            if wait > 0:
+                self.stats.waits += 1
+                self.stats.total_wait += wait
+                self.stats.max_wait = max(self.stats.max_wait, wait)
+            return wait
+
+    def acquire(self) -> float:
+        """
+        トークンを1つ取得する（必要な場合はスレッドを待機させる）
+
+        Returns:
+            待機した秒数
+        """
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        """
+        トークンを1つ取得する（必要な場合はイベントループをブロックせずに待機する）
+
+        Returns:
+            待機した秒数
+        """
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+def get_rate_limiter(host: str) -> Optional[TokenBucket]:
+    """
+    ホストのレート制限を取得（同じホストにはプロセス全体で同じバケットを返す）
+
+    Returns:
+        トークンバケット（制限が設定されていないホストはNone）
+    """
+    limit = config.rate_limits.get(host)
+    if limit is None:
+        return None
+    with _buckets_lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket(*limit)
+        return _buckets[host]
+
+
+def get_rate_limit_stats() -> dict[str, RateLimitStats]:
+    """ホストごとの待機時間の統計を取得"""
+    with _buckets_lock:
+        return {host: bucket.stats for host, bucket in _buckets.items()}
+
+
+def log_rate_limit_stats() -> None:
+    """ホストごとの待機時間の統計をログに出力"""
+    for host, stats in get_rate_limit_stats().items():
+        logger.info(
+            f"レート制限 {host}: 取得{stats.acquisitions}回、待機{stats.waits}回、"
+            f"合計待機{stats.total_wait:.2f}秒、平均{stats.average_wait:.2f}秒、最大{stats.max_wait:.2f}秒"
+        )
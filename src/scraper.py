@@ -1,13 +1,26 @@
+import codecs
+import importlib.util
+import itertools
 import logging
+import math
 import re
-import time
-from dataclasses import dataclass
+import threading
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, fields
+from html.parser import HTMLParser
 from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlparse
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
+import http_client
+from circuit_breaker import CircuitBreaker, get_circuit_breaker
 from config import config
+from extraction_strategies import extract_field, layout_fingerprint
+from snapshot_archive import archive_page
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +34,62 @@ REQUEST_HEADERS = {
     "Upgrade-Insecure-Requests": "1",
 }
 
+# ランキング1ページあたりの件数と取得するページ数の上限（上位100位まで）
+RANKING_PAGE_SIZE = 50
+MAX_RANKING_PAGES = 2
+
+# 商品グリッドのセル（解析時はこの要素の部分木だけをツリーに展開する）
+GRID_CELL_CLASS = "_cDEzb_grid-cell_1uMOS"
+
+# lxmlはオプション依存のため、インストールされている場合のみ使用する
+_LXML_AVAILABLE = importlib.util.find_spec("lxml") is not None
+
+# ホストごとの同時接続数を制限するセマフォ
+_host_semaphores: dict[str, threading.BoundedSemaphore] = {}
+_host_semaphores_lock = threading.Lock()
+
+# ロボット確認（CAPTCHA）などのブロックページにだけ含まれる文字列（解析前に生のバイト列から検出する）
+_BLOCK_PAGE_MARKERS = (
+    b"/errors/validateCaptcha",
+    b'id="captchacharacters"',
+    b"api-services-support@amazon.com",
+    "ロボットでないことを確認".encode(),
+)
+
+# ストリーミング解析で一度に読み込むバイト数と、ブロックページの判定に使う先頭のバイト数
+_STREAM_CHUNK_SIZE = 16 * 1024
+_BLOCK_PAGE_SCAN_BYTES = 64 * 1024
+# 逐次解析時に文字コードを判定するためのContent-Typeと<meta>のcharset
+_HEADER_CHARSET_PATTERN = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+_META_CHARSET_PATTERN = re.compile(rb"<meta[^>]+charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+
+# 条件付きリクエスト用に、URLごとの直近のETag/Last-Modifiedを保持する
+_response_validators: dict[str, dict] = {}
+
+
+class ScraperError(Exception):
+    """Scraper関連のエラーの基底クラス"""
+
+    pass
+
+
+class RankingNotModifiedError(ScraperError):
+    """条件付きリクエストでページが前回から更新されていない（304 Not Modified）"""
+
+    pass
+
+
+class BlockedPageError(ScraperError):
+    """Amazonがロボット確認などのブロックページを返した"""
+
+    pass
+
+
+class CircuitOpenError(ScraperError):
+    """ブロックを検出したホストへのリクエストをクールダウン中のため送らなかった"""
+
+    pass
+
 
 @dataclass
 class KindleBook:
@@ -33,6 +102,11 @@ class KindleBook:
     price: str = "価格不明"
     url: str = "URLなし"
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "KindleBook":
+        """構造化データ（履歴に保存した辞書）からKindleBookオブジェクトを作成"""
+        return cls(**{f.name: data[f.name] for f in fields(cls) if f.name in data})
+
     def to_string(self) -> str:
         """LINEメッセージ用の文字列に変換"""
         lines = [f"{self.rank}位|{self.title}"]
@@ -48,72 +122,276 @@ class KindleBook:
         return "\n".join(lines)
 
 
-def _fetch_amazon_page(max_retries: int = None) -> BeautifulSoup:
-    """AmazonランキングページをHTTPリクエストで取得"""
+def _get_host_semaphore(host: str) -> threading.BoundedSemaphore:
+    """ホストごとの同時接続数を制限するセマフォを取得"""
+    with _host_semaphores_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(config.max_requests_per_host)
+        return _host_semaphores[host]
+
+
+def _build_page_url(url: str, page: int) -> str:
+    """ランキングの指定ページのURLを作成（1ページ目は元のURLのまま）"""
+    if page == 1:
+        return url
+    parts = urlparse(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key != "pg"]
+    query.append(("pg", str(page)))
+    return parts._replace(query=urlencode(query)).geturl()
+
+
+def _open_circuit(host: str) -> CircuitBreaker:
+    """ホストのサーキットブレーカーを取得（開いている場合はCircuitOpenErrorを送出）"""
+    breaker = get_circuit_breaker(host)
+    if not breaker.allow_request():
+        raise CircuitOpenError(
+            f"{host} でブロックを検出したため、リクエストを停止しています（残り{breaker.remaining_cooldown():.0f}秒）: "
+            f"{breaker.last_reason}"
+        )
+    return breaker
+
+
+def _send_request(
+    url: str, headers: dict, max_retries: int, breaker: CircuitBreaker, stream: bool = False
+) -> requests.Response:
+    """ホストの同時接続数を制限してリクエストを送信（失敗した場合はScraperErrorを送出）"""
+    retry_policy = http_client.RetryPolicy.from_config(max_retries)
+    retry_policy.retry_response = _is_retryable_response
+    try:
+        with _get_host_semaphore(urlparse(url).netloc):
+            return http_client.get(
+                url, headers=headers, timeout=config.request_timeout, retry_policy=retry_policy, stream=stream
+            )
+    except requests.exceptions.RequestException as e:
+        breaker.release()
+        raise ScraperError(f"スクレイピングに失敗しました（{max_retries}回試行）: {str(e)}") from e
+
+
+def _is_retryable_response(response: requests.Response) -> bool:
+    """エラーステータスで返されたブロックページはリトライしても同じため、リトライしない"""
+    return _detect_block_page(response.content) is None
+
+
+def _verify_response(
+    host: str, breaker: CircuitBreaker, response: requests.Response, content: bytes, max_retries: int
+) -> None:
+    """
+    ブロックページとエラーステータスを検出し、結果をサーキットブレーカーに記録
+
+    Args:
+        content: ブロックページの判定に使う本文（ストリーミング時は先頭部分）
+    """
+    reason = _detect_block_page(content)
+    if reason:
+        breaker.record_failure(reason)
+        if breaker.state == breaker.OPEN:
+            logger.warning(
+                f"ブロックページを検出したため、{host} へのリクエストを{breaker.cooldown_seconds:.0f}秒停止します"
+            )
+        raise BlockedPageError(
+            f"Amazonがブロックページを返しました（ステータスコード={response.status_code}）: {reason}"
+        )
+
+    try:
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        breaker.release()
+        raise ScraperError(f"スクレイピングに失敗しました（{max_retries}回試行）: {str(e)}") from e
+
+    breaker.record_success()
+
+
+def request_page(url: str, headers: dict, max_retries: Optional[int] = None) -> requests.Response:
+    """
+    ホストのサーキットブレーカーを通してAmazonのページを取得（ランキングと商品ページの取得で共用する）
+
+    ブロックページは解析前に生のバイト列から検出してBlockedPageErrorを送出し、ホストのサーキットブレーカーを開く
+
+    Returns:
+        レスポンス（304の場合もそのまま返す）
+
+    Raises:
+        CircuitOpenError: ホストのサーキットブレーカーが開いている場合（リクエストは送らない）
+        BlockedPageError: ブロックページが返された場合
+        ScraperError: 通信に失敗した場合
+    """
     if max_retries is None:
         max_retries = config.max_retries
 
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(config.kindle_ranking_url, headers=REQUEST_HEADERS, timeout=config.request_timeout)
-            response.raise_for_status()
-            return BeautifulSoup(response.content, "html.parser")
-        except requests.exceptions.RequestException as e:
-            if attempt == max_retries - 1:
-                raise Exception(f"スクレイピングに失敗しました（{max_retries}回試行）: {str(e)}") from e
+    host = urlparse(url).netloc
+    breaker = _open_circuit(host)
+    response = _send_request(url, headers, max_retries, breaker)
+    _verify_response(host, breaker, response, response.content, max_retries)
+    return response
 
-            # 指数バックオフ（1秒、2秒、4秒...）
-            wait_time = 2**attempt
-            logger.warning(f"リトライ {attempt + 1}/{max_retries} - {wait_time}秒待機中... (エラー: {str(e)})")
-            time.sleep(wait_time)
 
+def _request_page_stream(
+    url: str, headers: dict, max_retries: Optional[int] = None
+) -> tuple[requests.Response, Iterator[bytes]]:
+    """
+    ホストのサーキットブレーカーを通してAmazonのページを本文を読み込まずに取得
 
-def _extract_product_id(item) -> Optional[str]:
-    """商品IDを抽出"""
-    url_div = item.find("div", class_="p13n-sc-uncoverable-faceout")
-    product_id = url_div.get("id") if url_div else None
+    ブロックページは本文の先頭（_BLOCK_PAGE_SCAN_BYTES）だけを読んで判定する
 
-    # IDが取得できない場合は、data-asin属性も試す
-    if not product_id:
-        parent_div = item.find("div", {"data-asin": True})
-        if parent_div:
-            product_id = parent_div.get("data-asin")
+    Returns:
+        レスポンスと、先頭部分を含む本文のチャンクのイテレーター
 
-    return product_id
+    Raises:
+        request_pageと同じ
+    """
+    if max_retries is None:
+        max_retries = config.max_retries
 
+    host = urlparse(url).netloc
+    breaker = _open_circuit(host)
+    response = _send_request(url, headers, max_retries, breaker, stream=True)
+    try:
+        chunks = response.iter_content(chunk_size=_STREAM_CHUNK_SIZE)
+        head = []
+        for chunk in chunks:
+            head.append(chunk)
+            if sum(map(len, head)) >= _BLOCK_PAGE_SCAN_BYTES:
+                break
+        _verify_response(host, breaker, response, b"".join(head), max_retries)
+    except requests.exceptions.RequestException as e:
+        response.close()
+        breaker.release()
+        raise ScraperError(f"スクレイピングに失敗しました（{max_retries}回試行）: {str(e)}") from e
+    except ScraperError:
+        response.close()
+        raise
+
+    return response, itertools.chain(head, chunks)
+
+
+def _fetch_amazon_page(
+    max_retries: int = None, url: Optional[str] = None, validators: Optional[dict] = None
+) -> BeautifulSoup:
+    """
+    AmazonランキングページをHTTPリクエストで取得
 
-def _parse_book_item(item, rank: int) -> Optional[KindleBook]:
-    """HTML要素から書籍情報を抽出してKindleBookオブジェクトを作成"""
+    validatorsに前回のETag/Last-Modifiedがあれば条件付きリクエストを送り、
+    304が返った場合はRankingNotModifiedErrorを送出する
+    """
+    if url is None:
+        url = config.kindle_ranking_url
+
+    headers = {**REQUEST_HEADERS, **_conditional_headers((validators or {}).get(url))}
+    response = request_page(url, headers, max_retries)
+    if response.status_code == 304:
+        raise RankingNotModifiedError(f"ページは前回から更新されていません: {url}")
+
+    _record_response_validators(url, response)
+    _archive_response(url, response.content)
+    return _make_soup(response.content)
+
+
+def _detect_block_page(content: bytes) -> Optional[str]:
+    """
+    ロボット確認などのブロックページかどうかを生のバイト列から判定（HTMLを解析せずに済ませる）
+
+    Returns:
+        ブロックページと判定した根拠の文字列（通常のページの場合はNone）
+    """
+    if not isinstance(content, bytes):
+        return None
+    for marker in _BLOCK_PAGE_MARKERS:
+        if marker in content:
+            return marker.decode("utf-8")
+    return None
+
+
+def _archive_response(url: str, content: bytes) -> None:
+    """設定されていれば取得したページを保存する（保存の失敗で処理は止めない）"""
+    if not config.snapshot_archive_dir:
+        return
+    try:
+        archive_page(config.snapshot_archive_dir, url, content)
+    except OSError as e:
+        logger.warning(f"ページの保存に失敗しました: {str(e)}")
+
+
+def _conditional_headers(validator: Optional[dict]) -> dict:
+    """前回のETag/Last-Modifiedから条件付きリクエスト用のヘッダーを作成"""
+    headers = {}
+    if validator:
+        if validator.get("etag"):
+            headers["If-None-Match"] = validator["etag"]
+        if validator.get("last_modified"):
+            headers["If-Modified-Since"] = validator["last_modified"]
+    return headers
+
+
+def _record_response_validators(url: str, response) -> None:
+    """レスポンスのETag/Last-Modifiedを次回の条件付きリクエスト用に記録"""
+    validator = {}
+    for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified")):
+        value = response.headers.get(header)
+        if isinstance(value, str) and value:
+            validator[key] = value
+    if validator:
+        _response_validators[url] = validator
+    else:
+        _response_validators.pop(url, None)
+
+
+def get_response_validators() -> dict[str, dict]:
+    """これまでに取得したページのETag/Last-ModifiedをURLごとに返す"""
+    return {url: dict(validator) for url, validator in _response_validators.items()}
+
+
+def select_parser_backend() -> str:
+    """設定とインストール状況からHTMLパーサーのバックエンドを決定"""
+    backend = config.html_parser_backend
+    if backend == "html.parser":
+        return backend
+    if _LXML_AVAILABLE:
+        return "lxml"
+    if backend == "lxml":
+        logger.warning("lxmlがインストールされていないため、html.parserで解析します")
+    return "html.parser"
+
+
+def _has_grid_cell_class(class_value) -> bool:
+    """class属性に商品グリッドのセルのクラスが含まれるか判定（解析中は分割前の文字列で渡される）"""
+    if not class_value:
+        return False
+    classes = class_value.split() if isinstance(class_value, str) else class_value
+    return GRID_CELL_CLASS in classes
+
+
+_GRID_CELL_STRAINER = SoupStrainer("div", class_=_has_grid_cell_class)
+
+
+def _make_soup(content: bytes, backend: Optional[str] = None) -> BeautifulSoup:
+    """ページ内容から商品グリッドのセルだけを展開したBeautifulSoupオブジェクトを作成"""
+    return BeautifulSoup(content, backend or select_parser_backend(), parse_only=_GRID_CELL_STRAINER)
+
+
+def _parse_book_item(item, rank: int, layout: Optional[str] = None) -> Optional[KindleBook]:
+    """
+    HTML要素から書籍情報を抽出してKindleBookオブジェクトを作成
+
+    Args:
+        item: 商品セルの要素
+        rank: 順位
+        layout: ページのレイアウトの指紋（Noneの場合はこのセルから作成）
+    """
     try:
         # タイトルとリンクを含むaタグ
         a_tag = item.find("a", {"class": "a-link-normal aok-block"})
         if not a_tag:
             return None
 
-        # タイトルの取得
-        title_div = item.find("div", {"class": "_cDEzb_p13n-sc-css-line-clamp-1_1Fn1y"})
-        title = title_div.get_text(strip=True) if title_div else "タイトル不明"
-
-        # 評価と評価数を取得
-        rating = None
-        review_count = None
-        rating_row = item.find("div", {"class": "a-icon-row"})
-        if rating_row:
-            rating_link = rating_row.find("a")
-            if rating_link:
-                aria_label = rating_link.get("aria-label")
-                if aria_label:
-                    rating_match = re.search(r"5つ星のうち([0-9.]+)、([0-9,]+)件", aria_label)
-                    if rating_match:
-                        rating = float(rating_match.group(1))
-                        review_count = int(rating_match.group(2).replace(",", ""))
-
-        # 価格の取得
-        price_span = item.find("span", {"class": "_cDEzb_p13n-sc-price_3mJ9Z"})
-        price = price_span.get_text(strip=True) if price_span else "価格不明"
+        if layout is None:
+            layout = layout_fingerprint(item)
+
+        title = extract_field("title", item, layout) or "タイトル不明"
+        rating, review_count = extract_field("rating", item, layout) or (None, None)
+        price = extract_field("price", item, layout) or "価格不明"
 
         # 商品URLの構築
-        product_id = _extract_product_id(item)
+        product_id = extract_field("product_id", item, layout)
         url = f"https://www.amazon.co.jp/dp/{product_id}" if product_id else "URLなし"
 
         return KindleBook(rank=rank, title=title, rating=rating, review_count=review_count, price=price, url=url)
@@ -123,29 +401,224 @@ def _parse_book_item(item, rank: int) -> Optional[KindleBook]:
         return None
 
 
-def _parse_books_from_soup(soup: BeautifulSoup, limit: int) -> list[KindleBook]:
-    """BeautifulSoupオブジェクトから書籍リストを抽出"""
-    items = soup.find_all("div", {"class": "_cDEzb_grid-cell_1uMOS"}, limit=limit)
+def _parse_books_from_soup(soup: BeautifulSoup, limit: int, start_rank: int = 1) -> list[KindleBook]:
+    """BeautifulSoupオブジェクトから書籍リストを抽出（start_rankはページ先頭の順位）"""
+    items = soup.find_all("div", {"class": GRID_CELL_CLASS}, limit=limit)
 
     if not items:
-        raise Exception("商品情報が見つかりませんでした。Amazonのページ構造が変更された可能性があります。")
+        raise ScraperError("商品情報が見つかりませんでした。Amazonのページ構造が変更された可能性があります。")
 
+    # 同じページのセルは同じレイアウトとみなし、指紋は先頭のセルから1回だけ作成する
+    layout = layout_fingerprint(items[0])
     books = []
-    for i, item in enumerate(items, 1):
-        book = _parse_book_item(item, i)
+    for i, item in enumerate(items, start_rank):
+        book = _parse_book_item(item, i, layout)
         if book:
             books.append(book)
 
     if not books:
-        raise Exception("商品情報の取得に失敗しました。一つも商品を取得できませんでした。")
+        raise ScraperError("商品情報の取得に失敗しました。一つも商品を取得できませんでした。")
+
+    return books
+
+
+class _GridCellCollector(HTMLParser):
+    """
+    ストリーミング解析用のパーサー
+
+    フィードされたHTMLから商品グリッドのセルを探し、セルが閉じるたびにそのHTMLをcellsに追加する
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.cells: deque[str] = deque()
+        self._parts: list[str] = []
+        # セル内のdivの入れ子の深さ（0はセルの外）
+        self._depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._depth == 0 and (tag != "div" or not _has_grid_cell_class(dict(attrs).get("class"))):
+            return
+        self._parts.append(self.get_starttag_text())
+        if tag == "div":
+            self._depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if self._depth:
+            self._parts.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if not self._depth:
+            return
+        self._parts.append(f"</{tag}>")
+        if tag == "div":
+            self._depth -= 1
+            if self._depth == 0:
+                self.cells.append("".join(self._parts))
+                self._parts = []
+
+    def handle_data(self, data):
+        if self._depth:
+            self._parts.append(data)
+
+    def handle_entityref(self, name):
+        if self._depth:
+            self._parts.append(f"&{name};")
+
+    def handle_charref(self, name):
+        if self._depth:
+            self._parts.append(f"&#{name};")
+
+
+def _stream_encoding(response: requests.Response, head: bytes) -> str:
+    """
+    逐次解析する本文の文字コードを決める
+
+    Content-Typeのcharset、本文の先頭の<meta charset>、UTF-8の順に使う
+    （requestsはcharsetのないtext/htmlをISO-8859-1とみなすため、response.encodingは使わない）
+    """
+    content_type = response.headers.get("Content-Type") or ""
+    candidates = [
+        _HEADER_CHARSET_PATTERN.search(content_type) if isinstance(content_type, str) else None,
+        _META_CHARSET_PATTERN.search(head),
+    ]
+    for match in candidates:
+        if match is None:
+            continue
+        charset = match.group(1)
+        charset = charset.decode("ascii") if isinstance(charset, bytes) else charset
+        try:
+            return codecs.lookup(charset).name
+        except LookupError:
+            logger.debug(f"不明な文字コードのため無視します: {charset}")
+    return "utf-8"
+
+
+def _iter_books_from_chunks(
+    chunks: Iterator[bytes], limit: int, start_rank: int = 1, encoding: Optional[str] = None
+) -> Iterator[KindleBook]:
+    """
+    本文のチャンクを逐次解析し、商品グリッドのセルが閉じるたびに書籍を返すジェネレーター
+
+    limit件分のセルを解析した時点で残りのチャンクは読まない
+
+    Raises:
+        ScraperError: 商品情報が1件も見つからなかった場合
+    """
+    decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    collector = _GridCellCollector()
+    cell_count = 0
+    book_count = 0
+    layout = None
+
+    for chunk in itertools.chain(chunks, [None]):
+        if chunk is None:
+            collector.feed(decoder.decode(b"", final=True))
+            collector.close()
+        else:
+            collector.feed(decoder.decode(chunk))
+
+        while collector.cells and cell_count < limit:
+            item = BeautifulSoup(collector.cells.popleft(), "html.parser").div
+            if layout is None:
+                layout = layout_fingerprint(item)
+            book = _parse_book_item(item, start_rank + cell_count, layout)
+            cell_count += 1
+            if book:
+                book_count += 1
+                yield book
+        if cell_count >= limit:
+            break
+
+    if not cell_count:
+        raise ScraperError("商品情報が見つかりませんでした。Amazonのページ構造が変更された可能性があります。")
+    if not book_count:
+        raise ScraperError("商品情報の取得に失敗しました。一つも商品を取得できませんでした。")
+
+
+def iter_amazon_kindle_ranking(
+    limit: int = 10, max_retries: Optional[int] = None, url: Optional[str] = None, validators: Optional[dict] = None
+) -> Iterator[KindleBook]:
+    """
+    Amazonランキングページを逐次読み込みながら解析し、書籍を1件ずつ返すジェネレーター
+
+    limit件を返した時点で接続を閉じ、残りの本文は受信しない（1ページ目の範囲のみ対象）
+
+    Args:
+        limit: 取得件数（1ページの件数を上限とする）
+        max_retries: 最大試行回数
+        url: ランキングページのURL（Noneの場合は設定値）
+        validators: 条件付きリクエストに使うURLごとのETag/Last-Modified
+
+    Raises:
+        RankingNotModifiedError: 304が返された場合
+        ScraperError: 取得・解析に失敗した場合
+    """
+    if url is None:
+        url = config.kindle_ranking_url
+
+    headers = {**REQUEST_HEADERS, **_conditional_headers((validators or {}).get(url))}
+    response, chunks = _request_page_stream(url, headers, max_retries)
+    try:
+        if response.status_code == 304:
+            raise RankingNotModifiedError(f"ページは前回から更新されていません: {url}")
+        _record_response_validators(url, response)
+        head = next(chunks, b"")
+        encoding = _stream_encoding(response, head)
+        yield from _iter_books_from_chunks(
+            itertools.chain([head], chunks), min(limit, RANKING_PAGE_SIZE), encoding=encoding
+        )
+    except requests.exceptions.RequestException as e:
+        raise ScraperError(f"ランキングページの受信中にエラーが発生しました: {str(e)}") from e
+    finally:
+        response.close()
+
+
+def _fetch_ranking_books(url: str, limit: int, max_retries: int, validators: Optional[dict] = None) -> list[KindleBook]:
+    """
+    limit件に必要なページだけを並行取得し、通し順位を付けた書籍リストを返す
+
+    2ページ目以降の取得・解析に失敗した場合は、それまでに取得できた分を返す。
+    条件付きリクエストは1ページで収まる場合のみ使用する（ページ単位の304では全体の一致を判定できないため）
+    """
+    page_count = min(math.ceil(limit / RANKING_PAGE_SIZE), MAX_RANKING_PAGES)
+    # ページ全体の保存が不要なら、limit件を解析した時点で受信を打ち切る
+    if page_count == 1 and config.streaming_parse and not config.snapshot_archive_dir:
+        return list(iter_amazon_kindle_ranking(limit, max_retries, url, validators))
+    if page_count == 1:
+        soup = _fetch_amazon_page(max_retries, url, validators)
+        return _parse_books_from_soup(soup, limit)
+
+    with ThreadPoolExecutor(max_workers=page_count) as executor:
+        futures = [
+            executor.submit(_fetch_amazon_page, max_retries, _build_page_url(url, page))
+            for page in range(1, page_count + 1)
+        ]
+
+        # 1ページ目の失敗はそのまま呼び出し元に伝える
+        books = _parse_books_from_soup(futures[0].result(), limit)
+        for page, future in enumerate(futures[1:], 2):
+            # 解析できなかったセルも順位を占めるため、残り件数は書籍数ではなく順位から数える
+            remaining = limit - (page - 1) * RANKING_PAGE_SIZE
+            if remaining <= 0:
+                future.cancel()
+                continue
+            try:
+                start_rank = (page - 1) * RANKING_PAGE_SIZE + 1
+                books.extend(_parse_books_from_soup(future.result(), remaining, start_rank))
+            except ScraperError as e:
+                logger.warning(f"{page}ページ目の取得に失敗したため、{len(books)}件で打ち切ります: {str(e)}")
+                break
+
+    if len(books) < limit:
+        logger.warning(f"ランキングの取得件数が指定件数に達しませんでした: {len(books)}/{limit}件")
 
     return books
 
 
 def get_amazon_kindle_ranking(limit=10, max_retries=3) -> str:
     """Amazonの Kindle ランキングを取得して文字列として返す"""
-    soup = _fetch_amazon_page(max_retries)
-    books = _parse_books_from_soup(soup, limit)
+    books = _fetch_ranking_books(config.kindle_ranking_url, limit, max_retries)
 
     # 書籍リストを文字列に変換
     result_lines = []
@@ -155,16 +628,40 @@ def get_amazon_kindle_ranking(limit=10, max_retries=3) -> str:
     return "\n\n".join(result_lines)
 
 
-def get_amazon_kindle_ranking_with_data(limit=10, max_retries=3) -> tuple[str, list[dict]]:
+def get_amazon_kindle_ranking_with_data(
+    limit=10, max_retries=3, validators: Optional[dict] = None
+) -> tuple[str, list[dict]]:
     """
     Amazonの Kindle ランキングを取得して文字列と構造化データの両方を返す
 
+    Args:
+        limit: 取得件数
+        max_retries: 最大試行回数
+        validators: 前回取得時のETag/Last-Modified（URLごと、条件付きリクエストに使用）
+
+    Returns:
+        tuple: (表示用文字列, 構造化データのリスト)
+
+    Raises:
+        RankingNotModifiedError: 条件付きリクエストでページが更新されていなかった場合
+    """
+    books = _fetch_ranking_books(config.kindle_ranking_url, limit, max_retries, validators)
+    return _books_to_result(books)
+
+
+def get_kindle_ranking_from_html(content: bytes, limit=10) -> tuple[str, list[dict]]:
+    """
+    保存済みのランキングページからランキングを取得して文字列と構造化データの両方を返す（ネットワーク不要）
+
     Returns:
         tuple: (表示用文字列, 構造化データのリスト)
     """
-    soup = _fetch_amazon_page(max_retries)
-    books = _parse_books_from_soup(soup, limit)
+    books = _parse_books_from_soup(_make_soup(content), limit)
+    return _books_to_result(books)
 
+
+def _books_to_result(books: list[KindleBook]) -> tuple[str, list[dict]]:
+    """書籍リストを表示用文字列と構造化データに変換"""
     # 書籍リストを文字列に変換
     result_lines = []
     structured_data = []
@@ -184,3 +681,73 @@ def get_amazon_kindle_ranking_with_data(limit=10, max_retries=3) -> tuple[str, l
         )
 
     return "\n\n".join(result_lines), structured_data
+
+
+def format_ranking_text(ranking_data: list[dict]) -> str:
+    """構造化データから表示用のランキング文字列を作成"""
+    return "\n\n".join(KindleBook.from_dict(item).to_string() for item in ranking_data)
+
+
+def category_key_from_url(url: str) -> str:
+    """カテゴリURLからカテゴリキー（ブラウズノードID）を取り出す"""
+    match = re.search(r"/(\d+)/?$", urlparse(url).path)
+    return match.group(1) if match else url
+
+
+def get_amazon_kindle_rankings_by_category(urls: list[str], limit=10, max_retries=3) -> dict[str, list[KindleBook]]:
+    """
+    複数カテゴリのKindleランキングを並行して取得する
+
+    Args:
+        urls: カテゴリごとのランキングページURL
+        limit: カテゴリごとの取得件数
+        max_retries: カテゴリごとの最大試行回数
+
+    Returns:
+        カテゴリキーをキーにした書籍リストの辞書（入力順、取得に失敗したカテゴリは含まない）
+
+    Raises:
+        ScraperError: すべてのカテゴリで取得に失敗した場合
+    """
+    # 同じカテゴリを重複して取得しないようにキー単位でまとめる
+    url_by_key = {}
+    for url in urls:
+        url_by_key.setdefault(category_key_from_url(url), url)
+
+    if not url_by_key:
+        return {}
+
+    results = {}
+    max_workers = min(config.max_concurrent_requests, len(url_by_key))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_fetch_ranking_books, url, limit, max_retries): key for key, url in url_by_key.items()
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+                logger.info(f"カテゴリ {key} のランキング取得成功: {len(results[key])}件")
+            except Exception as e:
+                logger.error(f"カテゴリ {key} のランキング取得に失敗しました: {type(e).__name__}: {str(e)}")
+
+    if not results:
+        raise ScraperError(f"すべてのカテゴリ（{len(url_by_key)}件）でランキングの取得に失敗しました")
+
+    return {key: results[key] for key in url_by_key if key in results}
+
+
+def get_amazon_kindle_rankings_with_data_by_category(
+    urls: list[str], limit=10, max_retries=3
+) -> dict[str, tuple[str, list[dict]]]:
+    """
+    複数カテゴリのKindleランキングを並行して取得し、カテゴリごとに文字列と構造化データの両方を返す
+
+    Returns:
+        カテゴリキーをキーにした (表示用文字列, 構造化データのリスト) の辞書（入力順、取得に失敗したカテゴリは含まない）
+
+    Raises:
+        ScraperError: すべてのカテゴリで取得に失敗した場合
+    """
+    books_by_category = get_amazon_kindle_rankings_by_category(urls, limit=limit, max_retries=max_retries)
+    return {key: _books_to_result(books) for key, books in books_by_category.items()}
@@ -0,0 +1,151 @@
+"""
+取得したランキングページのHTMLを保存するモジュール
+ページ内容のSHA-256をファイル名にしてgzip圧縮で保存し、取得日時とURLをマニフェスト（JSON Lines）に記録する
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.jsonl"
+SNAPSHOT_SUFFIX = ".html.gz"
+
+# 並行取得時にマニフェストへの追記が混ざらないようにするロック
+_manifest_lock = threading.Lock()
+
+
+class SnapshotNotFoundError(Exception):
+    """指定されたスナップショットが見つからない"""
+
+    pass
+
+
+@dataclass
+class SnapshotRecord:
+    """マニフェストの1行分（1回の取得）の情報"""
+
+    digest: str
+    url: str
+    fetched_at: str
+    size: int
+
+
+def _snapshot_path(archive_dir: str, digest: str) -> Path:
+    return Path(archive_dir) / f"{digest}{SNAPSHOT_SUFFIX}"
+
+
+def archive_page(archive_dir: str, url: str, content: bytes) -> str:
+    """
+    ページ内容を圧縮して保存し、マニフェストに記録する
+
+    同じ内容のページは1ファイルだけ保存し、マニフェストには取得ごとに記録する
+
+    Args:
+        archive_dir: 保存先ディレクトリ
+        url: 取得元URL
+        content: ページ内容（レスポンスのバイト列）
+
+    Returns:
+        ページ内容のダイジェスト
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    archive_path = Path(archive_dir)
+    archive_path.mkdir(parents=True, exist_ok=True)
+
+    snapshot_path = _snapshot_path(archive_dir, digest)
+    if not snapshot_path.exists():
+        # 書き込み途中のファイルが残らないように一時ファイルから置き換える
+        temp_path = snapshot_path.with_name(f"{snapshot_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(temp_path, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, snapshot_path)
+
+    record = SnapshotRecord(digest=digest, url=url, fetched_at=datetime.now().isoformat(), size=len(content))
+    with _manifest_lock:
+        with open(archive_path / MANIFEST_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+
+    logger.debug(f"ページを保存しました: {digest[:12]} ({len(content):,}バイト)")
+    return digest
+
+
+def read_manifest(archive_dir: str) -> list[SnapshotRecord]:
+    """
+    マニフェストを読み込む
+
+    Returns:
+        取得記録のリスト（古い順）
+    """
+    manifest_path = Path(archive_dir) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return []
+
+    records = []
+    with open(manifest_path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                records.append(SnapshotRecord(**json.loads(line)))
+    return records
+
+
+def resolve_snapshot(archive_dir: Optional[str], ref: str, url: Optional[str] = None) -> Path:
+    """
+    スナップショットの指定をファイルパスに解決する
+
+    Args:
+        archive_dir: 保存先ディレクトリ
+        ref: ファイルパス、ダイジェスト（先頭部分でも可）、または "latest"
+        url: "latest" の場合に対象とする取得元URL（Noneの場合はすべてのページ。2ページ目や別カテゴリを除くために指定する）
+
+    Returns:
+        スナップショットのファイルパス
+
+    Raises:
+        SnapshotNotFoundError: 見つからない、または複数に一致する場合
+    """
+    if Path(ref).is_file():
+        return Path(ref)
+    if not archive_dir:
+        raise SnapshotNotFoundError(f"スナップショットが見つかりません（保存先ディレクトリ未設定）: {ref}")
+
+    if ref == "latest":
+        records = [record for record in read_manifest(archive_dir) if url is None or record.url == url]
+        if not records:
+            target = f"{archive_dir}（{url}）" if url else archive_dir
+            raise SnapshotNotFoundError(f"保存済みのスナップショットがありません: {target}")
+        return _snapshot_path(archive_dir, records[-1].digest)
+
+    matches = sorted(Path(archive_dir).glob(f"{ref}*{SNAPSHOT_SUFFIX}"))
+    if not matches:
+        raise SnapshotNotFoundError(f"スナップショットが見つかりません: {ref}")
+    if len(matches) > 1:
+        raise SnapshotNotFoundError(f"スナップショットの指定が複数に一致します: {ref}（{len(matches)}件）")
+    return matches[0]
+
+
+def load_snapshot(archive_dir: Optional[str], ref: str, url: Optional[str] = None) -> bytes:
+    """
+    スナップショットのページ内容を読み込む（gzip圧縮されていないファイルもそのまま読み込む）
+
+    Args:
+        archive_dir: 保存先ディレクトリ
+        ref: ファイルパス、ダイジェスト（先頭部分でも可）、または "latest"
+        url: "latest" の場合に対象とする取得元URL
+
+    Returns:
+        ページ内容のバイト列
+    """
+    path = resolve_snapshot(archive_dir, ref, url)
+    if path.name.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            return f.read()
+    return path.read_bytes()
@@ -2,14 +2,25 @@
 Gemini APIを使用してKindleランキングデータの要約を生成するモジュール
 """
 
+import asyncio
+import bisect
+import hashlib
+import json
 import logging
-from typing import Optional
+import threading
+import time
+from collections.abc import Coroutine
+from dataclasses import dataclass, field
+from typing import Any, Optional
 
 from google import genai
 from google.genai import errors as genai_errors
 from google.genai import types
 
 from config import config
+from disk_cache import DiskCache
+from prompt_builder import BuiltPrompt, build_ranking_prompt, estimate_tokens, prioritize_rankings
+from rank_analytics import BookTrajectory
 
 logger = logging.getLogger(__name__)
 
@@ -56,32 +67,255 @@ Kindleランキング上位の傾向を分析:
 {ranking_text}
 """
 
+# Gemini API用のシステム指示（複数カテゴリの一括分析用）
+SYSTEM_INSTRUCTION_BATCH = """
+あなたはKindle電子書籍の売れ筋ランキング分析の専門家です。
+複数のカテゴリのランキングを、カテゴリごとに3-4行で分析してください。
 
-def _call_gemini_api(prompt: str, system_instruction: str) -> str:
-    """
-    Gemini APIを呼び出してテキストを生成
+注目ポイント：
+- 変化の内容があるカテゴリは、新規ランクイン作品・大幅な順位変動・ジャンルやテーマの変化傾向
+- 変化の内容がないカテゴリ（初回）は、上位作品の傾向とジャンル分布・高評価作品や話題作
 
-    Args:
-        prompt: ユーザープロンプト
-        system_instruction: システム指示
+絵文字を使って読みやすく、カテゴリの分析は他のカテゴリに触れずにそれだけで読めるようにしてください。
+"""
 
-    Returns:
-        生成されたテキスト
+# プロンプトテンプレート（複数カテゴリの一括分析用）
+PROMPT_TEMPLATE_BATCH = """
+以下の{count}カテゴリのKindleランキングをそれぞれ分析し、
+summariesにカテゴリごとにcategory（カテゴリキー）とsummary（分析結果）を入れてください。
 
-    Raises:
-        genai_errors.APIError: API呼び出しエラー
-        ValueError: レスポンスが空の場合
+{categories_text}
+"""
+
+# プロンプトテンプレート（一括分析の各カテゴリ）
+PROMPT_TEMPLATE_BATCH_CATEGORY = """## カテゴリ: {category}
+【変化の内容】
+{changes_text}
+
+【今回のランキング】
+{current_ranking}"""
+
+
+# 生成の設定（キャッシュのキーにも含める）
+GENERATION_CONFIG = {"temperature": 0.7, "max_output_tokens": 2000}
+
+# 一括分析の応答のスキーマ（カテゴリキーは実行ごとに変わるため、辞書ではなく配列で受け取る）
+BATCH_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "summaries": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {"category": {"type": "STRING"}, "summary": {"type": "STRING"}},
+                "required": ["category", "summary"],
+            },
+        }
+    },
+    "required": ["summaries"],
+}
+
+# 要約のキャッシュ（最初に必要になった時に読み込む）
+_response_cache: Optional[DiskCache] = None
+
+# 実行中に使い回すGemini APIのクライアント（最初に必要になった時に作成する）
+_client: Optional[genai.Client] = None
+# クライアントを作成した時の (APIキー, 接続先URL)
+_client_settings: Optional[tuple[str, str]] = None
+
+# 同期版の要約を実行するイベントループとそのスレッド（最初に必要になった時に作成し、実行中は使い回す）
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+# 応答時間の予算の計測開始時刻（実行中に最初に要約を生成した時刻）
+_budget_started: Optional[float] = None
+
+# 応答時間のヒストグラムの区切り（秒）
+LATENCY_BUCKETS = (1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+@dataclass
+class LatencyHistogram:
+    """モデルごとの応答時間のヒストグラム"""
+
+    # LATENCY_BUCKETSの各区切り以下の件数（最後の要素は最大の区切りを超えた件数）
+    counts: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    failures: int = 0
+    # 別のモデルが先に応答したため取り消した回数（応答時間には含めない）
+    cancelled: int = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def record(self, seconds: float, failed: bool = False) -> None:
+        """応答時間を記録"""
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        if failed:
+            self.failures += 1
+
+    def format(self) -> str:
+        """ログ用の文字列に変換（件数が0の区間は省略）"""
+        labels = [f"≤{bound:g}秒" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]:g}秒"]
+        return " ".join(f"{label}:{count}" for label, count in zip(labels, self.counts, strict=True) if count)
+
+
+_latency_histograms: dict[str, LatencyHistogram] = {}
+_latency_lock = threading.Lock()
+
+
+@dataclass
+class CategorySummaryRequest:
+    """カテゴリごとの要約の入力"""
+
+    rankings: list[dict]
+    # 変化分析の結果（Noneの場合は初回の要約を生成する）
+    changes_analysis: Optional[dict] = None
+    window_analyses: Optional[dict[int, dict]] = None
+    trajectories: Optional[list[BookTrajectory]] = None
+
+
+def _get_client() -> genai.Client:
+    """Gemini APIのクライアントを取得（APIキーや接続先が変わった場合は作り直す）"""
+    global _client, _client_settings
+    settings = (config.gemini_api_key, config.gemini_base_url)
+    if _client is None or _client_settings != settings:
+        _discard_client()
+        kwargs = {"api_key": config.gemini_api_key}
+        if config.gemini_base_url:
+            kwargs["http_options"] = types.HttpOptions(base_url=config.gemini_base_url)
+        _client = genai.Client(**kwargs)
+        _client_settings = settings
+    return _client
+
+
+def _discard_client() -> None:
+    """Gemini APIのクライアントの同期の接続を閉じて破棄する（次の呼び出しでは新しいクライアントを作成する）"""
+    global _client, _client_settings
+    if _client is None:
+        return
+    client, _client, _client_settings = _client, None, None
+    try:
+        client.close()
+    except Exception as e:
+        logger.debug(f"Gemini APIクライアントの終了でエラーが発生しました: {type(e).__name__}: {str(e)}")
+
+
+async def aclose_client() -> None:
+    """Gemini APIのクライアントの非同期・同期の接続を閉じる"""
+    if _client is None:
+        return
+    try:
+        await _client.aio.aclose()
+    except Exception as e:
+        logger.debug(f"Gemini APIクライアントの終了でエラーが発生しました: {type(e).__name__}: {str(e)}")
+    _discard_client()
+
+
+def close_client() -> None:
+    """Gemini APIのクライアントの接続と同期版用のイベントループを閉じる（実行の最後に呼び出す）"""
+    global _loop, _loop_thread
+    with _loop_lock:
+        loop, thread, _loop, _loop_thread = _loop, _loop_thread, None, None
+    if loop is None:
+        _discard_client()
+        return
+
+    # 非同期の接続はそれを使ったイベントループの中で閉じる
+    asyncio.run_coroutine_threadsafe(aclose_client(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def _run_sync(coro: Coroutine) -> Any:
     """
-    client = genai.Client(api_key=config.gemini_api_key)
+    コルーチンを同期版用のイベントループで実行して結果を待つ
 
-    response = client.models.generate_content(
-        model=config.gemini_model,
-        config=types.GenerateContentConfig(
-            system_instruction=system_instruction, temperature=0.7, max_output_tokens=2000
-        ),
-        contents=prompt,
+    非同期の接続はイベントループをまたいで使い回せないため、同期版の呼び出しはすべて同じイベントループで実行する
+    """
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="summarizer-loop", daemon=True)
+            _loop_thread.start()
+        loop = _loop
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def _get_response_cache() -> Optional[DiskCache]:
+    """要約のキャッシュを取得（キャッシュファイルが設定されていない場合はNone）"""
+    global _response_cache
+    if _response_cache is None and config.summary_cache_file:
+        _response_cache = DiskCache(
+            config.summary_cache_file,
+            ttl_seconds=config.summary_cache_ttl_hours * 60 * 60,
+            max_entries=config.summary_cache_max_entries,
+        )
+    return _response_cache
+
+
+def _response_cache_key(
+    model: str, system_instruction: str, prompt: str, generation_config: Optional[dict] = None
+) -> str:
+    """モデル・システム指示・プロンプト・生成の設定からキャッシュのキーを作成"""
+    payload = json.dumps(
+        [model, system_instruction, prompt, generation_config or GENERATION_CONFIG], ensure_ascii=False, sort_keys=True
     )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_summary_cache_stats() -> dict[str, int]:
+    """
+    要約のキャッシュの統計を取得
+
+    Returns:
+        hits: キャッシュから返した回数、misses: APIを呼び出した回数、entries: 保存されている件数
+    """
+    cache = _response_cache
+    if cache is None:
+        return {"hits": 0, "misses": 0, "entries": 0}
+    return {"hits": cache.hits, "misses": cache.misses, "entries": len(cache)}
+
+
+def log_summary_cache_stats() -> None:
+    """要約のキャッシュの統計をログに出力（キャッシュを使わなかった場合は何もしない）"""
+    stats = get_summary_cache_stats()
+    if stats["hits"] or stats["misses"]:
+        logger.info(f"要約キャッシュ: ヒット{stats['hits']}回、ミス{stats['misses']}回（保存{stats['entries']}件）")
+
+
+def _get_cached_summary(cache_key: str) -> Optional[str]:
+    """キャッシュにある要約を取得（キャッシュを使わない場合やキャッシュにない場合はNone）"""
+    cache = _get_response_cache()
+    if cache is None:
+        return None
+    cached = cache.get(cache_key)
+    if cached is not None:
+        logger.info("同じプロンプトの要約がキャッシュにあるため、Gemini APIの呼び出しを省略します")
+    return cached
+
+
+def _store_summary(cache_key: str, text_content: str) -> None:
+    """生成した要約をキャッシュに保存"""
+    cache = _get_response_cache()
+    if cache is None:
+        return
+    cache.set(cache_key, text_content)
+    try:
+        cache.save()
+    except OSError as e:
+        logger.warning(f"要約キャッシュの保存に失敗しました: {e}")
 
+
+def _text_from_response(response) -> str:
+    """レスポンスからテキストを取得（空の場合はValueError）"""
     text_content = _extract_text_from_response(response)
 
     if not text_content:
@@ -91,6 +325,175 @@ def _call_gemini_api(prompt: str, system_instruction: str) -> str:
     return text_content
 
 
+def _record_latency(model: str, seconds: Optional[float], failed: bool = False) -> None:
+    """モデルの応答時間を記録（secondsがNoneの場合は取り消した呼び出しとして数える）"""
+    with _latency_lock:
+        histogram = _latency_histograms.setdefault(model, LatencyHistogram())
+        if seconds is None:
+            histogram.cancelled += 1
+        else:
+            histogram.record(seconds, failed)
+
+
+def get_latency_histograms() -> dict[str, LatencyHistogram]:
+    """
+    モデルごとの応答時間のヒストグラムを取得
+
+    Returns:
+        モデル名をキーにしたヒストグラムの辞書
+    """
+    with _latency_lock:
+        return dict(_latency_histograms)
+
+
+def log_latency_stats() -> None:
+    """モデルごとの応答時間の統計をログに出力"""
+    for model, histogram in get_latency_histograms().items():
+        average = histogram.total_seconds / histogram.count if histogram.count else 0.0
+        logger.info(
+            f"Gemini応答時間 {model}: {histogram.count}回（失敗{histogram.failures}回、取り消し{histogram.cancelled}回）、"
+            f"平均{average:.1f}秒、最大{histogram.max_seconds:.1f}秒 [{histogram.format()}]"
+        )
+
+
+def _hedge_delay() -> Optional[float]:
+    """
+    予備のモデルに同時にリクエストを送るまでの待機秒数
+
+    予算は1回の実行全体で共有し、最初の要約の開始から数える（予算を使い切った後は最初から両方に送る）
+
+    Returns:
+        待機秒数（予備のモデルが設定されていない場合はNone）
+    """
+    global _budget_started
+    if not config.gemini_fallback_model or config.gemini_fallback_model == config.gemini_model:
+        return None
+    if _budget_started is None:
+        _budget_started = time.monotonic()
+    return max(0.0, config.gemini_latency_budget_seconds - (time.monotonic() - _budget_started))
+
+
+def _log_token_usage(model: str, response) -> None:
+    """応答に含まれる実際のトークン数をログに出力"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None and usage.prompt_token_count is not None:
+        logger.info(
+            f"Gemini API {model}: 入力{usage.prompt_token_count}トークン、出力{usage.candidates_token_count}トークン"
+        )
+
+
+async def _agenerate_with_model(
+    model: str, prompt: str, system_instruction: str, generation_config: Optional[dict] = None
+) -> str:
+    """指定したモデルで非同期にテキストを生成し、応答時間を記録（generation_configがNoneの場合はGENERATION_CONFIG）"""
+    start_time = time.perf_counter()
+    try:
+        response = await _get_client().aio.models.generate_content(
+            model=model,
+            config=types.GenerateContentConfig(
+                system_instruction=system_instruction, **(generation_config or GENERATION_CONFIG)
+            ),
+            contents=prompt,
+        )
+        _log_token_usage(model, response)
+        text_content = _text_from_response(response)
+    except asyncio.CancelledError:
+        _record_latency(model, None)
+        raise
+    except Exception:
+        _record_latency(model, time.perf_counter() - start_time, failed=True)
+        raise
+    _record_latency(model, time.perf_counter() - start_time)
+    return text_content
+
+
+async def _agenerate_hedged(
+    prompt: str, system_instruction: str, generation_config: Optional[dict] = None
+) -> tuple[str, str]:
+    """
+    メインのモデルでテキストを生成し、予算を超えた場合や失敗した場合は予備のモデルにも同時に送って先に成功した方を使う
+
+    負けた方の呼び出しは取り消す
+
+    Returns:
+        tuple: (応答したモデル, 生成されたテキスト)
+
+    Raises:
+        genai_errors.APIError: すべてのモデルの呼び出しが失敗した場合
+        ValueError: すべてのモデルの応答が空の場合
+    """
+    delay = _hedge_delay()
+    if delay is None:
+        text_content = await _agenerate_with_model(config.gemini_model, prompt, system_instruction, generation_config)
+        return config.gemini_model, text_content
+
+    models = {}
+    primary = asyncio.create_task(
+        _agenerate_with_model(config.gemini_model, prompt, system_instruction, generation_config)
+    )
+    models[primary] = config.gemini_model
+    pending = {primary}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if not done or primary.exception() is not None:
+            reason = "失敗した" if done else f"{delay:.1f}秒以内に応答しなかった"
+            logger.warning(f"{config.gemini_model} が{reason}ため、{config.gemini_fallback_model} にも要約を依頼します")
+            fallback = asyncio.create_task(
+                _agenerate_with_model(config.gemini_fallback_model, prompt, system_instruction, generation_config)
+            )
+            models[fallback] = config.gemini_fallback_model
+            pending.add(fallback)
+
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return models[task], task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # 先に応答したモデルの要約を使い、もう一方の呼び出しは取り消す
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def _acall_gemini_api(prompt: str, system_instruction: str, cache_only: bool = False) -> Optional[str]:
+    """
+    Gemini APIを非同期で呼び出してテキストを生成
+
+    同じモデル・システム指示・プロンプト・生成の設定の結果がキャッシュにあれば、APIを呼び出さずにそれを返す
+    メインのモデルが応答時間の予算を超えた場合は予備のモデルの要約を使うことがある
+    （キャッシュのキーはメインのモデルのものなので、予備のモデルの要約はキャッシュしない）
+
+    Args:
+        prompt: ユーザープロンプト
+        system_instruction: システム指示
+        cache_only: キャッシュにある要約だけを使うか（Trueの場合はAPIを呼び出さない）
+
+    Returns:
+        生成されたテキスト（cache_only=Trueでキャッシュにない場合はNone）
+
+    Raises:
+        genai_errors.APIError: API呼び出しエラー
+        ValueError: レスポンスが空の場合
+    """
+    cache_key = _response_cache_key(config.gemini_model, system_instruction, prompt)
+    cached = _get_cached_summary(cache_key)
+    if cached is not None:
+        return cached
+    if cache_only:
+        logger.info("キャッシュに要約がないため、Gemini APIを呼び出さずに要約を省略します")
+        return None
+
+    model, text_content = await _agenerate_hedged(prompt, system_instruction)
+    if model == config.gemini_model:
+        _store_summary(cache_key, text_content)
+    return text_content
+
+
 def _extract_text_from_response(response) -> str | None:
     """
     Gemini APIレスポンスからテキストを抽出
@@ -125,96 +528,334 @@ def _extract_text_from_response(response) -> str | None:
     return None
 
 
-def generate_ranking_changes_summary(changes_analysis: dict, current_ranking_text: str) -> Optional[str]:
+def _summary_enabled(require_api_key: bool = True) -> bool:
+    """Gemini要約が有効でAPIキーが設定されているか（require_api_key=Falseの場合はAPIキーを確認しない）"""
+    if not config.enable_gemini_summary or (require_api_key and not config.gemini_api_key):
+        logger.info("Gemini要約が無効または、APIキーが設定されていません")
+        return False
+    return True
+
+
+def _log_summary_error(e: Exception) -> None:
+    """要約の生成で発生したエラーをログに出力"""
+    if isinstance(e, genai_errors.APIError):
+        logger.error(f"Gemini API呼び出しでエラーが発生しました: {str(e)}")
+    elif isinstance(e, ValueError):
+        logger.error(f"Gemini APIレスポンスの処理でエラーが発生しました: {str(e)}")
+    else:
+        logger.error(f"予期しないエラーが発生しました: {type(e).__name__}: {str(e)}")
+
+
+def _log_prompt(prompt: BuiltPrompt) -> None:
+    """組み立てたプロンプトの推定トークン数をログに出力"""
+    logger.info(
+        f"プロンプトを作成しました: 推定{prompt.tokens}トークン（予算{config.gemini_prompt_token_budget}）、"
+        f"書籍{prompt.rows}/{prompt.total_rows}件"
+    )
+
+
+def _format_changes_text(
+    changes_analysis: dict,
+    window_analyses: Optional[dict[int, dict]] = None,
+    trajectories: Optional[list[BookTrajectory]] = None,
+) -> str:
+    """変化分析・期間ごとの比較・順位の推移をプロンプト用のテキストにまとめる"""
+    changes_text = _format_changes_for_prompt(changes_analysis)
+    if window_analyses:
+        changes_text += "\n\n" + _format_windows_for_prompt(window_analyses)
+    if trajectories:
+        changes_text += "\n\n" + _format_trajectories_for_prompt(trajectories)
+    return changes_text
+
+
+def _build_changes_prompt(
+    changes_analysis: dict,
+    current_rankings: list[dict],
+    window_analyses: Optional[dict[int, dict]] = None,
+    trajectories: Optional[list[BookTrajectory]] = None,
+) -> str:
+    """変化の要約用のプロンプトを作成（今回のランキングは新規ランクイン・大きな順位変動・上位を優先して予算内に収める）"""
+    prompt = build_ranking_prompt(
+        PROMPT_TEMPLATE_CHANGES,
+        "current_ranking",
+        prioritize_rankings(current_rankings, changes_analysis, config.gemini_summary_ranking_limit),
+        config.gemini_prompt_token_budget,
+        changes_text=_format_changes_text(changes_analysis, window_analyses, trajectories),
+    )
+    _log_prompt(prompt)
+    return prompt.text
+
+
+def _build_first_prompt(rankings: list[dict]) -> str:
+    """初回の要約用のプロンプトを作成（上位から予算内に収まるだけ含める）"""
+    prompt = build_ranking_prompt(
+        PROMPT_TEMPLATE_FIRST,
+        "ranking_text",
+        prioritize_rankings(rankings, top_n=config.gemini_summary_ranking_limit),
+        config.gemini_prompt_token_budget,
+    )
+    _log_prompt(prompt)
+    return prompt.text
+
+
+def generate_ranking_changes_summary(
+    changes_analysis: dict,
+    current_rankings: list[dict],
+    window_analyses: Optional[dict[int, dict]] = None,
+    trajectories: Optional[list[BookTrajectory]] = None,
+    cache_only: bool = False,
+) -> Optional[str]:
     """
-    Gemini APIを使ってランキングの変化を要約
+    Gemini APIを使ってランキングの変化を要約（イベントループの外から呼び出す同期版）
 
     Args:
         changes_analysis: 変化分析の結果
-        current_ranking_text: 現在のランキングテキスト
+        current_rankings: 今回のランキングデータ
+        window_analyses: 何日前かをキーにした期間ごとの変化分析の結果（analyze_ranking_windows）
+        trajectories: 今回のランキングの順に並べた書籍ごとの順位の推移（analyze_trajectories）
+        cache_only: キャッシュにある要約だけを使い、Gemini APIを呼び出さないか（リプレイ用）
 
     Returns:
-        要約テキスト（失敗時はNone）
+        要約テキスト（失敗時やcache_only=Trueでキャッシュにない場合はNone）
     """
-    if not config.enable_gemini_summary or not config.gemini_api_key:
-        logger.info("Gemini要約が無効または、APIキーが設定されていません")
-        return None
+    return _run_sync(
+        agenerate_ranking_changes_summary(changes_analysis, current_rankings, window_analyses, trajectories, cache_only)
+    )
 
-    try:
-        logger.info("Gemini APIを使用して変化の要約を生成中...")
 
-        # 変化の内容をテキスト化
-        changes_text = _format_changes_for_prompt(changes_analysis)
+def generate_first_ranking_summary(rankings: list[dict], cache_only: bool = False) -> Optional[str]:
+    """
+    Gemini APIを使って初回のランキング要約を生成（イベントループの外から呼び出す同期版）
 
-        # プロンプトを作成
-        prompt = PROMPT_TEMPLATE_CHANGES.format(changes_text=changes_text, current_ranking=current_ranking_text)
+    Args:
+        rankings: 今回のランキングデータ
+        cache_only: キャッシュにある要約だけを使い、Gemini APIを呼び出さないか（リプレイ用）
 
-        # API呼び出し
-        summary = _call_gemini_api(prompt, SYSTEM_INSTRUCTION_CHANGES)
+    Returns:
+        要約テキスト（失敗時やcache_only=Trueでキャッシュにない場合はNone）
+    """
+    return _run_sync(agenerate_first_ranking_summary(rankings, cache_only))
 
-        logger.info(f"Gemini変化要約生成成功: {len(summary)}文字")
-        return summary
 
-    except genai_errors.APIError as e:
-        logger.error(f"Gemini API呼び出しでエラーが発生しました: {str(e)}")
-        return None
-    except ValueError as e:
-        logger.error(f"Gemini APIレスポンスの処理でエラーが発生しました: {str(e)}")
+async def agenerate_ranking_changes_summary(
+    changes_analysis: dict,
+    current_rankings: list[dict],
+    window_analyses: Optional[dict[int, dict]] = None,
+    trajectories: Optional[list[BookTrajectory]] = None,
+    cache_only: bool = False,
+) -> Optional[str]:
+    """
+    Gemini APIを使ってランキングの変化を要約
+
+    Returns:
+        要約テキスト（失敗時やcache_only=Trueでキャッシュにない場合はNone）
+    """
+    if not _summary_enabled(require_api_key=not cache_only):
         return None
+
+    try:
+        logger.info("Gemini APIを使用して変化の要約を生成中...")
+        prompt = _build_changes_prompt(changes_analysis, current_rankings, window_analyses, trajectories)
+        summary = await _acall_gemini_api(prompt, SYSTEM_INSTRUCTION_CHANGES, cache_only)
+        if summary is not None:
+            logger.info(f"Gemini変化要約生成成功: {len(summary)}文字")
+        return summary
+
     except Exception as e:
-        logger.error(f"予期しないエラーが発生しました: {type(e).__name__}: {str(e)}")
+        _log_summary_error(e)
         return None
 
 
-def generate_first_ranking_summary(ranking_text: str) -> Optional[str]:
+async def agenerate_first_ranking_summary(rankings: list[dict], cache_only: bool = False) -> Optional[str]:
     """
     Gemini APIを使って初回のランキング要約を生成
 
-    Args:
-        ranking_text: スクレイピングで取得したランキングデータ
-
     Returns:
-        要約テキスト（失敗時はNone）
+        要約テキスト（失敗時やcache_only=Trueでキャッシュにない場合はNone）
     """
-    if not config.enable_gemini_summary or not config.gemini_api_key:
-        logger.info("Gemini要約が無効または、APIキーが設定されていません")
+    if not _summary_enabled(require_api_key=not cache_only):
         return None
 
     try:
         logger.info("Gemini APIを使用して初回要約を生成中...")
-
-        # ランキングテキストを指定された位数に制限
-        lines = ranking_text.split("\n")
-        limited_lines = []
-        count = 0
-        for line in lines:
-            if line.strip() and ("位|" in line):
-                count += 1
-                if count > config.gemini_summary_ranking_limit:
-                    break
-            limited_lines.append(line)
-        limited_text = "\n".join(limited_lines)
-
-        # プロンプトを作成
-        prompt = PROMPT_TEMPLATE_FIRST.format(ranking_text=limited_text)
-
-        # API呼び出し
-        summary = _call_gemini_api(prompt, SYSTEM_INSTRUCTION_FIRST)
-
-        logger.info(f"Gemini初回要約生成成功: {len(summary)}文字")
+        summary = await _acall_gemini_api(_build_first_prompt(rankings), SYSTEM_INSTRUCTION_FIRST, cache_only)
+        if summary is not None:
+            logger.info(f"Gemini初回要約生成成功: {len(summary)}文字")
         return summary
 
-    except genai_errors.APIError as e:
-        logger.error(f"Gemini API呼び出しでエラーが発生しました: {str(e)}")
-        return None
-    except ValueError as e:
-        logger.error(f"Gemini APIレスポンスの処理でエラーが発生しました: {str(e)}")
-        return None
     except Exception as e:
-        logger.error(f"予期しないエラーが発生しました: {type(e).__name__}: {str(e)}")
+        _log_summary_error(e)
         return None
 
 
+async def _agenerate_individually(
+    requests: dict[str, CategorySummaryRequest], max_concurrency: Optional[int] = None
+) -> dict[str, Optional[str]]:
+    """カテゴリごとにGemini APIを呼び出し、同時呼び出し数を制限して並行に要約を生成"""
+    semaphore = asyncio.Semaphore(max_concurrency or config.gemini_max_concurrent_requests)
+
+    async def summarize(key: str, request: CategorySummaryRequest) -> Optional[str]:
+        async with semaphore:
+            logger.info(f"カテゴリ {key} の要約を生成中...")
+            if request.changes_analysis is None:
+                return await agenerate_first_ranking_summary(request.rankings)
+            return await agenerate_ranking_changes_summary(
+                request.changes_analysis, request.rankings, request.window_analyses, request.trajectories
+            )
+
+    summaries = await asyncio.gather(*(summarize(key, request) for key, request in requests.items()))
+    return dict(zip(requests, summaries, strict=True))
+
+
+def _build_batch_prompt(requests: dict[str, CategorySummaryRequest]) -> str:
+    """複数カテゴリの一括分析用のプロンプトを作成（トークン数の予算はカテゴリ数で等分する）"""
+    budget = config.gemini_prompt_token_budget
+    if budget:
+        budget = max(1, budget // len(requests))
+
+    sections = []
+    for key, request in requests.items():
+        if request.changes_analysis is None:
+            changes_text = "（初回のため前回のランキングはありません）"
+        else:
+            changes_text = _format_changes_text(request.changes_analysis, request.window_analyses, request.trajectories)
+        sections.append(
+            build_ranking_prompt(
+                PROMPT_TEMPLATE_BATCH_CATEGORY,
+                "current_ranking",
+                prioritize_rankings(request.rankings, request.changes_analysis, config.gemini_summary_ranking_limit),
+                budget,
+                category=key,
+                changes_text=changes_text,
+            )
+        )
+
+    text = PROMPT_TEMPLATE_BATCH.format(
+        count=len(requests), categories_text="\n\n".join(section.text for section in sections)
+    )
+    logger.info(
+        f"一括分析のプロンプトを作成しました: 推定{estimate_tokens(text)}トークン（予算{config.gemini_prompt_token_budget}）、"
+        f"{len(requests)}カテゴリ、書籍{sum(s.rows for s in sections)}/{sum(s.total_rows for s in sections)}件"
+    )
+    return text
+
+
+def _parse_batch_summaries(text: str, categories: set[str]) -> dict[str, str]:
+    """
+    一括分析の応答を解析し、カテゴリごとの要約を取り出す
+
+    Args:
+        text: Gemini APIの応答（BATCH_RESPONSE_SCHEMAのJSON）
+        categories: 依頼したカテゴリキー
+
+    Returns:
+        カテゴリキーをキーにした要約の辞書（依頼していないカテゴリや空の要約は含まない）
+
+    Raises:
+        ValueError: 応答がスキーマに合わない場合
+    """
+    data = json.loads(text)
+    items = data.get("summaries") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        raise ValueError("一括分析の応答にsummariesの配列がありません")
+
+    summaries = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        category, summary = item.get("category"), item.get("summary")
+        if isinstance(category, str) and category in categories and isinstance(summary, str) and summary.strip():
+            summaries.setdefault(category, summary.strip())
+    return summaries
+
+
+async def agenerate_batch_category_summaries(
+    requests: dict[str, CategorySummaryRequest], max_concurrency: Optional[int] = None
+) -> dict[str, Optional[str]]:
+    """
+    複数カテゴリの要約を1回のGemini API呼び出しでまとめて生成
+
+    応答はJSONのスキーマ（BATCH_RESPONSE_SCHEMA）で受け取り、解析できなかったカテゴリや
+    要約が含まれていなかったカテゴリだけを個別に再生成する
+
+    Args:
+        requests: カテゴリキーをキーにした要約の入力
+        max_concurrency: 個別に再生成する際のGemini APIの最大同時呼び出し数（Noneの場合は設定値）
+
+    Returns:
+        カテゴリキーをキーにした要約テキストの辞書（入力順、失敗したカテゴリはNone）
+    """
+    if not requests:
+        return {}
+    if not _summary_enabled():
+        return dict.fromkeys(requests)
+
+    summaries: dict[str, Optional[str]] = {}
+    try:
+        logger.info(f"Gemini APIを使用して{len(requests)}カテゴリの要約をまとめて生成中...")
+        prompt = _build_batch_prompt(requests)
+        generation_config = {
+            **GENERATION_CONFIG,
+            "max_output_tokens": GENERATION_CONFIG["max_output_tokens"] * len(requests),
+            "response_mime_type": "application/json",
+            "response_schema": BATCH_RESPONSE_SCHEMA,
+        }
+        cache_key = _response_cache_key(config.gemini_model, SYSTEM_INSTRUCTION_BATCH, prompt, generation_config)
+        text = _get_cached_summary(cache_key)
+        model = None
+        if text is None:
+            model, text = await _agenerate_hedged(prompt, SYSTEM_INSTRUCTION_BATCH, generation_config)
+
+        summaries.update(_parse_batch_summaries(text, set(requests)))
+        # メインのモデルが応答し、全カテゴリの要約がそろった応答だけをキャッシュする
+        if model == config.gemini_model and len(summaries) == len(requests):
+            _store_summary(cache_key, text)
+        logger.info(f"Gemini一括要約生成成功: {len(summaries)}/{len(requests)}カテゴリ")
+
+    except Exception as e:
+        _log_summary_error(e)
+
+    retry = {key: request for key, request in requests.items() if key not in summaries}
+    if retry:
+        logger.warning(f"一括要約に含まれなかったカテゴリを個別に再生成します: {', '.join(retry)}")
+        summaries.update(await _agenerate_individually(retry, max_concurrency))
+    return {key: summaries[key] for key in requests}
+
+
+async def agenerate_category_summaries(
+    requests: dict[str, CategorySummaryRequest], max_concurrency: Optional[int] = None, batch: Optional[bool] = None
+) -> dict[str, Optional[str]]:
+    """
+    複数カテゴリの要約を生成
+
+    Args:
+        requests: カテゴリキーをキーにした要約の入力
+        max_concurrency: Gemini APIの最大同時呼び出し数（Noneの場合は設定値）
+        batch: 1回のAPI呼び出しでまとめて生成するか（Noneの場合は設定値、カテゴリが1つの場合は常に個別）
+
+    Returns:
+        カテゴリキーをキーにした要約テキストの辞書（入力順、失敗したカテゴリはNone）
+    """
+    if not requests:
+        return {}
+
+    if (config.gemini_batch_summaries if batch is None else batch) and len(requests) > 1:
+        return await agenerate_batch_category_summaries(requests, max_concurrency)
+    return await _agenerate_individually(requests, max_concurrency)
+
+
+def generate_category_summaries(
+    requests: dict[str, CategorySummaryRequest], max_concurrency: Optional[int] = None, batch: Optional[bool] = None
+) -> dict[str, Optional[str]]:
+    """
+    複数カテゴリの要約を生成（イベントループの外から呼び出す同期版）
+
+    Returns:
+        カテゴリキーをキーにした要約テキストの辞書（入力順、失敗したカテゴリはNone）
+    """
+    return _run_sync(agenerate_category_summaries(requests, max_concurrency, batch))
+
+
 def _format_changes_for_prompt(analysis: dict) -> str:
     """
     変化分析結果をプロンプト用のテキストに整形
@@ -249,6 +890,44 @@ def _format_changes_for_prompt(analysis: dict) -> str:
     return "\n".join(lines)
 
 
+def _format_windows_for_prompt(window_analyses: dict[int, dict]) -> str:
+    """
+    期間ごとの変化分析結果をプロンプト用のテキストに整形
+    """
+    lines = ["【期間ごとの比較】"]
+    for days, analysis in window_analyses.items():
+        rises = [c for c in analysis["rank_changes"] if c["change"] > 0]
+        falls = [c for c in analysis["rank_changes"] if c["change"] < 0]
+        line = (
+            f"- {days}日前（{analysis['timestamp'][:10]}）と比較: 新規{len(analysis['new_entries'])}件、"
+            f"上昇{len(rises)}件、下落{len(falls)}件、ランク外{len(analysis['dropped_out'])}件"
+        )
+        if rises:
+            top = max(rises, key=lambda c: c["change"])
+            line += f"（最大の上昇: {top['title']} {top['previous_rank']}位→{top['current_rank']}位）"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _format_trajectories_for_prompt(trajectories: list[BookTrajectory]) -> str:
+    """
+    上位の書籍の順位の推移をプロンプト用のテキストに整形
+    """
+    lines = ["【上位作品の推移】"]
+    for trajectory in trajectories[: config.gemini_summary_ranking_limit]:
+        trend = "横ばい"
+        if trajectory.velocity >= 0.05:
+            trend = f"1日あたり↑{trajectory.velocity:.1f}位"
+        elif trajectory.velocity <= -0.05:
+            trend = f"1日あたり↓{abs(trajectory.velocity):.1f}位"
+        lines.append(
+            f"- {trajectory.title}: ランクイン{trajectory.days_in_chart}日（最長{trajectory.longest_streak}日連続）、"
+            f"最高{trajectory.best_rank}位（{trajectory.days_to_peak:.0f}日で到達）、"
+            f"平均{trajectory.average_rank:.1f}位、{trend}"
+        )
+    return "\n".join(lines)
+
+
 def format_message_with_summary(ranking_text: str, summary: Optional[str] = None) -> str:
     """
     ランキングデータと要約を組み合わせて最終メッセージを作成
@@ -266,17 +945,36 @@ def format_message_with_summary(ranking_text: str, summary: Optional[str] = None
         return ranking_text
 
 
-def format_summary_only_message(summary: Optional[str] = None) -> str:
+def _category_suffix(category: Optional[str] = None) -> str:
+    """見出しに付けるカテゴリキー（メインのランキングの場合は空文字列）"""
+    return f"（カテゴリ: {category}）" if category else ""
+
+
+def format_summary_only_message(summary: Optional[str] = None, category: Optional[str] = None) -> str:
     """
     要約のみのメッセージを作成
 
     Args:
         summary: Gemini生成の要約（Noneの場合はデフォルトメッセージ）
+        category: カテゴリ別のランキングの場合はカテゴリキー
 
     Returns:
         要約メッセージテキスト
     """
     if summary:
-        return f"📚 **今日のKindleランキング分析**\n\n{summary}"
+        return f"📚 **今日のKindleランキング分析{_category_suffix(category)}**\n\n{summary}"
     else:
-        return "📚 **今日のKindleランキング**"
+        return f"📚 **今日のKindleランキング{_category_suffix(category)}**"
+
+
+def format_unchanged_message(category: Optional[str] = None) -> str:
+    """
+    ランキングに変動がなかった場合のメッセージを作成
+
+    Args:
+        category: カテゴリ別のランキングの場合はカテゴリキー
+
+    Returns:
+        変動なしのメッセージテキスト
+    """
+    return f"📚 **今日のKindleランキング{_category_suffix(category)}**\n\n前回から順位の変動はありませんでした。"
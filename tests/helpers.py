@@ -0,0 +1,38 @@
+"""
+テスト用のランキングデータと履歴エントリを作成する共通の関数
+"""
+
+
+def book(rank, asin, title=None, **fields):
+    """ASINの末尾1文字から書籍を作成（タイトルを省略した場合は「本<ASINの末尾>」）"""
+    return {
+        "rank": rank,
+        "title": title or f"本{asin}",
+        "url": f"https://www.amazon.co.jp/dp/B00000000{asin}",
+        **fields,
+    }
+
+
+def ranking(*titles):
+    """タイトルの順に1位から並べた、評価・価格付きのランキングを作成"""
+    return [
+        {
+            "rank": rank,
+            "title": title,
+            "rating": 4.0,
+            "review_count": 10,
+            "price": "￥500",
+            "url": f"https://www.amazon.co.jp/dp/B0TEST000{rank}",
+        }
+        for rank, title in enumerate(titles, 1)
+    ]
+
+
+def snapshot(timestamp, *books):
+    """書籍を並べた履歴エントリを作成"""
+    return {"timestamp": timestamp, "fingerprint": f"fp-{timestamp}", "rankings": list(books)}
+
+
+def history_entry(timestamp, *titles):
+    """タイトルの順に1位から並べた履歴エントリを作成"""
+    return snapshot(timestamp, *ranking(*titles))
@@ -0,0 +1,76 @@
+"""
+保存済みページの再解析機能のテスト
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+import history_manager
+from backfill import backfill_history
+from snapshot_archive import archive_page
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+URL = "https://www.amazon.co.jp/gp/bestsellers/digital-text/2275256051/"
+
+
+class TestBackfill(unittest.TestCase):
+    """保存済みページの再解析機能のテストクラス"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.archive_dir = os.path.join(self.temp_dir.name, "snapshots")
+        self.history_path = os.path.join(self.temp_dir.name, "history.json")
+        self.patcher = patch("history_manager.HISTORY_FILE", self.history_path)
+        self.patcher.start()
+
+        with open(os.path.join(FIXTURES_DIR, "ranking_page.html"), "rb") as f:
+            self.content = f.read()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.temp_dir.cleanup()
+
+    def test_backfill_history(self):
+        """保存済みのページから履歴が登録されることを確認"""
+        archive_page(self.archive_dir, URL, self.content)
+        archive_page(self.archive_dir, URL, b"<html>robot check</html>")
+        archive_page(self.archive_dir, "https://example.com/other", self.content)
+
+        stats = backfill_history(self.archive_dir, URL, limit=3, workers=2, batch_size=1)
+
+        self.assertEqual(stats.pages, 2)
+        self.assertEqual(stats.parsed, 1)
+        self.assertEqual(stats.failed, 1)
+
+        history = history_manager.load_history()
+        self.assertEqual(len(history), 1)
+        self.assertEqual([item["rank"] for item in history[0]["rankings"]], [1, 2, 3])
+        self.assertIn("fingerprint", history[0])
+
+    def test_missing_snapshot_is_counted_as_failed(self):
+        """マニフェストに記録されたページのファイルがない場合も中断せず、失敗として数えることを確認"""
+        archive_page(self.archive_dir, URL, self.content)
+        digest = archive_page(self.archive_dir, URL, b"<html>deleted</html>")
+        os.remove(os.path.join(self.archive_dir, f"{digest}.html.gz"))
+
+        stats = backfill_history(self.archive_dir, URL, limit=3, workers=1)
+
+        self.assertEqual((stats.parsed, stats.failed), (1, 1))
+        self.assertEqual(len(history_manager.load_history()), 1)
+
+    def test_empty_archive(self):
+        """対象ページがない場合は何もしないことを確認"""
+        stats = backfill_history(self.archive_dir, URL, limit=3, workers=1)
+
+        self.assertEqual(stats.pages, 0)
+        self.assertEqual(history_manager.load_history(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
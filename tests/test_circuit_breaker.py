@@ -0,0 +1,86 @@
+"""
+サーキットブレーカーのテスト
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from circuit_breaker import CircuitBreaker
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """サーキットブレーカーのテストクラス"""
+
+    def setUp(self):
+        self.now = 1000.0
+        self.patcher = patch("circuit_breaker.time.monotonic", side_effect=lambda: self.now)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_opens_after_threshold(self):
+        """連続失敗が閾値に達すると回路が開き、リクエストを許可しないことを確認"""
+        breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=60)
+
+        breaker.record_failure("captcha")
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure("captcha")
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+        self.assertEqual(breaker.remaining_cooldown(), 60)
+        self.assertEqual(breaker.last_reason, "captcha")
+
+    def test_success_resets_failures(self):
+        """成功すると連続失敗回数がリセットされることを確認"""
+        breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=60)
+
+        breaker.record_failure("captcha")
+        breaker.record_success()
+        breaker.record_failure("captcha")
+
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_allows_single_trial(self):
+        """クールダウン後は1件だけ試行を許可し、結果で状態が決まることを確認"""
+        breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=60)
+        breaker.record_failure("captcha")
+
+        self.now += 61
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        # 試行が失敗すると再び開く
+        breaker.record_failure("captcha")
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        # 次の試行が成功すると閉じる
+        self.now += 61
+        self.assertTrue(breaker.allow_request())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+    def test_release_returns_trial(self):
+        """成否を判定できなかった試行は試行枠を返し、次のリクエストで再試行できることを確認"""
+        breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=60)
+        breaker.record_failure("captcha")
+
+        self.now += 61
+        self.assertTrue(breaker.allow_request())
+        breaker.release()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertTrue(breaker.allow_request())
+
+
+if __name__ == "__main__":
+    unittest.main()
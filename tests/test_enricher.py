@@ -0,0 +1,142 @@
+"""
+商品詳細の取得機能とディスクキャッシュのテスト
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from bs4 import BeautifulSoup
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from disk_cache import DiskCache
+from enricher import BookDetails, _parse_book_details, enrich_rankings
+
+PRODUCT_PAGE_HTML = """
+<html><body>
+<div id="wayfinding-breadcrumbs_feature_div"><ul>
+  <li><span class="a-list-item"><a class="a-link-normal" href="/kindle">Kindleストア</a></span></li>
+  <li><span class="a-list-item"><a class="a-link-normal" href="/books">Kindle本</a></span></li>
+  <li><span class="a-list-item"><a class="a-link-normal" href="/novel">  文学・評論  </a></span></li>
+</ul></div>
+<div id="bylineInfo">
+  <span class="author notFaded"><a class="a-link-normal" href="/e/1">河野裕</a><span>(著)</span></span>
+  <span class="author notFaded"><a class="a-link-normal" href="/e/2">山田太郎</a><span>(イラスト)</span></span>
+</div>
+<div id="detailBullets_feature_div"><ul>
+  <li><span class="a-list-item"><span class="a-text-bold">出版社 &rlm; : &lrm;</span> <span>新潮社 (2019/8/28)</span></span></li>
+  <li><span class="a-list-item"><span class="a-text-bold">発売日 &rlm; : &lrm;</span> <span>2019/8/28</span></span></li>
+</ul></div>
+</body></html>
+"""
+
+
+class TestBookDetails(unittest.TestCase):
+    """商品詳細の取得機能のテストクラス"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(os.path.join(self.temp_dir.name, "cache.json"), ttl_seconds=3600, max_entries=10)
+        self.ranking_data = [
+            {"rank": 1, "title": "書籍A", "url": "https://www.amazon.co.jp/dp/B000000001"},
+            {"rank": 2, "title": "書籍B", "url": "https://www.amazon.co.jp/dp/B000000002"},
+            {"rank": 3, "title": "書籍C", "url": "URLなし"},
+        ]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_parse_book_details(self):
+        """商品ページから詳細情報を抽出できることを確認"""
+        details = _parse_book_details(BeautifulSoup(PRODUCT_PAGE_HTML, "html.parser"))
+
+        self.assertEqual(details.author, "河野裕、山田太郎")
+        self.assertEqual(details.publisher, "新潮社 (2019/8/28)")
+        self.assertEqual(details.release_date, "2019/8/28")
+        self.assertEqual(details.categories, ["Kindleストア", "Kindle本", "文学・評論"])
+
+    @patch("enricher._fetch_book_details")
+    def test_enrich_uses_cache(self, mock_fetch):
+        """キャッシュ済みのASINは取得せず、新しいASINだけを取得することを確認"""
+        cached = {"author": "キャッシュ著者", "publisher": None, "release_date": None, "categories": []}
+        self.cache.set("B000000001", cached)
+        mock_fetch.return_value = BookDetails(author="新規著者")
+
+        enriched = enrich_rankings(self.ranking_data, cache=self.cache, max_workers=2)
+
+        mock_fetch.assert_called_once_with("B000000002")
+        self.assertEqual([item["author"] for item in enriched], ["キャッシュ著者", "新規著者", None])
+        self.assertEqual(enriched[0]["title"], "書籍A")
+
+        # 保存したキャッシュを読み込み直しても取得済みのASINが残っていることを確認
+        reloaded = DiskCache(self.cache.path, ttl_seconds=3600, max_entries=10)
+        self.assertEqual(reloaded.get("B000000002")["author"], "新規著者")
+
+    @patch("enricher._fetch_book_details")
+    def test_failed_fetch_not_cached(self, mock_fetch):
+        """取得に失敗したASINはキャッシュしないことを確認"""
+        mock_fetch.return_value = None
+
+        enriched = enrich_rankings(self.ranking_data[:1], cache=self.cache)
+
+        self.assertIsNone(enriched[0]["author"])
+        self.assertIsNone(self.cache.get("B000000001"))
+
+
+class TestDiskCache(unittest.TestCase):
+    """ディスクキャッシュのテストクラス"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "cache.json")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_ttl(self):
+        """有効期限を過ぎたエントリが取得できないことを確認"""
+        cache = DiskCache(self.path, ttl_seconds=60, max_entries=10)
+        cache.set("key", "value")
+
+        self.assertEqual(cache.get("key"), "value")
+        with patch("disk_cache.time.time", MagicMock(return_value=time.time() + 120)):
+            self.assertIsNone(cache.get("key"))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_hit_does_not_rewrite_file(self):
+        """参照しただけではキャッシュファイルを書き換えないことを確認"""
+        cache = DiskCache(self.path, ttl_seconds=60, max_entries=10)
+        cache.set("key", "value")
+        cache.save()
+
+        cache = DiskCache(self.path, ttl_seconds=60, max_entries=10)
+        self.assertEqual(cache.get("key"), "value")
+        with patch("disk_cache.os.replace") as mock_replace:
+            cache.save()
+        mock_replace.assert_not_called()
+
+    def test_lru_eviction(self):
+        """最大件数を超えた場合に最も長く参照されていないエントリが削除されることを確認"""
+        cache = DiskCache(self.path, ttl_seconds=60, max_entries=2)
+        with patch("disk_cache.time.time") as mock_time:
+            mock_time.return_value = 100.0
+            cache.set("a", 1)
+            mock_time.return_value = 101.0
+            cache.set("b", 2)
+            mock_time.return_value = 102.0
+            cache.get("a")
+            mock_time.return_value = 103.0
+            cache.set("c", 3)
+
+            self.assertEqual(cache.get("a"), 1)
+            self.assertIsNone(cache.get("b"))
+            self.assertEqual(cache.get("c"), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+商品セルの抽出戦略のテスト
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+from bs4 import BeautifulSoup
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+import extraction_strategies
+from extraction_strategies import extract_field, get_extraction_stats, layout_fingerprint, reset_extraction_stats
+
+CURRENT_CELL = """
+<div class="_cDEzb_grid-cell_1uMOS">
+  <div class="p13n-sc-uncoverable-faceout" id="B0CURRENT1">
+    <a class="a-link-normal aok-block" href="/dp/B0CURRENT1/"></a>
+    <div class="_cDEzb_p13n-sc-css-line-clamp-1_1Fn1y">現行の本</div>
+    <div class="a-icon-row"><a aria-label="5つ星のうち4.2、1,234件のレーティング"></a></div>
+    <span class="a-color-price"><span class="_cDEzb_p13n-sc-price_3mJ9Z">￥500</span></span>
+  </div>
+</div>
+"""
+
+# CSSの再ビルドで難読化されたクラス名が変わり、一部の属性もなくなったセル
+DRIFTED_CELL = """
+<div class="_xYz12_grid-cell_9aBcD">
+  <a class="a-link-normal aok-block" href="/dp/B0DRIFTED1/ref=zg_bs"><img alt="変更後の本" src="x.jpg"></a>
+  <div class="_xYz12_p13n-sc-css-line-clamp-2_4QwEr">変更後の本</div>
+  <div class="a-row"><a class="a-link-normal" aria-label="5つ星のうち3.8、56件のレーティング"></a></div>
+  <span class="a-size-base">￥1,200</span>
+</div>
+"""
+
+
+def _cell(html):
+    return BeautifulSoup(html, "html.parser").div
+
+
+class TestExtractionStrategies(unittest.TestCase):
+    """抽出戦略のテストクラス"""
+
+    def setUp(self):
+        reset_extraction_stats()
+
+    def tearDown(self):
+        reset_extraction_stats()
+
+    def _extract_all(self, item):
+        layout = layout_fingerprint(item)
+        return {name: extract_field(name, item, layout) for name in extraction_strategies.FIELD_STRATEGIES}
+
+    def test_current_layout_uses_primary_strategies(self):
+        """現行のレイアウトでは最優先の戦略で抽出し、代替の戦略は使わないことを確認"""
+        values = self._extract_all(_cell(CURRENT_CELL))
+
+        self.assertEqual(
+            values,
+            {"title": "現行の本", "rating": (4.2, 1234), "price": "￥500", "product_id": "B0CURRENT1"},
+        )
+        stats = get_extraction_stats()
+        self.assertTrue(all(field_stats["fallback_hits"] == 0 for field_stats in stats.values()))
+        self.assertEqual(stats["title"]["hits"], {"line_clamp_class": 1})
+
+    def test_drifted_layout_falls_back(self):
+        """クラス名が変わったレイアウトでも代替の戦略で抽出でき、統計に表れることを確認"""
+        values = self._extract_all(_cell(DRIFTED_CELL))
+
+        self.assertEqual(
+            values,
+            {"title": "変更後の本", "rating": (3.8, 56), "price": "￥1,200", "product_id": "B0DRIFTED1"},
+        )
+        stats = get_extraction_stats()
+        self.assertEqual(stats["title"]["hits"], {"line_clamp_pattern": 1})
+        self.assertEqual(stats["price"]["hits"], {"yen_text": 1})
+        self.assertEqual(stats["product_id"]["hits"], {"dp_link": 1})
+        self.assertEqual(stats["rating"]["fallback_hits"], 1)
+
+    def test_winner_cached_per_layout(self):
+        """レイアウトごとに成功した代替の戦略を記憶し、次のセルでは最優先の戦略の次にその戦略を試すことを確認"""
+        item = _cell(DRIFTED_CELL)
+        layout = layout_fingerprint(item)
+        extract_field("price", item, layout)
+
+        calls = []
+        strategies = extraction_strategies.FIELD_STRATEGIES["price"]
+        patched = tuple(
+            extraction_strategies.Strategy(
+                s.name, lambda cell, s=s: calls.append(s.name) or s.extract(cell), s.fallback, s.same_value
+            )
+            for s in strategies
+        )
+        with patch.dict(extraction_strategies.FIELD_STRATEGIES, {"price": patched}):
+            self.assertEqual(extract_field("price", item, layout), "￥1,200")
+            self.assertEqual(calls, ["price_class", "yen_text"])
+
+            # 別のレイアウトは最優先の戦略から試す
+            calls.clear()
+            current = _cell(CURRENT_CELL)
+            extract_field("price", current, layout_fingerprint(current))
+            self.assertEqual(calls, ["price_class"])
+
+    def test_same_value_winner_tried_first(self):
+        """最優先の戦略と同じ値を返す戦略は、記憶した場合に最優先の戦略より先に試すことを確認"""
+        drifted = _cell(DRIFTED_CELL)
+        layout = layout_fingerprint(drifted)
+        extract_field("product_id", drifted, layout)
+
+        self.assertEqual(extract_field("product_id", _cell(CURRENT_CELL), layout), "B0CURRENT1")
+        self.assertEqual(get_extraction_stats()["product_id"]["hits"], {"dp_link": 2})
+
+    def test_mixed_cells_keep_primary_title(self):
+        """タイトルのないセルの後でも、タイトルのあるセルは最優先の戦略でタイトルを抽出することを確認"""
+        untitled = _cell(
+            '<div class="_cDEzb_grid-cell_1uMOS"><a href="/dp/B0UNTITLE1/"><img alt="表紙の文字" src="x.jpg"></a></div>'
+        )
+        titled = _cell(CURRENT_CELL.replace("</a>", '<img alt="表紙の文字" src="y.jpg"></a>', 1))
+        # ページのレイアウトの指紋は先頭のセルから作る
+        layout = layout_fingerprint(untitled)
+
+        self.assertEqual(extract_field("title", untitled, layout), "表紙の文字")
+        self.assertEqual(extract_field("title", titled, layout), "現行の本")
+        self.assertEqual(extract_field("title", untitled, layout), "表紙の文字")
+        self.assertEqual(get_extraction_stats()["title"]["hits"], {"image_alt": 2, "line_clamp_class": 1})
+
+    def test_missing_field_counts_as_miss(self):
+        """どの戦略でも抽出できない項目は未抽出として数えることを確認"""
+        item = _cell('<div><a class="a-link-normal aok-block"></a></div>')
+
+        self.assertIsNone(extract_field("rating", item, layout_fingerprint(item)))
+        self.assertEqual(get_extraction_stats()["rating"]["hit_rate"], 0.0)
+
+    def test_layout_fingerprint(self):
+        """同じクラス構成のセルは同じ指紋、異なる構成は異なる指紋になることを確認"""
+        self.assertEqual(layout_fingerprint(_cell(CURRENT_CELL)), layout_fingerprint(_cell(CURRENT_CELL)))
+        self.assertNotEqual(layout_fingerprint(_cell(CURRENT_CELL)), layout_fingerprint(_cell(DRIFTED_CELL)))
+
+
+if __name__ == "__main__":
+    unittest.main()
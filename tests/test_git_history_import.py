@@ -0,0 +1,98 @@
+"""
+gitの履歴からの履歴取り込み機能のテスト
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from git_history_import import import_git_history, list_revisions, read_blobs
+from history_manager import encode_history
+from history_store import SqliteHistoryStore
+from tests.helpers import history_entry
+
+
+class TestGitHistoryImport(unittest.TestCase):
+    """gitの履歴からの取り込み機能のテストクラス"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.repo = os.path.join(self.temp_dir.name, "repo")
+        os.makedirs(self.repo)
+        self._git("init", "-q")
+        self.store = SqliteHistoryStore(os.path.join(self.temp_dir.name, "history.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+
+    def _git(self, *args):
+        subprocess.run(
+            ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+            cwd=self.repo,
+            check=True,
+            capture_output=True,
+        )
+
+    def _commit(self, data, message):
+        with open(os.path.join(self.repo, "ranking_history.json"), "w", encoding="utf-8") as f:
+            f.write(data if isinstance(data, str) else json.dumps(data, ensure_ascii=False))
+        self._git("add", "ranking_history.json")
+        self._git("commit", "-q", "--allow-empty", "-m", message)
+
+    def test_import_git_history(self):
+        """全リビジョンの履歴をタイムスタンプで重複を除いて取り込めることを確認"""
+        day1 = history_entry("2025-01-01T09:00:00", "1日目")
+        day2 = history_entry("2025-01-02T09:00:00", "2日目")
+        day3 = history_entry("2025-01-03T09:00:00", "3日目")
+        day4 = history_entry("2025-01-04T09:00:00", "4日目")
+        # 従来の形式とカタログ形式のリビジョンが混在し、履歴は直近3件に切り詰められている
+        self._commit({"history": [day1]}, "1")
+        self._commit({"history": [day2, day1]}, "2")
+        self._commit("{壊れたJSON", "broken")
+        self._commit({"history": [day3, day2, day1]}, "3")
+        self._commit(encode_history([day4, day3, day2]), "4")
+
+        stats = import_git_history("ranking_history.json", self.repo, store=self.store, workers=2, batch_size=2)
+
+        self.assertEqual(stats.revisions, 5)
+        self.assertEqual(stats.failed, 1)
+        self.assertEqual(stats.snapshots, 4)
+        self.assertEqual(self.store.load_history(), [day4, day3, day2, day1])
+
+        # 再実行しても重複しない
+        import_git_history("ranking_history.json", self.repo, store=self.store, workers=1)
+        self.assertEqual(len(self.store.load_history()), 4)
+
+    def test_same_content_decoded_once(self):
+        """内容が同じリビジョンは1回だけ読み出すことを確認"""
+        self._commit({"history": [history_entry("2025-01-01T09:00:00", "1日目")]}, "1")
+        self._commit({"history": []}, "2")
+        self._commit({"history": [history_entry("2025-01-01T09:00:00", "1日目")]}, "3")
+
+        revisions = list_revisions("ranking_history.json", self.repo)
+        self.assertEqual(len(revisions), 3)
+        self.assertEqual(revisions[0][1], revisions[2][1])
+        self.assertEqual(len(read_blobs([revisions[0][1], revisions[1][1]], self.repo)), 2)
+
+        stats = import_git_history("ranking_history.json", self.repo, store=self.store, workers=1)
+        self.assertEqual((stats.revisions, stats.blobs, stats.snapshots), (3, 2, 1))
+
+    def test_no_revisions(self):
+        """履歴ファイルのリビジョンがない場合は何もしないことを確認"""
+        self._git("commit", "-q", "--allow-empty", "-m", "initial")
+
+        stats = import_git_history("ranking_history.json", self.repo, store=self.store, workers=1)
+
+        self.assertEqual(stats.revisions, 0)
+        self.assertEqual(self.store.load_history(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
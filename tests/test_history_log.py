@@ -0,0 +1,143 @@
+"""
+追記専用のランキング履歴ログのテスト
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from history_log import CURRENT_LOG, INDEX_FILE, SEGMENTS_DIR, HistoryLog
+from tests.helpers import history_entry
+
+
+class TestHistoryLog(unittest.TestCase):
+    """追記専用のランキング履歴ログのテストクラス"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temp_dir.name, "log")
+        self.log = HistoryLog(self.directory)
+        self.entries = [
+            history_entry("2025-01-30T09:00:00", "1月30日"),
+            history_entry("2025-01-31T09:00:00", "1月31日"),
+            history_entry("2025-02-01T09:00:00", "2月1日"),
+            history_entry("2025-02-02T09:00:00", "2月2日"),
+        ]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _titles(self, entries):
+        return [entry["rankings"][0]["title"] for entry in entries]
+
+    def test_append_one_line_per_entry(self):
+        """1エントリが1行のコンパクトなJSONとして追記され、fsyncされることを確認"""
+        with patch("history_log.os.fsync") as mock_fsync:
+            self.log.append(self.entries[:1])
+            self.log.append(self.entries[1:2], category="2293143051")
+
+        with open(os.path.join(self.directory, CURRENT_LOG), encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertNotIn("\n  ", lines[0])
+        self.assertEqual(json.loads(lines[1])["category"], "2293143051")
+        self.assertEqual(mock_fsync.call_count, 2)
+
+    def test_read_latest_before_and_after_compaction(self):
+        """コンパクションの前後で同じ結果が読めることを確認"""
+        self.log.append(self.entries)
+        before = self.log.read_latest(limit=2)
+
+        self.assertEqual(self.log.compact(), 4)
+        after = HistoryLog(self.directory).read_latest(limit=2)
+
+        self.assertEqual(before, after)
+        self.assertEqual(self._titles(after), ["2月2日", "2月1日"])
+        self.assertEqual(
+            self._titles(HistoryLog(self.directory).read_latest()), ["2月2日", "2月1日", "1月31日", "1月30日"]
+        )
+        self.assertEqual(os.path.getsize(os.path.join(self.directory, CURRENT_LOG)), 0)
+
+    def test_dated_segments_and_offset_index(self):
+        """月ごとのセグメントに分かれ、索引のバイト位置で各エントリを読めることを確認"""
+        self.log.append(self.entries)
+        self.log.compact()
+
+        segments = sorted(os.listdir(os.path.join(self.directory, SEGMENTS_DIR)))
+        self.assertEqual([name[:7] for name in segments], ["2025-01", "2025-02"])
+
+        with open(os.path.join(self.directory, INDEX_FILE), encoding="utf-8") as f:
+            index = json.load(f)["entries"]
+        timestamp, _, segment, offset, length = index[1]
+        with open(os.path.join(self.directory, SEGMENTS_DIR, segment), "rb") as f:
+            f.seek(offset)
+            self.assertEqual(json.loads(f.read(length))["timestamp"], timestamp)
+
+    def test_reads_merge_log_and_segments(self):
+        """コンパクション後の追記分と同じタイムスタンプの置き換えが反映されることを確認"""
+        self.log.append(self.entries[:3])
+        self.log.compact()
+        self.log.append([self.entries[3], history_entry("2025-02-01T09:00:00", "2月1日（再解析）")])
+
+        self.assertEqual(self._titles(self.log.read_latest(limit=3)), ["2月2日", "2月1日（再解析）", "1月31日"])
+
+        self.log.compact()
+        self.assertEqual(self._titles(HistoryLog(self.directory).read_latest(limit=2)), ["2月2日", "2月1日（再解析）"])
+        self.assertEqual(len(os.listdir(os.path.join(self.directory, SEGMENTS_DIR))), 2)
+
+    def test_read_at(self):
+        """指定日時の時点で最新のエントリが読めることを確認"""
+        self.log.append(self.entries[:3])
+        self.log.compact()
+        self.log.append(self.entries[3:])
+
+        self.assertIsNone(self.log.read_at("2025-01-29"))
+        self.assertEqual(self.log.read_at("2025-01-31")["timestamp"], "2025-01-31T09:00:00")
+        self.assertEqual(self.log.read_at("2025-02-01T08:00:00")["timestamp"], "2025-01-31T09:00:00")
+        self.assertEqual(self.log.read_at("2025-03-01")["timestamp"], "2025-02-02T09:00:00")
+
+    def test_read_seeks_instead_of_scanning(self):
+        """コンパクション後の最新N件の読み込みでは、必要なエントリだけを読むことを確認"""
+        self.log.append(self.entries)
+        self.log.compact()
+
+        log = HistoryLog(self.directory)
+        with patch.object(log, "_read_indexed", wraps=log._read_indexed) as mock_read:
+            log.read_latest(limit=1)
+        self.assertEqual(len(mock_read.call_args.args[0]), 1)
+
+    def test_compacts_when_log_exceeds_threshold(self):
+        """追記後のログがしきい値を超えた場合は自動でコンパクションし、超えない間は追記だけを行うことを確認"""
+        current_path = os.path.join(self.directory, CURRENT_LOG)
+        log = HistoryLog(self.directory, compact_bytes=300)
+
+        log.append(self.entries[:1])
+        self.assertGreater(os.path.getsize(current_path), 0)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, INDEX_FILE)))
+
+        log.append(self.entries[1:])
+        self.assertEqual(os.path.getsize(current_path), 0)
+        self.assertEqual(len(os.listdir(os.path.join(self.directory, SEGMENTS_DIR))), 2)
+        self.assertEqual(self._titles(HistoryLog(self.directory).read_latest(limit=1)), ["2月2日"])
+
+    def test_truncated_last_line_ignored(self):
+        """書き込み途中で切れた最終行は無視されることを確認"""
+        self.log.append(self.entries[:1])
+        with open(os.path.join(self.directory, CURRENT_LOG), "ab") as f:
+            f.write(b'{"category":"","timestamp":"2025-')
+
+        self.assertEqual(self._titles(self.log.read_latest()), ["1月30日"])
+
+        # 続けて追記したエントリは壊れた行と混ざらない
+        self.log.append(self.entries[1:2])
+        self.assertEqual(self._titles(self.log.read_latest()), ["1月31日", "1月30日"])
+
+
+if __name__ == "__main__":
+    unittest.main()
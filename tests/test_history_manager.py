@@ -4,19 +4,33 @@
 
 import json
 import os
+import sys
 import tempfile
 import unittest
 from datetime import datetime
 from pathlib import Path
 from unittest.mock import patch
 
-from src.history_manager import (
-    add_ranking_to_history,
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from history_manager import (
     analyze_ranking_changes,
+    analyze_ranking_windows,
+    build_rank_map,
+    compute_ranking_fingerprint,
+    decode_history,
+    encode_history,
+    entry_bound,
+    extract_asin,
+    find_entry_at,
+    get_entry_fingerprint,
     get_previous_rankings,
     load_history,
+    merge_history_entries,
     save_history,
 )
+from history_store import JsonHistoryStore
 
 
 class TestHistoryManager(unittest.TestCase):
@@ -29,7 +43,7 @@ class TestHistoryManager(unittest.TestCase):
         os.close(self.temp_fd)
 
         # パッチを適用
-        self.patcher = patch("src.history_manager.HISTORY_FILE", self.temp_path)
+        self.patcher = patch("history_manager.HISTORY_FILE", self.temp_path)
         self.patcher.start()
 
         # サンプルデータ
@@ -61,6 +75,12 @@ class TestHistoryManager(unittest.TestCase):
         if os.path.exists(self.temp_path):
             os.unlink(self.temp_path)
 
+    def add_ranking(self, ranking_data, validators=None):
+        """JsonHistoryStoreでランキングを1件追加して保存する（実行ごとの保存と同じ手順）"""
+        store = JsonHistoryStore(self.temp_path)
+        store.add_ranking(ranking_data, validators)
+        store.close()
+
     def test_load_empty_history(self):
         """空の履歴を読み込むテスト"""
         history = load_history()
@@ -76,10 +96,78 @@ class TestHistoryManager(unittest.TestCase):
         self.assertEqual(len(loaded), 1)
         self.assertEqual(loaded[0]["rankings"], self.sample_ranking_data)
 
-    def test_add_ranking_to_history(self):
+    def test_catalog_format_roundtrip(self):
+        """カタログ形式で保存しても、タイトルの変化やASINのない書籍を含めて元の履歴に戻ることを確認"""
+        book = {"rank": 1, "title": "旧タイトル", "rating": 4.5, "review_count": 10, "price": "￥500"}
+        history = [
+            {
+                "timestamp": "2025-01-02T09:00:00",
+                "fingerprint": "fp2",
+                "validators": {"https://example.com/": {"etag": "v2"}},
+                "rankings": [
+                    dict(book, title="新タイトル", url="https://www.amazon.co.jp/dp/B000000001"),
+                    {"rank": 2, "title": "URLなし", "url": "https://example.com/2"},
+                ],
+            },
+            {
+                "timestamp": "2025-01-01T09:00:00",
+                "fingerprint": "fp1",
+                "rankings": [dict(book, rank=3, url="https://www.amazon.co.jp/dp/B000000001")],
+            },
+        ]
+
+        save_history(history)
+        with open(self.temp_path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        self.assertEqual(data["version"], 2)
+        self.assertEqual(data["catalog"]["B000000001"]["title"], "新タイトル")
+        self.assertEqual(
+            data["history"][0]["rows"][0], {"asin": "B000000001", **{k: v for k, v in book.items() if k != "title"}}
+        )
+        # カタログと異なるタイトルだけを行に保存する
+        self.assertEqual(data["history"][1]["rows"][0]["title"], "旧タイトル")
+        self.assertEqual(load_history(), history)
+
+    def test_decode_catalog_format(self):
+        """カタログ形式の履歴がrankingsを持つ通常の辞書に戻ることを確認"""
+        history = decode_history(encode_history([{"timestamp": "t", "rankings": self.sample_ranking_data}]))
+
+        self.assertIs(type(history[0]), dict)
+        self.assertEqual(history[0], {"timestamp": "t", "rankings": self.sample_ranking_data})
+
+    def test_load_legacy_format(self):
+        """形式バージョン1の履歴ファイルも読み込めることを確認"""
+        legacy = [{"timestamp": "2025-01-01T09:00:00", "rankings": self.sample_ranking_data}]
+        with open(self.temp_path, "w", encoding="utf-8") as f:
+            json.dump({"history": legacy}, f, ensure_ascii=False)
+
+        self.assertEqual(load_history(), legacy)
+
+    def test_catalog_format_is_smaller(self):
+        """同じ書籍が続くスナップショットでは、従来の形式より大幅に小さくなることを確認"""
+        rankings = [
+            {
+                "rank": rank,
+                "title": f"とても長いタイトルの書籍その{rank}（シリーズ名・レーベル名）",
+                "rating": 4.5,
+                "review_count": 100 + rank,
+                "price": "￥1,000",
+                "url": f"https://www.amazon.co.jp/dp/B00000{rank:04d}",
+            }
+            for rank in range(1, 51)
+        ]
+        history = [{"timestamp": f"2025-01-{day:02d}T09:00:00", "rankings": rankings} for day in range(1, 31)]
+
+        save_history(history)
+        legacy_size = len(json.dumps({"history": history}, ensure_ascii=False, indent=2).encode("utf-8"))
+
+        self.assertLess(os.path.getsize(self.temp_path) * 3, legacy_size)
+
+    def test_add_ranking(self):
         """ランキングを履歴に追加するテスト"""
         # 初回追加
-        add_ranking_to_history(self.sample_ranking_data)
+        self.add_ranking(self.sample_ranking_data)
         history = load_history()
 
         self.assertEqual(len(history), 1)
@@ -89,7 +177,7 @@ class TestHistoryManager(unittest.TestCase):
         new_data = self.sample_ranking_data.copy()
         new_data[0] = new_data[0].copy()
         new_data[0]["title"] = "新しい書籍"
-        add_ranking_to_history(new_data)
+        self.add_ranking(new_data)
         history = load_history()
 
         self.assertEqual(len(history), 2)
@@ -103,33 +191,46 @@ class TestHistoryManager(unittest.TestCase):
             data = self.sample_ranking_data.copy()
             data[0] = data[0].copy()
             data[0]["title"] = f"書籍{i}"
-            add_ranking_to_history(data)
+            self.add_ranking(data)
 
         history = load_history()
         self.assertEqual(len(history), 3)
         self.assertEqual(history[0]["rankings"][0]["title"], "書籍3")  # 最新
         self.assertEqual(history[2]["rankings"][0]["title"], "書籍1")  # 最古（書籍0は削除済み）
 
+    def test_merge_history_entries(self):
+        """複数エントリの一括追加で、タイムスタンプ順に並び最大保存数が守られることを確認"""
+        entries = [
+            {"timestamp": f"2025-01-0{day}T12:00:00", "rankings": self.sample_ranking_data} for day in range(1, 6)
+        ]
+        history = merge_history_entries([], entries[:2])
+        history = merge_history_entries(history, entries[2:] + [entries[4]])
+
+        self.assertEqual(
+            [entry["timestamp"] for entry in history],
+            ["2025-01-05T12:00:00", "2025-01-04T12:00:00", "2025-01-03T12:00:00"],
+        )
+
     def test_get_previous_rankings_empty(self):
         """履歴が空の場合の前回ランキング取得テスト"""
         self.assertIsNone(get_previous_rankings())
 
     def test_get_previous_rankings_single(self):
         """履歴が1つの場合の前回ランキング取得テスト"""
-        add_ranking_to_history(self.sample_ranking_data)
+        self.add_ranking(self.sample_ranking_data)
         # 初回実行後なので、その履歴を返す
         self.assertEqual(get_previous_rankings(), self.sample_ranking_data)
 
     def test_get_previous_rankings_multiple(self):
         """履歴が複数の場合の前回ランキング取得テスト"""
         # 1回目
-        add_ranking_to_history(self.sample_ranking_data)
+        self.add_ranking(self.sample_ranking_data)
 
         # 2回目
         new_data = self.sample_ranking_data.copy()
         new_data[0] = new_data[0].copy()
         new_data[0]["title"] = "新しい書籍"
-        add_ranking_to_history(new_data)
+        self.add_ranking(new_data)
 
         # 2番目（前回）のデータが返される
         previous = get_previous_rankings()
@@ -176,6 +277,102 @@ class TestHistoryManager(unittest.TestCase):
         self.assertEqual(analysis["dropped_out"][0]["title"], "書籍C")
         self.assertEqual(analysis["dropped_out"][0]["previous_rank"], 3)
 
+    def test_analyze_ranking_changes_uses_asin(self):
+        """タイトルの表記が変わっても、同じASINの書籍は順位変動として扱われることを確認"""
+        previous = [{"rank": 1, "title": "旧タイトル", "url": "https://www.amazon.co.jp/dp/B000000001"}]
+        current = [
+            {"rank": 1, "title": "別の書籍", "url": "https://www.amazon.co.jp/dp/B000000002"},
+            {"rank": 2, "title": "新タイトル", "url": "https://www.amazon.co.jp/dp/B000000001"},
+        ]
+
+        analysis = analyze_ranking_changes(current, previous)
+
+        self.assertEqual([entry["key"] for entry in analysis["new_entries"]], ["B000000002"])
+        self.assertEqual(analysis["dropped_out"], [])
+        self.assertEqual(
+            analysis["rank_changes"],
+            [{"key": "B000000001", "title": "新タイトル", "current_rank": 2, "previous_rank": 1, "change": -1}],
+        )
+
+    def test_build_rank_map_keeps_first(self):
+        """同じ書籍が重複した場合は上位の順位を使うことを確認"""
+        rankings = [
+            {"rank": 1, "title": "書籍A", "url": "https://www.amazon.co.jp/dp/B000000001"},
+            {"rank": 2, "title": "書籍A（重複）", "url": "https://www.amazon.co.jp/dp/B000000001"},
+            {"rank": 3, "title": "URLなし"},
+        ]
+        rank_map = build_rank_map(rankings)
+        self.assertEqual(rank_map["B000000001"]["rank"], 1)
+        self.assertEqual(rank_map["URLなし"]["rank"], 3)
+
+    def test_analyze_ranking_windows(self):
+        """複数の時点と1回で比較し、同じ履歴エントリの比較は使い回すことを確認"""
+        current = [{"rank": 1, "title": "書籍A"}, {"rank": 2, "title": "書籍B"}]
+        yesterday = {"timestamp": "2025-01-09T09:00:00", "rankings": [{"rank": 1, "title": "書籍B"}]}
+        last_week = {"timestamp": "2025-01-03T09:00:00", "rankings": [{"rank": 1, "title": "書籍C"}]}
+
+        windows = analyze_ranking_windows(current, {30: None, 7: last_week, 1: yesterday, 3: yesterday})
+
+        self.assertEqual(list(windows), [1, 3, 7])
+        self.assertEqual(windows[1]["timestamp"], "2025-01-09T09:00:00")
+        self.assertEqual([entry["title"] for entry in windows[1]["new_entries"]], ["書籍A"])
+        self.assertEqual(windows[1]["rank_changes"][0]["change"], -1)
+        self.assertIs(windows[3]["rank_changes"], windows[1]["rank_changes"])
+        self.assertEqual(len(windows[7]["new_entries"]), 2)
+        self.assertEqual(windows[7]["dropped_out"], [{"key": "書籍C", "title": "書籍C", "previous_rank": 1}])
+
+    def test_find_entry_at(self):
+        """指定日時の時点で最新のエントリを探せることを確認（日付のみはその日の終わりまでを含める）"""
+        history = [
+            {"timestamp": "2025-01-10T09:00:00", "rankings": []},
+            {"timestamp": "2025-01-09T09:00:00", "rankings": []},
+        ]
+        self.assertEqual(find_entry_at(history, "2025-01-10")["timestamp"], "2025-01-10T09:00:00")
+        self.assertEqual(find_entry_at(history, "2025-01-10T08:00:00")["timestamp"], "2025-01-09T09:00:00")
+        self.assertIsNone(find_entry_at(history, "2025-01-08"))
+
+    def test_entry_bound(self):
+        """日付のみの指定はその日のどの時刻よりも大きく、日時の指定はそのままになることを確認"""
+        self.assertGreater(entry_bound("2025-01-10"), "2025-01-10T23:59:59.999999")
+        self.assertLess(entry_bound("2025-01-10"), "2025-01-11")
+        self.assertEqual(entry_bound("2025-01-10T08:00:00"), "2025-01-10T08:00:00")
+
+    def test_fingerprint_ignores_price_and_rating(self):
+        """フィンガープリントが順位と書籍だけで決まることを確認"""
+        changed = [dict(item, price="¥0", rating=1.0, review_count=1) for item in self.sample_ranking_data]
+        self.assertEqual(compute_ranking_fingerprint(self.sample_ranking_data), compute_ranking_fingerprint(changed))
+
+    def test_fingerprint_detects_rank_change(self):
+        """順位が入れ替わるとフィンガープリントが変わることを確認"""
+        swapped = [dict(self.sample_ranking_data[1], rank=1), dict(self.sample_ranking_data[0], rank=2)]
+        self.assertNotEqual(compute_ranking_fingerprint(self.sample_ranking_data), compute_ranking_fingerprint(swapped))
+
+    def test_fingerprint_uses_asin(self):
+        """同じASINならタイトルが変わってもフィンガープリントが変わらないことを確認"""
+        before = [{"rank": 1, "title": "旧タイトル", "url": "https://www.amazon.co.jp/dp/B000000001"}]
+        after = [{"rank": 1, "title": "新タイトル", "url": "https://www.amazon.co.jp/dp/B000000001"}]
+        self.assertEqual(compute_ranking_fingerprint(before), compute_ranking_fingerprint(after))
+
+    def test_extract_asin(self):
+        """商品URLからASINを取り出すテスト"""
+        self.assertEqual(extract_asin("https://www.amazon.co.jp/dp/B07WBY4PM1"), "B07WBY4PM1")
+        self.assertIsNone(extract_asin("URLなし"))
+        self.assertIsNone(extract_asin(None))
+
+    def test_latest_entry_stores_fingerprint_and_validators(self):
+        """最新エントリにフィンガープリントと条件付きリクエスト用の情報が保存されることを確認"""
+        validators = {"https://example.com/ranking": {"etag": '"abc"'}}
+        self.add_ranking(self.sample_ranking_data, validators)
+
+        entry = load_history()[0]
+        self.assertEqual(entry["fingerprint"], compute_ranking_fingerprint(self.sample_ranking_data))
+        self.assertEqual(entry["validators"], validators)
+
+    def test_entry_fingerprint_for_legacy_entry(self):
+        """フィンガープリントのない古いエントリでも計算して比較できることを確認"""
+        entry = {"timestamp": datetime.now().isoformat(), "rankings": self.sample_ranking_data}
+        self.assertEqual(get_entry_fingerprint(entry), compute_ranking_fingerprint(self.sample_ranking_data))
+
 
 if __name__ == "__main__":
     unittest.main()
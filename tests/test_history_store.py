@@ -0,0 +1,341 @@
+"""
+ランキング履歴の保存先のテスト
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+import history_manager
+from history_store import (
+    JsonHistoryStore,
+    LogHistoryStore,
+    RetentionStats,
+    SqliteHistoryStore,
+    create_history_store,
+    import_json_history,
+)
+from tests.helpers import history_entry, ranking
+
+
+class TestSqliteHistoryStore(unittest.TestCase):
+    """SQLiteの履歴保存先のテストクラス"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "history.db")
+        self.store = SqliteHistoryStore(self.db_path)
+
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+
+    def test_roundtrip(self):
+        """保存したエントリが新しい順にそのまま読み込めることを確認"""
+        older = history_entry("2025-01-01T09:00:00", "本A", "本B")
+        newer = {
+            **history_entry("2025-01-02T09:00:00", "本B", "本A"),
+            "validators": {"https://example.com/": {"etag": "v1"}},
+        }
+        self.store.add_snapshots([older, newer])
+
+        self.assertEqual(self.store.load_history(), [newer, older])
+        self.assertEqual(self.store.load_history(limit=1), [newer])
+        self.assertEqual(self.store.get_latest_entry(), newer)
+
+    def test_get_previous_rankings(self):
+        """直前のランキングの取得規則がJSON版と同じであることを確認"""
+        self.assertIsNone(self.store.get_previous_rankings())
+
+        self.store.add_snapshots([history_entry("2025-01-01T09:00:00", "本A")])
+        self.assertEqual(self.store.get_previous_rankings()[0]["title"], "本A")
+
+        self.store.add_snapshots([history_entry("2025-01-02T09:00:00", "本B")])
+        self.assertEqual(self.store.get_previous_rankings()[0]["title"], "本A")
+
+    def test_get_entry_at(self):
+        """指定日時の時点で最新だったエントリをカテゴリごとに取得できることを確認"""
+        self.store.add_snapshots(
+            [history_entry("2025-01-01T09:00:00", "本A"), history_entry("2025-01-08T09:00:00", "本B")]
+        )
+        self.store.add_snapshots([history_entry("2025-01-05T09:00:00", "本C")], category="manga")
+
+        self.assertEqual(self.store.get_entry_at("2025-01-07")["rankings"][0]["title"], "本A")
+        self.assertEqual(self.store.get_entry_at("2025-01-08")["rankings"][0]["title"], "本B")
+        self.assertEqual(self.store.get_entry_at("2025-01-07", category="manga")["rankings"][0]["title"], "本C")
+        self.assertIsNone(self.store.get_entry_at("2024-12-31"))
+
+    def test_keeps_all_snapshots_per_category(self):
+        """件数の上限なく保存され、カテゴリごとに分かれることを確認"""
+        for day in range(1, 11):
+            self.store.add_ranking(ranking(f"本{day}"))
+        self.store.add_snapshots([history_entry("2025-01-01T09:00:00", "コミック")], category="2293143051")
+
+        self.assertEqual(len(self.store.load_history()), 10)
+        self.assertEqual(len(self.store.load_history(category="2293143051")), 1)
+
+    def test_same_timestamp_replaced(self):
+        """同じタイムスタンプのエントリは置き換えられることを確認"""
+        self.store.add_snapshots([history_entry("2025-01-01T09:00:00", "本A", "本B")])
+        self.store.add_snapshots([history_entry("2025-01-01T09:00:00", "本C")])
+
+        history = self.store.load_history()
+        self.assertEqual(len(history), 1)
+        self.assertEqual([item["title"] for item in history[0]["rankings"]], ["本C"])
+
+    def test_book_history(self):
+        """ASINごとの順位の推移と書籍情報が記録されることを確認"""
+        self.store.add_snapshots(
+            [history_entry("2025-01-01T09:00:00", "本A", "本B"), history_entry("2025-01-02T09:00:00", "本B")]
+        )
+
+        self.assertEqual(
+            self.store.get_book_history("B0TEST0001"),
+            [
+                {"timestamp": "2025-01-01T09:00:00", "category": "", "rank": 1},
+                {"timestamp": "2025-01-02T09:00:00", "category": "", "rank": 1},
+            ],
+        )
+        first_seen, last_seen = self.store._conn.execute(
+            "SELECT first_seen, last_seen FROM books WHERE asin = 'B0TEST0001'"
+        ).fetchone()
+        self.assertEqual((first_seen, last_seen), ("2025-01-01T09:00:00", "2025-01-02T09:00:00"))
+
+    def test_queries_use_indexes(self):
+        """ASIN・カテゴリごとの検索が索引を使うことを確認"""
+        plans = [
+            self.store._conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+            for query, params in (
+                ("SELECT rank FROM rankings WHERE asin = ? ORDER BY timestamp", ("B0TEST0001",)),
+                ("SELECT id FROM snapshots WHERE category = ? ORDER BY timestamp DESC LIMIT 2", ("",)),
+            )
+        ]
+        self.assertIn("idx_rankings_asin_timestamp", str(plans[0]))
+        self.assertIn("idx_snapshots_category_timestamp", str(plans[1]))
+
+    def test_import_json_history(self):
+        """既存のJSON履歴を取り込み、再実行しても重複しないことを確認"""
+        json_path = os.path.join(self.temp_dir.name, "history.json")
+        entries = [history_entry("2025-01-02T09:00:00", "本B"), history_entry("2025-01-01T09:00:00", "本A")]
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"history": entries}, f, ensure_ascii=False)
+
+        self.assertEqual(import_json_history(self.store, json_path), 2)
+        import_json_history(self.store, json_path)
+
+        self.assertEqual(self.store.load_history(), entries)
+
+
+def _books_entry(timestamp, *asins):
+    """ASINを指定した順位のエントリ（書籍Xのタイトルは「本X」）"""
+    rankings = [
+        {"rank": rank, "title": f"本{asin[-1]}", "url": f"https://www.amazon.co.jp/dp/{asin}"}
+        for rank, asin in enumerate(asins, 1)
+    ]
+    return {"timestamp": timestamp, "rankings": rankings}
+
+
+class TestSqliteRetention(unittest.TestCase):
+    """SQLiteの履歴の段階的な集約のテストクラス"""
+
+    A = "B00000000A"
+    B = "B00000000B"
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = SqliteHistoryStore(os.path.join(self.temp_dir.name, "history.db"))
+        # 2025-03-20（木）を基準に、10日より前は日ごと、30日前の週より前は週ごとに集約する
+        self.now = datetime(2025, 3, 20, 12, 0)
+        self.store.add_snapshots(
+            [
+                _books_entry("2025-03-15T09:00:00", self.A, self.B),
+                _books_entry("2025-03-05T09:00:00", self.A, self.B),
+                _books_entry("2025-03-05T21:00:00", self.B, self.A),
+                _books_entry("2025-02-11T09:00:00", self.B, self.A),
+                _books_entry("2025-02-12T09:00:00", self.A),
+                _books_entry("2025-02-16T09:00:00", self.B, self.A),
+                _books_entry("2025-02-17T09:00:00", self.A),
+            ]
+        )
+
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+
+    def _apply(self):
+        return self.store.apply_retention(self.now, full_days=10, daily_days=30)
+
+    def test_tiers(self):
+        """保存期間ごとにスナップショット・日ごと・週ごとの集約に分かれることを確認"""
+        stats = self._apply()
+
+        self.assertEqual((stats.snapshots, stats.daily_rows), (6, 5))
+        self.assertEqual([entry["timestamp"] for entry in self.store.load_history()], ["2025-03-15T09:00:00"])
+
+        daily = {(row["period_start"], row["asin"]): row for row in self.store.get_rollups("daily")}
+        self.assertEqual(sorted(daily), [("2025-02-17", self.A), ("2025-03-05", self.A), ("2025-03-05", self.B)])
+        # 1日の中で最高・最低順位と、その日の最後の順位を残す
+        day_a = daily[("2025-03-05", self.A)]
+        self.assertEqual((day_a["best_rank"], day_a["worst_rank"], day_a["closing_rank"]), (1, 2, 2))
+        self.assertEqual((day_a["title"], day_a["samples"]), ("本A", 2))
+
+        weekly = self.store.get_rollups("weekly", asin=self.A)
+        self.assertEqual(len(weekly), 1)
+        self.assertEqual(weekly[0]["period_start"], "2025-02-10")
+        self.assertEqual((weekly[0]["best_rank"], weekly[0]["worst_rank"], weekly[0]["closing_rank"]), (1, 2, 2))
+        self.assertEqual(weekly[0]["samples"], 3)
+        self.assertEqual(self.store.get_rollups("weekly", asin=self.B)[0]["closing_rank"], 1)
+
+    def test_incremental(self):
+        """2回目以降は新しく保存期間を過ぎた分だけを集約し、既存の集約に合わせることを確認"""
+        self._apply()
+        self.assertEqual(self._apply(), RetentionStats())
+
+        # 集約済みの日に遅れて届いたスナップショットは既存の集約に合わせる
+        self.store.add_snapshots([_books_entry("2025-03-05T23:00:00", self.A)])
+        stats = self._apply()
+
+        self.assertEqual(stats.snapshots, 1)
+        day_a = next(row for row in self.store.get_rollups("daily", asin=self.A) if row["period_start"] == "2025-03-05")
+        self.assertEqual((day_a["best_rank"], day_a["worst_rank"], day_a["closing_rank"]), (1, 2, 1))
+        self.assertEqual(day_a["samples"], 3)
+
+    def test_disabled(self):
+        """保存期間が0の場合は集約しないことを確認"""
+        stats = self.store.apply_retention(self.now, full_days=0, daily_days=0)
+
+        self.assertEqual(stats.snapshots, 0)
+        self.assertEqual(len(self.store.load_history()), 7)
+
+
+class TestJsonHistoryStore(unittest.TestCase):
+    """JSONの履歴保存先のテストクラス"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "history.json")
+        self.patcher = patch("history_manager.HISTORY_FILE", self.path)
+        self.patcher.start()
+        history_manager.save_history([history_entry("2025-01-01T09:00:00", "本A")])
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.temp_dir.cleanup()
+
+    def test_loads_once_and_flushes_once(self):
+        """1回の実行でファイルの読み込みと書き込みがそれぞれ1回だけであることを確認"""
+        store = JsonHistoryStore()
+        with (
+            patch("history_manager.load_history", wraps=history_manager.load_history) as mock_load,
+            patch("history_manager.save_history", wraps=history_manager.save_history) as mock_save,
+        ):
+            latest = store.get_latest_entry()
+            store.add_ranking(ranking("本B"))
+            previous = store.get_previous_rankings()
+            mock_save.assert_not_called()
+            store.close()
+
+        self.assertEqual(mock_load.call_count, 1)
+        self.assertEqual(mock_save.call_count, 1)
+        self.assertEqual(latest["rankings"][0]["title"], "本A")
+        self.assertEqual(previous[0]["title"], "本A")
+        self.assertEqual([entry["rankings"][0]["title"] for entry in history_manager.load_history()], ["本B", "本A"])
+
+    def test_no_write_without_changes(self):
+        """変更がなければ書き込まないことを確認"""
+        store = JsonHistoryStore()
+        store.get_latest_entry()
+        with patch("history_manager.save_history") as mock_save:
+            store.close()
+        mock_save.assert_not_called()
+
+    def test_max_history_count(self):
+        """メモリ上でも最大保存数を超えた分が削除されることを確認"""
+        store = JsonHistoryStore()
+        for i in range(history_manager.MAX_HISTORY_COUNT + 2):
+            store.add_ranking(ranking(f"本{i}"))
+        store.close()
+
+        self.assertEqual(len(history_manager.load_history()), history_manager.MAX_HISTORY_COUNT)
+
+    def test_category_files(self):
+        """カテゴリの履歴はカテゴリキーを付けた別ファイルに保存し、メインの履歴と混ざらないことを確認"""
+        store = JsonHistoryStore()
+        store.add_ranking(ranking("本B"), category="2293143051")
+        store.close()
+
+        category_path = os.path.join(self.temp_dir.name, "history.2293143051.json")
+        self.assertEqual(store.category_path("2293143051"), category_path)
+        self.assertEqual(history_manager.load_history(category_path)[0]["rankings"][0]["title"], "本B")
+        self.assertEqual([entry["rankings"][0]["title"] for entry in history_manager.load_history()], ["本A"])
+        self.assertEqual(JsonHistoryStore().get_previous_rankings("2293143051")[0]["title"], "本B")
+
+    def test_save_is_atomic(self):
+        """書き込みに失敗しても既存の履歴ファイルが壊れず、一時ファイルも残らないことを確認"""
+        with patch("history_manager.os.fsync", side_effect=OSError("ディスクがいっぱいです")):
+            with self.assertRaises(OSError):
+                history_manager.save_history([history_entry("2025-01-02T09:00:00", "本B")])
+
+        self.assertEqual(history_manager.load_history()[0]["rankings"][0]["title"], "本A")
+        self.assertEqual(os.listdir(self.temp_dir.name), ["history.json"])
+
+
+class TestCreateHistoryStore(unittest.TestCase):
+    """履歴保存先の選択のテストクラス"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    @patch("history_store.config")
+    def test_sqlite_backend(self, mock_config):
+        """設定に応じてSQLiteの保存先が作成されることを確認"""
+        mock_config.history_backend = "sqlite"
+        store = create_history_store(os.path.join(self.temp_dir.name, "history.db"))
+        try:
+            self.assertIsInstance(store, SqliteHistoryStore)
+        finally:
+            store.close()
+
+    @patch("history_store.config")
+    def test_log_backend(self, mock_config):
+        """追記専用ログの保存先で追加と直前のランキングの取得ができることを確認"""
+        mock_config.history_backend = "log"
+        mock_config.history_log_compact_bytes = 0
+        store = create_history_store(os.path.join(self.temp_dir.name, "log"))
+        self.assertIsInstance(store, LogHistoryStore)
+
+        store.add_snapshots([history_entry("2025-01-01T09:00:00", "本A")])
+        store.add_ranking(ranking("本B"))
+        store.close()
+
+        self.assertEqual(store.get_latest_entry()["rankings"][0]["title"], "本B")
+        self.assertEqual(store.get_previous_rankings()[0]["title"], "本A")
+        self.assertEqual(store.get_entry_at("2025-01-01")["rankings"][0]["title"], "本A")
+
+    @patch("history_store.config")
+    def test_json_backend(self, mock_config):
+        """JSONの保存先は指定したファイルに読み書きし、モジュールの既定のパスは変更しないことを確認"""
+        mock_config.history_backend = "json"
+        path = os.path.join(self.temp_dir.name, "history.json")
+        default_path = history_manager.HISTORY_FILE
+        store = create_history_store(path)
+        self.assertIsInstance(store, JsonHistoryStore)
+
+        store.add_ranking(ranking("本A"))
+        store.close()
+        self.assertEqual(history_manager.HISTORY_FILE, default_path)
+        self.assertEqual(history_manager.load_history(path)[0]["rankings"][0]["title"], "本A")
+
+
+if __name__ == "__main__":
+    unittest.main()
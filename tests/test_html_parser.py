@@ -0,0 +1,107 @@
+"""
+HTMLパーサーのバックエンドのテスト
+保存済みのランキングページを各バックエンドで解析し、ゴールデンファイルと一致することを確認する
+"""
+
+import dataclasses
+import importlib.util
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+from bs4 import BeautifulSoup
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from scraper import ScraperError, _iter_books_from_chunks, _make_soup, _parse_books_from_soup, select_parser_backend
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+LXML_AVAILABLE = importlib.util.find_spec("lxml") is not None
+
+
+def _load_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def _load_golden(name: str) -> list[dict]:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class TestParserBackend(unittest.TestCase):
+    """HTMLパーサーのバックエンドのテストクラス"""
+
+    def setUp(self):
+        self.content = _load_fixture("ranking_page.html")
+        self.golden = _load_golden("ranking_page_golden.json")
+
+    def _parse(self, soup):
+        return [dataclasses.asdict(book) for book in _parse_books_from_soup(soup, 50)]
+
+    def test_full_tree_matches_golden(self):
+        """従来どおりページ全体を展開した場合の結果がゴールデンファイルと一致することを確認"""
+        self.assertEqual(self._parse(BeautifulSoup(self.content, "html.parser")), self.golden)
+
+    def test_html_parser_backend_matches_golden(self):
+        """html.parserでグリッドのセルだけを展開した結果がゴールデンファイルと一致することを確認"""
+        self.assertEqual(self._parse(_make_soup(self.content, "html.parser")), self.golden)
+
+    @unittest.skipUnless(LXML_AVAILABLE, "lxmlがインストールされていません")
+    def test_lxml_backend_matches_golden(self):
+        """lxmlでグリッドのセルだけを展開した結果がゴールデンファイルと一致することを確認"""
+        self.assertEqual(self._parse(_make_soup(self.content, "lxml")), self.golden)
+
+    def test_only_grid_cells_are_materialized(self):
+        """グリッドのセル以外の要素がツリーに含まれないことを確認"""
+        soup = _make_soup(self.content, "html.parser")
+        self.assertIsNone(soup.find("div", id="navbar"))
+        self.assertIsNone(soup.find("script"))
+        self.assertEqual(len(soup.find_all("div", class_="_cDEzb_grid-cell_1uMOS")), 6)
+
+    def test_streaming_matches_golden(self):
+        """チャンクごとに逐次解析した結果がゴールデンファイルと一致することを確認（マルチバイト文字の途中で分割）"""
+        for chunk_size in (7, 100, len(self.content)):
+            chunks = (self.content[i : i + chunk_size] for i in range(0, len(self.content), chunk_size))
+            books = [dataclasses.asdict(book) for book in _iter_books_from_chunks(chunks, 50)]
+            self.assertEqual(books, self.golden, f"chunk_size={chunk_size}")
+
+    def test_streaming_stops_after_limit(self):
+        """limit件分のセルを解析した時点で残りのチャンクを読まないことを確認"""
+        chunk_size = 100
+        consumed = []
+
+        def chunks():
+            for i in range(0, len(self.content), chunk_size):
+                consumed.append(i)
+                yield self.content[i : i + chunk_size]
+
+        books = list(_iter_books_from_chunks(chunks(), 2))
+
+        self.assertEqual([dataclasses.asdict(book) for book in books], self.golden[:2])
+        self.assertLess(len(consumed), len(self.content) // chunk_size)
+
+    def test_streaming_without_items(self):
+        """商品グリッドのセルがない場合はエラーになることを確認"""
+        with self.assertRaises(ScraperError):
+            list(_iter_books_from_chunks(iter([b"<html><body>empty</body></html>"]), 10))
+
+    @patch("scraper.config")
+    def test_select_backend(self, mock_config):
+        """設定とlxmlの有無に応じてバックエンドが選ばれることを確認"""
+        mock_config.html_parser_backend = "html.parser"
+        self.assertEqual(select_parser_backend(), "html.parser")
+
+        for backend in ("auto", "lxml"):
+            mock_config.html_parser_backend = backend
+            with patch("scraper._LXML_AVAILABLE", True):
+                self.assertEqual(select_parser_backend(), "lxml")
+            with patch("scraper._LXML_AVAILABLE", False):
+                self.assertEqual(select_parser_backend(), "html.parser")
+
+
+if __name__ == "__main__":
+    unittest.main()
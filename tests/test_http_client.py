@@ -0,0 +1,168 @@
+"""
+共通HTTPクライアントのテスト
+"""
+
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+import http_client
+from http_client import RetryPolicy
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    """Keep-Aliveで応答するテスト用のハンドラー"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _make_response(status_code, headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    if headers is not None:
+        response.headers = headers
+    return response
+
+
+class TestHttpClient(unittest.TestCase):
+    """共通HTTPクライアントのテストクラス"""
+
+    def setUp(self):
+        self.patchers = [
+            patch("http_client._session", None),
+            patch("http_client._host_stats", {}),
+            patch("http_client.time.sleep"),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        http_client.reset_retry_budget(10)
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    @patch("requests.Session.request")
+    def test_retry_on_status(self, mock_request):
+        """リトライ対象のステータスの後に成功した場合、成功レスポンスを返すことを確認"""
+        mock_request.side_effect = [_make_response(503), _make_response(429), _make_response(200)]
+
+        response = http_client.get("https://example.com/", retry_policy=RetryPolicy(max_retries=3))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_request.call_count, 3)
+        metrics = http_client.get_http_metrics()["example.com"]
+        self.assertEqual(metrics["requests"], 3)
+        self.assertEqual(metrics["retries"], 2)
+
+    @patch("requests.Session.request")
+    def test_no_retry_on_client_error(self, mock_request):
+        """リトライ対象外のステータスはそのまま返すことを確認"""
+        mock_request.return_value = _make_response(404)
+
+        response = http_client.get("https://example.com/", retry_policy=RetryPolicy(max_retries=3))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(mock_request.call_count, 1)
+
+    @patch("requests.Session.request")
+    def test_connection_error_raised_after_retries(self, mock_request):
+        """接続エラーでリトライし尽くした場合は例外を送出することを確認"""
+        mock_request.side_effect = requests.exceptions.ConnectionError("接続失敗")
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            http_client.get("https://example.com/", retry_policy=RetryPolicy(max_retries=2))
+        self.assertEqual(mock_request.call_count, 2)
+
+    @patch("requests.Session.request")
+    def test_retry_budget(self, mock_request):
+        """リトライ予算を使い切るとそれ以上リトライしないことを確認"""
+        http_client.reset_retry_budget(1)
+        mock_request.side_effect = requests.exceptions.ConnectionError("接続失敗")
+
+        with self.assertRaises(requests.exceptions.RequestException):
+            http_client.get("https://example.com/", retry_policy=RetryPolicy(max_retries=5))
+        self.assertEqual(mock_request.call_count, 2)
+
+    @patch("requests.Session.request")
+    def test_post_not_retried_after_sending(self, mock_request):
+        """POSTはサーバーに届いた可能性のある失敗（5xx・読み込みタイムアウト）をリトライしないことを確認"""
+        mock_request.side_effect = [_make_response(500), _make_response(200)]
+        self.assertEqual(http_client.post("https://example.com/").status_code, 500)
+
+        mock_request.side_effect = requests.exceptions.ReadTimeout("応答なし")
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            http_client.post("https://example.com/")
+        self.assertEqual(mock_request.call_count, 2)
+
+    @patch("requests.Session.request")
+    def test_post_retried_on_connect_error(self, mock_request):
+        """POSTでも接続の確立に失敗した場合はリトライすることを確認"""
+        refused = NewConnectionError(None, "接続が拒否されました")
+        mock_request.side_effect = [
+            requests.exceptions.ConnectionError(MaxRetryError(None, "/", refused)),
+            _make_response(204),
+        ]
+
+        self.assertEqual(http_client.post("https://example.com/").status_code, 204)
+        self.assertEqual(mock_request.call_count, 2)
+
+    @patch("requests.Session.request")
+    def test_retry_after(self, mock_request):
+        """429のRetry-Afterの秒数だけ待ち、上限を超える場合はリトライしないことを確認"""
+        mock_request.side_effect = [_make_response(429, {"Retry-After": "7"}), _make_response(204)]
+
+        self.assertEqual(http_client.post("https://example.com/").status_code, 204)
+        http_client.time.sleep.assert_called_once_with(7.0)
+
+        mock_request.side_effect = [_make_response(429, {"Retry-After": "120"}), _make_response(204)]
+        policy = RetryPolicy(max_retries=3, backoff_max=30.0)
+        self.assertEqual(http_client.post("https://example.com/", retry_policy=policy).status_code, 429)
+        self.assertEqual(mock_request.call_count, 3)
+
+    def test_backoff_is_bounded(self):
+        """バックオフの待機秒数が上限を超えないことを確認"""
+        policy = RetryPolicy(backoff_base=1.0, backoff_max=5.0)
+        for attempt in range(10):
+            self.assertLessEqual(policy.backoff(attempt), 5.0)
+            self.assertGreaterEqual(policy.backoff(attempt), 0.0)
+
+    def test_connection_reuse(self):
+        """同じホストへのリクエストで接続が再利用され、統計に表れることを確認"""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/"
+            for _ in range(3):
+                self.assertEqual(http_client.get(url, timeout=5).status_code, 200)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        metrics = http_client.get_http_metrics()[f"127.0.0.1:{server.server_address[1]}"]
+        self.assertEqual(metrics["requests"], 3)
+        self.assertEqual(metrics["connections"], 1)
+        self.assertEqual(metrics["reused"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,204 @@
+"""
+メイン処理のテスト
+スクレイピング・要約・Discord送信を差し替え、前回と同じランキングの扱いと履歴の保存を確認する
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+import main
+from history_store import JsonHistoryStore
+from scraper import RankingNotModifiedError, format_ranking_text
+from summarizer import format_summary_only_message, format_unchanged_message
+
+RANKINGS = [
+    {"rank": 1, "title": "本A", "url": "https://www.amazon.co.jp/dp/B00000000A"},
+    {"rank": 2, "title": "本B", "url": "https://www.amazon.co.jp/dp/B00000000B"},
+]
+VALIDATORS = {"etag": '"v1"'}
+
+
+class _MainTestCase(unittest.TestCase):
+    """設定と外部との通信を差し替えるテストの基底クラス"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.history_file = os.path.join(self.temp_dir.name, "ranking_history.json")
+
+        settings = {
+            "discord_webhook_url": "https://discord.example/webhook",
+            "enable_gemini_summary": True,
+            "gemini_api_key": "test-key",
+            "enable_detail_enrichment": False,
+            "kindle_ranking_limit": len(RANKINGS),
+            "kindle_category_urls": [],
+            "history_backend": "json",
+            "unchanged_ranking_policy": "skip",
+            "diff_window_days": [],
+            "trajectory_history_limit": 0,
+        }
+        for name, value in settings.items():
+            patcher = patch.object(main.config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.mocks = {}
+        for name in (
+            "get_amazon_kindle_ranking_with_data",
+            "get_response_validators",
+            "get_amazon_kindle_rankings_with_data_by_category",
+            "generate_first_ranking_summary",
+            "generate_ranking_changes_summary",
+            "generate_category_summaries",
+            "send_main_message",
+            "send_thread_message",
+        ):
+            patcher = patch(f"main.{name}")
+            self.mocks[name] = patcher.start()
+            self.addCleanup(patcher.stop)
+        self.mocks["get_amazon_kindle_ranking_with_data"].return_value = (format_ranking_text(RANKINGS), RANKINGS)
+        self.mocks["get_response_validators"].return_value = VALIDATORS
+        self.mocks["generate_first_ranking_summary"].return_value = "📚 初回の要約"
+        self.mocks["generate_ranking_changes_summary"].return_value = "📚 変化の要約"
+        self.mocks["generate_category_summaries"].side_effect = lambda requests: {
+            category: f"📚 {category}の要約" for category in requests
+        }
+
+    def _run(self):
+        main.main(["--history-file", self.history_file])
+
+    def _history(self):
+        return JsonHistoryStore(self.history_file).load_history()
+
+    def _reset_mocks(self):
+        for mock in self.mocks.values():
+            mock.reset_mock()
+
+
+class TestUnchangedRanking(_MainTestCase):
+    """前回と同じランキングの扱い（UNCHANGED_RANKING_POLICY）のテストクラス"""
+
+    def setUp(self):
+        super().setUp()
+        # 1回目の実行で履歴を作る
+        self._run()
+        self.mocks["generate_first_ranking_summary"].assert_called_once()
+        self._reset_mocks()
+
+    def test_skip_policy(self):
+        """skipでは要約もDiscordへの送信も行わず、履歴は保存することを確認"""
+        self._run()
+
+        self.mocks["generate_ranking_changes_summary"].assert_not_called()
+        self.mocks["generate_first_ranking_summary"].assert_not_called()
+        self.mocks["send_main_message"].assert_not_called()
+        self.mocks["send_thread_message"].assert_not_called()
+        self.assertEqual(len(self._history()), 2)
+
+    def test_notify_policy(self):
+        """notifyでは要約を生成せずに変動がない旨とランキングを送信し、履歴は保存することを確認"""
+        main.config.unchanged_ranking_policy = "notify"
+
+        self._run()
+
+        self.mocks["generate_ranking_changes_summary"].assert_not_called()
+        self.mocks["send_main_message"].assert_called_once_with(format_unchanged_message())
+        self.mocks["send_thread_message"].assert_called_once_with(format_ranking_text(RANKINGS))
+        self.assertEqual(len(self._history()), 2)
+
+    def test_full_policy(self):
+        """fullでは変動がなくても変化の要約を生成して送信することを確認"""
+        main.config.unchanged_ranking_policy = "full"
+
+        self._run()
+
+        self.mocks["generate_ranking_changes_summary"].assert_called_once()
+        self.assertIn("📚 変化の要約", self.mocks["send_main_message"].call_args.args[0])
+        self.assertEqual(len(self._history()), 2)
+
+    def test_not_modified_reuses_previous_ranking(self):
+        """304の場合は前回のランキングと検証子を再利用し、変動なしとして扱うことを確認"""
+        self.mocks["get_amazon_kindle_ranking_with_data"].side_effect = RankingNotModifiedError("304")
+
+        self._run()
+
+        self.mocks["get_amazon_kindle_ranking_with_data"].assert_called_once_with(
+            limit=len(RANKINGS), validators=VALIDATORS
+        )
+        self.mocks["generate_ranking_changes_summary"].assert_not_called()
+        self.mocks["send_main_message"].assert_not_called()
+        history = self._history()
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history[0]["rankings"], RANKINGS)
+        self.assertEqual(history[0]["validators"], VALIDATORS)
+
+    def test_changed_ranking_is_summarized(self):
+        """ランキングが変わった場合は変化の要約を生成して送信することを確認"""
+        changed = [{**RANKINGS[1], "rank": 1}, {**RANKINGS[0], "rank": 2}]
+        self.mocks["get_amazon_kindle_ranking_with_data"].return_value = (format_ranking_text(changed), changed)
+
+        self._run()
+
+        self.mocks["generate_ranking_changes_summary"].assert_called_once()
+        self.mocks["send_main_message"].assert_called_once()
+        self.assertEqual(self._history()[0]["rankings"], changed)
+
+
+class TestCategoryRankings(_MainTestCase):
+    """KINDLE_CATEGORY_URLSのカテゴリ別ランキングのテストクラス"""
+
+    def setUp(self):
+        super().setUp()
+        main.config.kindle_category_urls = ["https://www.amazon.co.jp/gp/bestsellers/digital-text/111"]
+        self.categories = {"111": (format_ranking_text(RANKINGS), RANKINGS)}
+        self.mocks["get_amazon_kindle_rankings_with_data_by_category"].side_effect = lambda *args, **kwargs: dict(
+            self.categories
+        )
+
+    def test_unchanged_category_skipped(self):
+        """変動のないカテゴリは要約せず、変動したカテゴリだけを要約してカテゴリごとに送信・保存することを確認"""
+        changed = [{**RANKINGS[1], "rank": 1}, {**RANKINGS[0], "rank": 2}]
+        self.categories["222"] = (format_ranking_text(RANKINGS), RANKINGS)
+        self._run()
+        self._reset_mocks()
+
+        self.categories["222"] = (format_ranking_text(changed), changed)
+        self._run()
+
+        requests = self.mocks["generate_category_summaries"].call_args.args[0]
+        self.assertEqual(list(requests), ["222"])
+        self.assertIsNotNone(requests["222"].changes_analysis)
+        # メインのランキングとカテゴリ111は変動がないため、カテゴリ222のメッセージだけを送信する
+        self.mocks["send_main_message"].assert_called_once_with(format_summary_only_message("📚 222の要約", "222"))
+        self.mocks["send_thread_message"].assert_called_once_with(format_ranking_text(changed))
+
+        store = JsonHistoryStore(self.history_file)
+        self.assertTrue(os.path.exists(store.category_path("111")))
+        self.assertEqual(len(store.load_history(category="111")), 2)
+        self.assertEqual([entry["rankings"] for entry in store.load_history(category="222")], [changed, RANKINGS])
+        self.assertEqual(len(store.load_history()), 2)
+
+    def test_first_run_summarizes_each_category(self):
+        """初回はカテゴリごとに初回の要約を依頼し、カテゴリごとに1通ずつ送信することを確認"""
+        self.categories["222"] = (format_ranking_text(RANKINGS), RANKINGS)
+
+        self._run()
+
+        requests = self.mocks["generate_category_summaries"].call_args.args[0]
+        self.assertEqual(list(requests), ["111", "222"])
+        self.assertTrue(all(request.changes_analysis is None for request in requests.values()))
+        messages = [call.args[0] for call in self.mocks["send_main_message"].call_args_list]
+        self.assertIn(format_summary_only_message("📚 111の要約", "111"), messages)
+        self.assertIn(format_summary_only_message("📚 222の要約", "222"), messages)
+        self.assertEqual(len(messages), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
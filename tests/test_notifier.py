@@ -17,7 +17,7 @@ from notifier import send_discord_message
 class TestNotifier(unittest.TestCase):
     """Discord WebHook通知機能のテストクラス"""
 
-    @patch("notifier.requests.post")
+    @patch("notifier.http_client.post")
     @patch("notifier.config")
     def test_send_discord_message_success_204(self, mock_config, mock_post):
         """Discord WebHookメッセージ送信成功のテスト（ステータスコード204）"""
@@ -41,7 +41,7 @@ class TestNotifier(unittest.TestCase):
             timeout=10,
         )
 
-    @patch("notifier.requests.post")
+    @patch("notifier.http_client.post")
     @patch("notifier.config")
     def test_send_discord_message_success_200(self, mock_config, mock_post):
         """Discord WebHookメッセージ送信成功のテスト（ステータスコード200）"""
@@ -65,7 +65,7 @@ class TestNotifier(unittest.TestCase):
             timeout=10,
         )
 
-    @patch("notifier.requests.post")
+    @patch("notifier.http_client.post")
     @patch("notifier.config")
     def test_send_discord_message_api_error(self, mock_config, mock_post):
         """Discord WebHook APIエラーのテスト"""
@@ -86,7 +86,7 @@ class TestNotifier(unittest.TestCase):
         self.assertIn("ステータスコード=400", str(context.exception))
         self.assertIn("Bad Request", str(context.exception))
 
-    @patch("notifier.requests.post")
+    @patch("notifier.http_client.post")
     @patch("notifier.config")
     def test_send_discord_message_connection_error(self, mock_config, mock_post):
         """Discord WebHook接続エラーのテスト"""
@@ -105,7 +105,7 @@ class TestNotifier(unittest.TestCase):
         self.assertIn("Discord WebHook APIへの接続エラー", str(context.exception))
         self.assertIn("接続失敗", str(context.exception))
 
-    @patch("notifier.requests.post")
+    @patch("notifier.http_client.post")
     @patch("notifier.config")
     def test_send_discord_message_timeout(self, mock_config, mock_post):
         """Discord WebHookタイムアウトのテスト"""
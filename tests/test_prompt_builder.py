@@ -0,0 +1,74 @@
+"""
+プロンプト作成機能のテスト
+"""
+
+import os
+import sys
+import unittest
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from history_manager import analyze_ranking_changes
+from prompt_builder import build_ranking_prompt, estimate_tokens, format_ranking_row, prioritize_rankings
+from tests.helpers import book
+
+TEMPLATE = "変化:\n{changes_text}\n\nランキング:\n{current_ranking}\n"
+
+
+class TestPromptBuilder(unittest.TestCase):
+    """プロンプト作成機能のテストクラス"""
+
+    def setUp(self):
+        self.previous = [book(rank, asin) for rank, asin in enumerate("ABCDEFGH", start=1)]
+        # Hが8位→2位に上昇し、Xが新規に7位でランクイン（Gはランク外）
+        self.current = [book(rank, asin) for rank, asin in enumerate("AHBCDEXF", start=1)]
+        self.changes = analyze_ranking_changes(self.current, self.previous)
+
+    def test_estimate_tokens(self):
+        """日本語は1文字1トークン、英数字は4文字1トークンとして数えることを確認"""
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("ランキング"), 5)
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+        self.assertEqual(estimate_tokens("1位 本"), 3)
+
+    def test_format_ranking_row(self):
+        """URLを省き、評価・価格・著者・最も細かいカテゴリを1行にまとめることを確認"""
+        row = format_ranking_row(
+            book(1, "A", rating=4.5, review_count=1234, price="¥500", author="著者", categories=["本", "漫画"])
+        )
+
+        self.assertEqual(row, "1位 本A / 著者 / ⭐️4.5(1,234件) / ¥500 / 漫画")
+        self.assertNotIn("https://", row)
+        self.assertEqual(format_ranking_row(book(2, "B", price="価格不明")), "2位 本B")
+
+    def test_prioritize_rankings(self):
+        """新規ランクイン・大きな順位変動・上位N位・残りの順に並べることを確認"""
+        ordered = prioritize_rankings(self.current, self.changes, top_n=2)
+
+        self.assertEqual([item["title"] for item in ordered], ["本X", "本H", "本A", "本B", "本C", "本D", "本E", "本F"])
+        self.assertEqual(prioritize_rankings(self.current[::-1]), self.current)
+
+    def test_build_within_budget(self):
+        """予算内に優先度の高い行だけを含め、順位順に並べることを確認"""
+        ordered = prioritize_rankings(self.current, self.changes, top_n=1)
+        base = estimate_tokens(TEMPLATE.format(changes_text="変化", current_ranking=""))
+        row_tokens = estimate_tokens("1位 本A\n")
+
+        prompt = build_ranking_prompt(TEMPLATE, "current_ranking", ordered, base + row_tokens * 3, changes_text="変化")
+
+        self.assertEqual((prompt.rows, prompt.total_rows), (3, 8))
+        self.assertIn("1位 本A\n2位 本H\n7位 本X", prompt.text)
+        self.assertLessEqual(prompt.tokens, base + row_tokens * 3)
+        self.assertEqual(prompt.tokens, estimate_tokens(prompt.text))
+
+    def test_build_without_budget(self):
+        """予算が0の場合は全件を含めることを確認"""
+        prompt = build_ranking_prompt(TEMPLATE, "current_ranking", self.current, 0, changes_text="変化")
+
+        self.assertEqual(prompt.rows, 8)
+        self.assertNotIn("https://", prompt.text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+順位の推移の分析のテスト
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from rank_analytics import NOT_RANKED, analyze_trajectories, build_rank_matrix, compute_trajectories
+from tests.helpers import book, snapshot
+
+
+class TestRankAnalytics(unittest.TestCase):
+    """順位の推移の分析のテストクラス"""
+
+    def setUp(self):
+        # 新しい順（履歴の保存順）に並べる
+        self.history = [
+            snapshot("2025-01-04T09:00:00", book(1, "B")),
+            snapshot("2025-01-02T09:00:00", book(1, "A", "新タイトル"), book(2, "C"), book(5, "C")),
+            snapshot("2025-01-01T21:00:00", book(2, "A")),
+            snapshot("2025-01-01T09:00:00", book(3, "A"), book(1, "B")),
+        ]
+
+    def test_build_rank_matrix(self):
+        """スナップショットを古い順に並べ、ランク外を番兵の値で埋めることを確認"""
+        matrix = build_rank_matrix(self.history)
+
+        self.assertEqual(matrix.keys, ["B00000000A", "B00000000B", "B00000000C"])
+        self.assertEqual(matrix.timestamps[0], "2025-01-01T09:00:00")
+        self.assertEqual(matrix.titles[0], "新タイトル")
+        np.testing.assert_array_equal(
+            matrix.ranks,
+            [[3, 2, 1, NOT_RANKED], [1, NOT_RANKED, NOT_RANKED, 1], [NOT_RANKED, NOT_RANKED, 2, NOT_RANKED]],
+        )
+
+    def test_compute_trajectories(self):
+        """書籍ごとの指標を計算できることを確認"""
+        a, b, c = compute_trajectories(build_rank_matrix(self.history))
+
+        # 同じ日の2回のスナップショットは1日と数える
+        self.assertEqual(a.days_in_chart, 2)
+        self.assertEqual(a.best_rank, 1)
+        self.assertAlmostEqual(a.average_rank, 2.0)
+        # 0日目3位 → 0.5日目2位 → 1日目1位なので1日あたり2位上昇
+        self.assertAlmostEqual(a.velocity, 2.0)
+        self.assertEqual(a.longest_streak, 2)
+        self.assertAlmostEqual(a.days_to_peak, 1.0)
+
+        # スナップショットのない日（1月3日）は連続の判定に含めない
+        self.assertEqual(b.days_in_chart, 2)
+        self.assertEqual(b.longest_streak, 1)
+        self.assertEqual(b.velocity, 0.0)
+        self.assertEqual(b.days_to_peak, 0.0)
+
+        # 重複した書籍は上位の順位を使う
+        self.assertEqual(c.best_rank, 2)
+        self.assertEqual(c.days_in_chart, 1)
+
+    def test_analyze_trajectories(self):
+        """今回のランキングの順に、今回を含めた推移を返すことを確認"""
+        trajectories = analyze_trajectories(self.history, [book(1, "C"), book(2, "D")])
+
+        self.assertEqual([trajectory.key for trajectory in trajectories], ["B00000000C", "B00000000D"])
+        self.assertEqual(trajectories[0].days_in_chart, 2)
+        self.assertEqual(trajectories[0].best_rank, 1)
+        self.assertEqual(trajectories[1].days_in_chart, 1)
+
+    def test_empty_history(self):
+        """履歴がなくても今回のランキングだけで計算できることを確認"""
+        self.assertEqual(compute_trajectories(build_rank_matrix([])), [])
+        trajectories = analyze_trajectories([], [book(1, "A")])
+        self.assertEqual(trajectories[0].longest_streak, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+レート制限のテスト
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+import rate_limiter
+from config import _parse_rate_limits
+from rate_limiter import TokenBucket
+
+
+class TestTokenBucket(unittest.TestCase):
+    """トークンバケットのテストクラス"""
+
+    def setUp(self):
+        self.now = 100.0
+        self.patcher = patch("rate_limiter.time.monotonic", side_effect=lambda: self.now)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_burst_then_wait(self):
+        """容量分は待機せずに取得でき、それ以降はレートに応じて待機することを確認"""
+        bucket = TokenBucket(rate=2.0, capacity=3)
+
+        with patch("rate_limiter.time.sleep") as mock_sleep:
+            waits = [bucket.acquire() for _ in range(5)]
+
+        self.assertEqual(waits[:3], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(waits[3], 0.5)
+        self.assertAlmostEqual(waits[4], 1.0)
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertEqual(bucket.stats.acquisitions, 5)
+        self.assertEqual(bucket.stats.waits, 2)
+        self.assertAlmostEqual(bucket.stats.max_wait, 1.0)
+        self.assertAlmostEqual(bucket.stats.average_wait, 0.3)
+
+    def test_refill(self):
+        """時間の経過でトークンが補充され、容量を超えないことを確認"""
+        bucket = TokenBucket(rate=1.0, capacity=2)
+        bucket.acquire()
+        bucket.acquire()
+
+        self.now += 10.0
+        with patch("rate_limiter.time.sleep") as mock_sleep:
+            self.assertEqual(bucket.acquire(), 0.0)
+            self.assertEqual(bucket.acquire(), 0.0)
+            self.assertAlmostEqual(bucket.acquire(), 1.0)
+        mock_sleep.assert_called_once()
+
+    def test_acquire_async(self):
+        """非同期の取得でもイベントループ上で待機することを確認"""
+        bucket = TokenBucket(rate=4.0, capacity=1)
+
+        async def run():
+            with patch("rate_limiter.asyncio.sleep") as mock_sleep:
+                waits = [await bucket.acquire_async() for _ in range(3)]
+            return waits, mock_sleep
+
+        waits, mock_sleep = asyncio.run(run())
+
+        self.assertEqual(waits[0], 0.0)
+        self.assertAlmostEqual(waits[1], 0.25)
+        self.assertAlmostEqual(waits[2], 0.5)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    def test_invalid_arguments(self):
+        """不正なレートや容量はエラーになることを確認"""
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0, capacity=1)
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=1.0, capacity=0)
+
+
+class TestRateLimiterRegistry(unittest.TestCase):
+    """ホストごとのレート制限のテストクラス"""
+
+    @patch("rate_limiter._buckets", {})
+    @patch("rate_limiter.config")
+    def test_get_rate_limiter(self, mock_config):
+        """設定されたホストには共有のバケットを返し、それ以外はNoneを返すことを確認"""
+        mock_config.rate_limits = {"www.amazon.co.jp": (2.0, 5.0)}
+
+        limiter = rate_limiter.get_rate_limiter("www.amazon.co.jp")
+
+        self.assertIsNotNone(limiter)
+        self.assertIs(limiter, rate_limiter.get_rate_limiter("www.amazon.co.jp"))
+        self.assertEqual((limiter.rate, limiter.capacity), (2.0, 5.0))
+        self.assertIsNone(rate_limiter.get_rate_limiter("discord.com"))
+        self.assertEqual(list(rate_limiter.get_rate_limit_stats()), ["www.amazon.co.jp"])
+
+    def test_parse_rate_limits(self):
+        """環境変数の形式を解析できることを確認"""
+        self.assertEqual(
+            _parse_rate_limits("www.amazon.co.jp=2:5, example.com=0.5"),
+            {"www.amazon.co.jp": (2.0, 5.0), "example.com": (0.5, 1.0)},
+        )
+        self.assertEqual(_parse_rate_limits(""), {})
+        with self.assertRaises(ValueError):
+            _parse_rate_limits("www.amazon.co.jp=fast")
+
+
+if __name__ == "__main__":
+    unittest.main()
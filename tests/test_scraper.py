@@ -6,6 +6,8 @@
 
 import sys
 import os
+import re
+import threading
 import time
 import unittest
 from unittest.mock import patch, MagicMock
@@ -13,12 +15,65 @@ from unittest.mock import patch, MagicMock
 # srcディレクトリをパスに追加
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
 
-from scraper import get_amazon_kindle_ranking
+import http_client
+from scraper import (
+    BlockedPageError,
+    CircuitOpenError,
+    RankingNotModifiedError,
+    ScraperError,
+    get_amazon_kindle_ranking,
+    get_amazon_kindle_ranking_with_data,
+    get_amazon_kindle_rankings_by_category,
+    get_amazon_kindle_rankings_with_data_by_category,
+    get_response_validators,
+)
+
+# レート制限はtest_rate_limiterで確認するため、ここでは待機しないように無効にする
+_rate_limiter_patcher = patch("http_client.get_rate_limiter", return_value=None)
+
+
+def setUpModule():
+    _rate_limiter_patcher.start()
+
+
+def tearDownModule():
+    _rate_limiter_patcher.stop()
+
+
+def _build_ranking_html(titles):
+    """テスト用のランキングページHTMLを生成"""
+    cells = []
+    for i, title in enumerate(titles, 1):
+        cells.append(
+            f"""
+            <div class="_cDEzb_grid-cell_1uMOS">
+                <a class="a-link-normal aok-block"></a>
+                <div class="_cDEzb_p13n-sc-css-line-clamp-1_1Fn1y">{title}</div>
+                <span class="_cDEzb_p13n-sc-price_3mJ9Z">¥{i * 100}</span>
+                <div class="p13n-sc-uncoverable-faceout" id="ASIN{i:06d}"></div>
+            </div>
+            """
+        )
+    return f"<html>{''.join(cells)}</html>".encode()
+
+
+def _make_response(content, status_code=200, headers=None):
+    """テスト用のレスポンスを生成"""
+    response = MagicMock()
+    response.status_code = status_code
+    response.content = content
+    response.headers = headers or {}
+    response.raise_for_status = MagicMock()
+    return response
 
 
 class TestScraper(unittest.TestCase):
     """スクレイピング機能のテストクラス"""
 
+    def setUp(self):
+        """各テストの前にリトライ予算をリセットする"""
+        http_client.reset_retry_budget()
+
     def test_basic_scraping(self):
         """基本的なスクレイピング機能のテスト（実際のWebサイトにアクセス）"""
         print("\n=== 基本的なスクレイピングテスト ===")
@@ -117,7 +172,7 @@ class TestScraper(unittest.TestCase):
         except Exception as e:
             self.fail(f"データ形式のテストが失敗: {str(e)}")
 
-    @patch("scraper.requests.get")
+    @patch("requests.Session.request")
     def test_retry_mechanism(self, mock_get):
         """リトライ機能のテスト"""
         print("\n=== リトライ機能のテスト ===")
@@ -163,7 +218,7 @@ class TestScraper(unittest.TestCase):
         except Exception as e:
             self.fail(f"リトライ機能のテストが失敗: {str(e)}")
 
-    @patch("scraper.requests.get")
+    @patch("requests.Session.request")
     def test_error_handling(self, mock_get):
         """エラーハンドリングのテスト"""
         print("\n=== エラーハンドリングのテスト ===")
@@ -200,6 +255,323 @@ class TestScraper(unittest.TestCase):
             self.fail(f"パフォーマンステストが失敗: {str(e)}")
 
 
+class TestMultiCategoryScraping(unittest.TestCase):
+    """複数カテゴリ並行取得のテストクラス"""
+
+    @patch("requests.Session.request")
+    def test_results_keyed_by_category(self, mock_get):
+        """カテゴリキーごとに結果が返ることを確認"""
+        pages = {
+            "https://www.amazon.co.jp/gp/bestsellers/digital-text/111/": _build_ranking_html(["A1", "A2"]),
+            "https://www.amazon.co.jp/gp/bestsellers/digital-text/222/": _build_ranking_html(["B1", "B2"]),
+        }
+        mock_get.side_effect = lambda method, url, **kwargs: _make_response(pages[url])
+
+        result = get_amazon_kindle_rankings_by_category(list(pages), limit=1)
+
+        self.assertEqual(list(result), ["111", "222"])
+        self.assertEqual([book.title for book in result["111"]], ["A1"])
+        self.assertEqual([book.title for book in result["222"]], ["B1"])
+
+        ranking_text, ranking_data = get_amazon_kindle_rankings_with_data_by_category(list(pages), limit=1)["222"]
+        self.assertEqual([item["title"] for item in ranking_data], ["B1"])
+        self.assertIn("B1", ranking_text)
+
+    @patch("requests.Session.request")
+    def test_failed_category_is_skipped(self, mock_get):
+        """一部カテゴリの失敗は結果から除外されることを確認"""
+        import requests
+
+        def side_effect(method, url, **kwargs):
+            if "222" in url:
+                raise requests.exceptions.RequestException("取得失敗")
+            return _make_response(_build_ranking_html(["A1"]))
+
+        mock_get.side_effect = side_effect
+
+        urls = [
+            "https://www.amazon.co.jp/gp/bestsellers/digital-text/111/",
+            "https://www.amazon.co.jp/gp/bestsellers/digital-text/222/",
+        ]
+        result = get_amazon_kindle_rankings_by_category(urls, limit=1, max_retries=1)
+
+        self.assertEqual(list(result), ["111"])
+
+    @patch("requests.Session.request")
+    def test_all_categories_failed(self, mock_get):
+        """すべてのカテゴリが失敗した場合はScraperErrorになることを確認"""
+        import requests
+
+        mock_get.side_effect = requests.exceptions.RequestException("取得失敗")
+
+        with self.assertRaises(ScraperError):
+            get_amazon_kindle_rankings_by_category(
+                ["https://www.amazon.co.jp/gp/bestsellers/digital-text/111/"], limit=1, max_retries=1
+            )
+
+    @patch("scraper.config")
+    @patch("requests.Session.request")
+    def test_per_host_concurrency_limit(self, mock_get, mock_config):
+        """ホストごとの同時接続数の上限が守られることを確認"""
+        mock_config.max_concurrent_requests = 8
+        mock_config.max_requests_per_host = 2
+        mock_config.request_timeout = 10
+        mock_config.snapshot_archive_dir = ""
+        mock_config.streaming_parse = False
+
+        lock = threading.Lock()
+        active = 0
+        peak = 0
+
+        def side_effect(method, url, **kwargs):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            return _make_response(_build_ranking_html(["A1"]))
+
+        mock_get.side_effect = side_effect
+
+        urls = [f"https://test.example.com/gp/bestsellers/digital-text/{i}/" for i in range(6)]
+        with patch("scraper._host_semaphores", {}):
+            result = get_amazon_kindle_rankings_by_category(urls, limit=1)
+
+        self.assertEqual(len(result), 6)
+        self.assertLessEqual(peak, 2)
+        self.assertGreaterEqual(peak, 2)
+
+
+class TestRankingPagination(unittest.TestCase):
+    """ランキングの複数ページ取得のテストクラス"""
+
+    @patch("requests.Session.request")
+    def test_pages_merged_with_global_rank(self, mock_get):
+        """2ページ目の書籍に通し順位が付くことを確認"""
+        requested_urls = []
+
+        def side_effect(method, url, **kwargs):
+            requested_urls.append(url)
+            prefix = "P2-" if "pg=2" in url else "P1-"
+            return _make_response(_build_ranking_html([f"{prefix}{i}" for i in range(1, 51)]))
+
+        mock_get.side_effect = side_effect
+
+        _, data = get_amazon_kindle_ranking_with_data(limit=60)
+
+        self.assertEqual(len(data), 60)
+        self.assertEqual([item["rank"] for item in data], list(range(1, 61)))
+        self.assertEqual(data[49]["title"], "P1-50")
+        self.assertEqual(data[50]["title"], "P2-1")
+        self.assertEqual(data[59]["title"], "P2-10")
+        self.assertEqual(len(requested_urls), 2)
+
+    @patch("requests.Session.request")
+    def test_unparsed_cell_does_not_extend_past_limit(self, mock_get):
+        """1ページ目に解析できないセルがあっても、2ページ目からlimit位を超えて取得しないことを確認"""
+        first_page = _build_ranking_html([f"P1-{i}" for i in range(1, 51)])
+        # 3位のセルは商品リンクがなく解析できない（取り扱いのない商品など）
+        first_page = re.sub(rb'<a class="a-link-normal aok-block"></a>(\s*<div[^>]*>P1-3<)', rb"\1", first_page)
+
+        def side_effect(method, url, **kwargs):
+            if "pg=2" in url:
+                return _make_response(_build_ranking_html([f"P2-{i}" for i in range(1, 51)]))
+            return _make_response(first_page)
+
+        mock_get.side_effect = side_effect
+
+        _, data = get_amazon_kindle_ranking_with_data(limit=60)
+
+        self.assertEqual(len(data), 59)
+        self.assertEqual(data[-1]["rank"], 60)
+        self.assertEqual(data[-1]["title"], "P2-10")
+
+    @patch("requests.Session.request")
+    def test_single_page_when_limit_fits(self, mock_get):
+        """1ページに収まる件数なら2ページ目を取得しないことを確認"""
+        mock_get.return_value = _make_response(_build_ranking_html([f"T{i}" for i in range(1, 51)]))
+
+        _, data = get_amazon_kindle_ranking_with_data(limit=50)
+
+        self.assertEqual(len(data), 50)
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch("requests.Session.request")
+    def test_missing_second_page_returns_first_page(self, mock_get):
+        """2ページ目が存在しない場合は1ページ目の分だけ返すことを確認"""
+
+        def side_effect(method, url, **kwargs):
+            if "pg=2" in url:
+                return _make_response(b"<html></html>")
+            return _make_response(_build_ranking_html([f"T{i}" for i in range(1, 51)]))
+
+        mock_get.side_effect = side_effect
+
+        _, data = get_amazon_kindle_ranking_with_data(limit=100)
+
+        self.assertEqual(len(data), 50)
+
+
+class TestConditionalRequest(unittest.TestCase):
+    """条件付きリクエストのテストクラス"""
+
+    URL = "https://www.amazon.co.jp/gp/bestsellers/digital-text/2275256051/"
+
+    @patch("requests.Session.request")
+    def test_validators_recorded(self, mock_get):
+        """レスポンスのETag/Last-Modifiedが記録されることを確認"""
+        mock_get.return_value = _make_response(
+            _build_ranking_html(["A1"]),
+            headers={"ETag": '"v1"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"},
+        )
+
+        get_amazon_kindle_ranking_with_data(limit=1)
+
+        self.assertEqual(
+            get_response_validators()[self.URL],
+            {"etag": '"v1"', "last_modified": "Wed, 01 Jan 2025 00:00:00 GMT"},
+        )
+
+    @patch("requests.Session.request")
+    def test_not_modified(self, mock_get):
+        """304が返った場合にRankingNotModifiedErrorになり、条件付きヘッダーが送られることを確認"""
+        response = MagicMock()
+        response.status_code = 304
+        mock_get.return_value = response
+
+        with self.assertRaises(RankingNotModifiedError):
+            get_amazon_kindle_ranking_with_data(limit=1, validators={self.URL: {"etag": '"v1"'}})
+
+        headers = mock_get.call_args.kwargs["headers"]
+        self.assertEqual(headers["If-None-Match"], '"v1"')
+        self.assertNotIn("If-Modified-Since", headers)
+
+
+class TestBlockPageDetection(unittest.TestCase):
+    """ブロックページの検出とサーキットブレーカーのテストクラス"""
+
+    BLOCK_PAGE = (
+        b'<html><form method="get" action="/errors/validateCaptcha">'
+        b'<input type="text" id="captchacharacters" name="field-keywords"></form></html>'
+    )
+
+    def setUp(self):
+        self.patchers = [patch("circuit_breaker._breakers", {}), patch("scraper._archive_response")]
+        for patcher in self.patchers:
+            patcher.start()
+        http_client.reset_retry_budget()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    @patch("scraper._make_soup")
+    @patch("requests.Session.request")
+    def test_block_page_opens_circuit(self, mock_get, mock_make_soup):
+        """ブロックページは解析せずにBlockedPageErrorになり、以降のリクエストを送らないことを確認"""
+        mock_get.return_value = _make_response(self.BLOCK_PAGE)
+
+        with self.assertRaises(BlockedPageError):
+            get_amazon_kindle_ranking_with_data(limit=1)
+        with self.assertRaises(CircuitOpenError):
+            get_amazon_kindle_ranking_with_data(limit=1)
+
+        self.assertEqual(mock_get.call_count, 1)
+        mock_make_soup.assert_not_called()
+
+    @patch("requests.Session.request")
+    def test_circuit_recovers_after_cooldown(self, mock_get):
+        """クールダウン後の試行が成功すれば通常どおり取得できることを確認"""
+        mock_get.side_effect = [
+            _make_response(self.BLOCK_PAGE),
+            _make_response(_build_ranking_html(["A1"])),
+        ]
+
+        with self.assertRaises(BlockedPageError):
+            get_amazon_kindle_ranking_with_data(limit=1)
+
+        with patch("circuit_breaker.time.monotonic", return_value=time.monotonic() + 3600):
+            _, ranking_data = get_amazon_kindle_ranking_with_data(limit=1)
+
+        self.assertEqual(ranking_data[0]["title"], "A1")
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch("requests.Session.request")
+    def test_block_page_with_error_status(self, mock_get):
+        """エラーステータスで返されたブロックページも検出し、リトライせずに1回で止めることを確認"""
+        mock_get.return_value = _make_response(
+            "<html><p>お客様がロボットでないことを確認させていただく必要があります。</p></html>".encode(), 503
+        )
+
+        with patch("http_client.time.sleep"), self.assertRaises(BlockedPageError):
+            get_amazon_kindle_ranking_with_data(limit=1)
+        self.assertEqual(mock_get.call_count, 1)
+
+
+class TestStreamingParse(unittest.TestCase):
+    """ストリーミング解析のテストクラス"""
+
+    def setUp(self):
+        self.patchers = [
+            patch("scraper.config.streaming_parse", True),
+            patch("scraper.config.snapshot_archive_dir", ""),
+            patch("circuit_breaker._breakers", {}),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        http_client.reset_retry_budget()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    @patch("requests.Session.request")
+    def test_stream_closed_after_limit(self, mock_get):
+        """limit件を取得した時点で受信を打ち切り、接続を閉じることを確認"""
+        content = _build_ranking_html([f"本{i}" for i in range(1, 31)])
+        chunk_size = 256
+        consumed = []
+
+        def iter_content(chunk_size=1):
+            for i in range(0, len(content), chunk_size):
+                consumed.append(i)
+                yield content[i : i + chunk_size]
+
+        response = MagicMock()
+        response.status_code = 200
+        response.headers = {}
+        response.encoding = "utf-8"
+        response.iter_content.side_effect = lambda chunk_size: iter_content(chunk_size)
+        mock_get.return_value = response
+
+        _, ranking_data = get_amazon_kindle_ranking_with_data(limit=3)
+
+        self.assertEqual([item["title"] for item in ranking_data], ["本1", "本2", "本3"])
+        self.assertEqual(mock_get.call_args.kwargs["stream"], True)
+        response.close.assert_called_once()
+        self.assertLess(len(consumed) * chunk_size, len(content))
+
+    @patch("requests.Session.request")
+    def test_encoding_without_charset_header(self, mock_get):
+        """Content-Typeにcharsetがない場合は<meta charset>、それもなければUTF-8で日本語のタイトルを読めることを確認"""
+        utf8_page = _build_ranking_html(["本1"])
+        sjis_page = utf8_page.decode().replace("<html>", '<html><head><meta charset="Shift_JIS"></head>', 1)
+        for content in [utf8_page, sjis_page.encode("shift_jis")]:
+            response = MagicMock()
+            response.status_code = 200
+            response.headers = {"Content-Type": "text/html"}
+            # requestsはcharsetのないtext/htmlをISO-8859-1とみなす
+            response.encoding = "ISO-8859-1"
+            response.iter_content.return_value = iter([content])
+            mock_get.return_value = response
+
+            _, ranking_data = get_amazon_kindle_ranking_with_data(limit=1)
+
+            self.assertEqual(ranking_data[0]["title"], "本1")
+
+
 if __name__ == "__main__":
     # テスト実行
     unittest.main(verbosity=2)
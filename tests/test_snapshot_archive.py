@@ -0,0 +1,82 @@
+"""
+ページ保存機能のテスト
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from snapshot_archive import SnapshotNotFoundError, archive_page, load_snapshot, read_manifest, resolve_snapshot
+
+
+class TestSnapshotArchive(unittest.TestCase):
+    """ページ保存機能のテストクラス"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.archive_dir = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_archive_and_load(self):
+        """保存したページをダイジェストで読み込めることを確認"""
+        content = "<html>ランキング</html>".encode()
+        digest = archive_page(self.archive_dir, "https://example.com/ranking", content)
+
+        self.assertEqual(load_snapshot(self.archive_dir, digest), content)
+        self.assertEqual(load_snapshot(self.archive_dir, digest[:8]), content)
+
+    def test_same_content_stored_once(self):
+        """同じ内容は1ファイルだけ保存され、マニフェストには取得ごとに記録されることを確認"""
+        content = b"<html>same</html>"
+        archive_page(self.archive_dir, "https://example.com/a", content)
+        archive_page(self.archive_dir, "https://example.com/b", content)
+
+        snapshot_files = [name for name in os.listdir(self.archive_dir) if name.endswith(".html.gz")]
+        self.assertEqual(len(snapshot_files), 1)
+
+        records = read_manifest(self.archive_dir)
+        self.assertEqual([record.url for record in records], ["https://example.com/a", "https://example.com/b"])
+        self.assertEqual(records[0].size, len(content))
+
+    def test_latest(self):
+        """latestで最後に取得したページを読み込めることを確認"""
+        archive_page(self.archive_dir, "https://example.com/ranking", b"<html>old</html>")
+        archive_page(self.archive_dir, "https://example.com/ranking", b"<html>new</html>")
+
+        self.assertEqual(load_snapshot(self.archive_dir, "latest"), b"<html>new</html>")
+
+    def test_latest_for_url(self):
+        """URLを指定した場合、latestは後から取得した2ページ目ではなく指定したURLのページになることを確認"""
+        archive_page(self.archive_dir, "https://example.com/ranking", b"<html>page1</html>")
+        archive_page(self.archive_dir, "https://example.com/ranking?pg=2", b"<html>page2</html>")
+
+        self.assertEqual(
+            load_snapshot(self.archive_dir, "latest", url="https://example.com/ranking"), b"<html>page1</html>"
+        )
+        with self.assertRaises(SnapshotNotFoundError):
+            resolve_snapshot(self.archive_dir, "latest", url="https://example.com/other")
+
+    def test_plain_file_path(self):
+        """圧縮されていないHTMLファイルのパスも指定できることを確認"""
+        path = os.path.join(self.archive_dir, "page.html")
+        with open(path, "wb") as f:
+            f.write(b"<html>plain</html>")
+
+        self.assertEqual(load_snapshot(None, path), b"<html>plain</html>")
+
+    def test_not_found(self):
+        """存在しないスナップショットを指定した場合のエラーを確認"""
+        with self.assertRaises(SnapshotNotFoundError):
+            resolve_snapshot(self.archive_dir, "deadbeef")
+        with self.assertRaises(SnapshotNotFoundError):
+            resolve_snapshot(self.archive_dir, "latest")
+
+
+if __name__ == "__main__":
+    unittest.main()
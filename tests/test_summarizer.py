@@ -0,0 +1,479 @@
+"""
+Gemini要約機能のテスト
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, Mock, patch
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+import summarizer
+from summarizer import (
+    LATENCY_BUCKETS,
+    CategorySummaryRequest,
+    LatencyHistogram,
+    agenerate_category_summaries,
+    generate_category_summaries,
+    generate_first_ranking_summary,
+    generate_ranking_changes_summary,
+    get_latency_histograms,
+    get_summary_cache_stats,
+)
+
+RANKINGS = [
+    {"rank": 1, "title": "テスト書籍", "url": "https://www.amazon.co.jp/dp/B000000001"},
+    {"rank": 2, "title": "別の書籍", "url": "https://www.amazon.co.jp/dp/B000000002"},
+]
+CHANGES = {"new_entries": [{"title": "テスト書籍", "rank": 1}], "rank_changes": [], "dropped_out": []}
+
+
+def _response(text):
+    response = Mock()
+    response.text = text
+    response.usage_metadata = None
+    return response
+
+
+class _GeminiStubHandler(BaseHTTPRequestHandler):
+    """Gemini APIのgenerateContentを模したテスト用のハンドラー（モデルごとに遅延と失敗を設定できる）"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        # /v1beta/models/<モデル>:generateContent
+        model = self.path.split("/models/", 1)[1].split(":", 1)[0]
+        self.server.requests.append(model)
+        self.server.bodies.append(request)
+        delay, fail = self.server.behaviors.get(model, (0.0, False))
+        time.sleep(delay)
+
+        if fail:
+            status, data = 500, {"error": {"code": 500, "message": "stub error", "status": "INTERNAL"}}
+        elif request.get("generationConfig", {}).get("responseMimeType") == "application/json":
+            parts = [{"text": self.server.json_text}]
+            status, data = 200, {"candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP"}]}
+        else:
+            parts = [{"text": f"📚 {model}の要約"}]
+            status, data = 200, {"candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP"}]}
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 取り消された呼び出し
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _SummarizerTestCase(unittest.TestCase):
+    """設定・キャッシュ・クライアントを差し替えるテストの基底クラス"""
+
+    # Gemini APIのクライアントをモックに差し替えるか（Falseの場合はスタブサーバーに接続する）
+    mock_client = True
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        config_patcher = patch("summarizer.config")
+        self.mock_config = config_patcher.start()
+        self.addCleanup(config_patcher.stop)
+        self.mock_config.enable_gemini_summary = True
+        self.mock_config.gemini_api_key = "test-key"
+        self.mock_config.gemini_model = "gemini-2.5-pro"
+        self.mock_config.gemini_summary_ranking_limit = 5
+        self.mock_config.summary_cache_file = os.path.join(self.temp_dir.name, "summary_cache.json")
+        self.mock_config.summary_cache_ttl_hours = 24
+        self.mock_config.summary_cache_max_entries = 10
+        self.mock_config.gemini_prompt_token_budget = 1500
+        self.mock_config.gemini_fallback_model = ""
+        self.mock_config.gemini_latency_budget_seconds = 30.0
+        self.mock_config.gemini_base_url = ""
+        self.mock_config.gemini_max_concurrent_requests = 4
+        self.mock_config.gemini_batch_summaries = False
+
+        for name in ("_response_cache", "_client", "_client_settings", "_budget_started", "_loop", "_loop_thread"):
+            patcher = patch(f"summarizer.{name}", None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        histograms_patcher = patch("summarizer._latency_histograms", {})
+        histograms_patcher.start()
+        self.addCleanup(histograms_patcher.stop)
+
+        if self.mock_client:
+            client_patcher = patch("summarizer.genai.Client")
+            self.mock_client_class = client_patcher.start()
+            self.addCleanup(client_patcher.stop)
+            self.generate_content = AsyncMock(return_value=_response("📚 要約"))
+            self.mock_client_class.return_value.aio.models.generate_content = self.generate_content
+            self.mock_client_class.return_value.aio.aclose = AsyncMock()
+        # 同期版用のイベントループとクライアントを閉じる
+        self.addCleanup(summarizer.close_client)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
+class TestSummaryCache(_SummarizerTestCase):
+    """要約のキャッシュのテストクラス"""
+
+    def test_cache_hit_skips_api(self):
+        """同じプロンプトの2回目はAPIを呼び出さずにキャッシュを返すことを確認"""
+        first = generate_ranking_changes_summary(CHANGES, RANKINGS)
+        second = generate_ranking_changes_summary(CHANGES, RANKINGS)
+
+        self.assertEqual(first, "📚 要約")
+        self.assertEqual(second, "📚 要約")
+        self.generate_content.assert_called_once()
+        self.assertEqual(get_summary_cache_stats(), {"hits": 1, "misses": 1, "entries": 1})
+
+    def test_cache_persists_across_runs(self):
+        """キャッシュがファイルに保存され、次の実行（再実行）でも使われることを確認"""
+        generate_first_ranking_summary(RANKINGS)
+
+        with patch("summarizer._response_cache", None):
+            self.assertEqual(generate_first_ranking_summary(RANKINGS), "📚 要約")
+        self.generate_content.assert_called_once()
+
+    def test_key_includes_model_and_prompt(self):
+        """モデルやプロンプトが変わった場合はAPIを呼び出すことを確認"""
+        generate_first_ranking_summary(RANKINGS)
+        generate_first_ranking_summary([{"rank": 1, "title": "違う書籍"}])
+        self.mock_config.gemini_model = "gemini-2.5-flash"
+        generate_first_ranking_summary(RANKINGS)
+
+        self.assertEqual(self.generate_content.call_count, 3)
+
+    def test_failed_response_not_cached(self):
+        """空の応答はキャッシュせず、次回は再びAPIを呼び出すことを確認"""
+        self.generate_content.return_value = _response("")
+        self.generate_content.return_value.candidates = []
+
+        self.assertIsNone(generate_first_ranking_summary(RANKINGS))
+        self.generate_content.return_value = _response("📚 要約")
+        self.assertEqual(generate_first_ranking_summary(RANKINGS), "📚 要約")
+        self.assertEqual(self.generate_content.call_count, 2)
+
+    def test_cache_only_uses_cached_summary(self):
+        """cache_only=Trueではキャッシュにある要約だけを使い、APIキーがなくてもAPIを呼び出さないことを確認"""
+        generate_first_ranking_summary(RANKINGS)
+        self.mock_config.gemini_api_key = ""
+
+        self.assertEqual(generate_first_ranking_summary(RANKINGS, cache_only=True), "📚 要約")
+        self.assertIsNone(generate_ranking_changes_summary(CHANGES, RANKINGS, cache_only=True))
+        self.generate_content.assert_called_once()
+
+    def test_cache_disabled(self):
+        """キャッシュファイルが設定されていない場合は毎回APIを呼び出すことを確認"""
+        self.mock_config.summary_cache_file = ""
+
+        generate_first_ranking_summary(RANKINGS)
+        generate_first_ranking_summary(RANKINGS)
+
+        self.assertEqual(self.generate_content.call_count, 2)
+        self.assertIsNone(summarizer._response_cache)
+
+
+class TestGeminiClient(_SummarizerTestCase):
+    """クライアントの使い回しと複数カテゴリの並行要約のテストクラス"""
+
+    def setUp(self):
+        super().setUp()
+        self.mock_config.summary_cache_file = ""
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        async def slow_generate(**kwargs):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.2)
+            self.in_flight -= 1
+            return _response(f"📚 {kwargs['contents'].strip().splitlines()[-1]}")
+
+        self.async_generate = AsyncMock(side_effect=slow_generate)
+        self.mock_client_class.return_value.aio.models.generate_content = self.async_generate
+
+    def _requests(self, count):
+        return {
+            f"category{i}": CategorySummaryRequest(
+                rankings=[{"rank": 1, "title": f"書籍{i}"}], changes_analysis=CHANGES if i % 2 else None
+            )
+            for i in range(count)
+        }
+
+    def test_client_reused(self):
+        """複数回の呼び出しで同じクライアントを使い回すことを確認"""
+        generate_first_ranking_summary(RANKINGS)
+        generate_first_ranking_summary([{"rank": 1, "title": "違う書籍"}])
+        generate_ranking_changes_summary(CHANGES, RANKINGS)
+
+        self.mock_client_class.assert_called_once_with(api_key="test-key")
+        self.assertEqual(self.async_generate.await_count, 3)
+
+    def test_prompt_from_structured_data(self):
+        """ランキングの構造化データからURLを省いたプロンプトを作成することを確認"""
+        generate_ranking_changes_summary(CHANGES, RANKINGS)
+
+        prompt = self.async_generate.call_args.kwargs["contents"]
+        self.assertIn("1位 テスト書籍\n2位 別の書籍", prompt)
+        self.assertNotIn("https://", prompt)
+
+    def test_category_summaries_run_concurrently(self):
+        """複数カテゴリの要約が並行して生成され、入力順に返ることを確認"""
+        requests = self._requests(4)
+
+        start = time.perf_counter()
+        summaries = generate_category_summaries(requests)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(list(summaries), list(requests))
+        self.assertEqual(summaries["category0"], "📚 1位 書籍0")
+        self.assertEqual(self.max_in_flight, 4)
+        # 4回分の呼び出し（0.8秒）ではなく、ほぼ1回分の時間で終わる
+        self.assertLess(elapsed, 0.6)
+        self.mock_client_class.assert_called_once()
+        # 非同期の接続は実行の最後（close_client）まで使い回し、イベントループの中で閉じる
+        aclose = self.mock_client_class.return_value.aio.aclose
+        aclose.assert_not_awaited()
+        summarizer.close_client()
+        aclose.assert_awaited_once()
+        self.assertIsNone(summarizer._loop)
+
+    def test_concurrency_limit(self):
+        """同時呼び出し数が上限を超えないことを確認"""
+        summaries = asyncio.run(agenerate_category_summaries(self._requests(5), max_concurrency=2))
+
+        self.assertEqual(len(summaries), 5)
+        self.assertEqual(self.max_in_flight, 2)
+        self.assertEqual(self.async_generate.await_count, 5)
+
+    def test_failed_category(self):
+        """一部のカテゴリで失敗しても他のカテゴリの要約を返すことを確認"""
+        self.async_generate.side_effect = [_response("📚 成功"), ValueError("失敗")]
+        self.mock_config.gemini_max_concurrent_requests = 1
+
+        summaries = asyncio.run(agenerate_category_summaries(self._requests(2)))
+
+        self.assertEqual(summaries, {"category0": "📚 成功", "category1": None})
+
+
+class TestBatchSummaries(_SummarizerTestCase):
+    """複数カテゴリの一括要約のテストクラス"""
+
+    def setUp(self):
+        super().setUp()
+        self.mock_config.summary_cache_file = ""
+        self.batch_text = ""
+
+        async def generate(**kwargs):
+            if kwargs["config"].response_mime_type == "application/json":
+                return _response(self.batch_text)
+            return _response(f"📚 個別{kwargs['contents'].strip().splitlines()[-1]}")
+
+        self.async_generate = AsyncMock(side_effect=generate)
+        self.mock_client_class.return_value.aio.models.generate_content = self.async_generate
+        self.requests = {
+            f"category{i}": CategorySummaryRequest(
+                rankings=[{"rank": 1, "title": f"書籍{i}"}], changes_analysis=CHANGES if i % 2 else None
+            )
+            for i in range(3)
+        }
+
+    def _batch(self, *items):
+        return json.dumps({"summaries": [{"category": key, "summary": text} for key, text in items]})
+
+    def test_single_call(self):
+        """全カテゴリの要約を1回の呼び出しでまとめて生成することを確認"""
+        self.batch_text = self._batch(("category2", "📚 要約2"), ("category0", "📚 要約0"), ("category1", "📚 要約1"))
+
+        summaries = generate_category_summaries(self.requests, batch=True)
+
+        self.assertEqual(summaries, {"category0": "📚 要約0", "category1": "📚 要約1", "category2": "📚 要約2"})
+        self.async_generate.assert_awaited_once()
+        kwargs = self.async_generate.call_args.kwargs
+        self.assertEqual(kwargs["config"].response_schema, summarizer.BATCH_RESPONSE_SCHEMA)
+        # 各カテゴリの変化の内容とランキングをまとめて送る
+        for key in self.requests:
+            self.assertIn(f"## カテゴリ: {key}", kwargs["contents"])
+        self.assertIn("【新規ランクイン】", kwargs["contents"])
+
+    def test_invalid_categories_retried(self):
+        """要約が空・欠けているカテゴリだけを個別に再生成することを確認"""
+        self.batch_text = self._batch(("category0", "📚 要約0"), ("category1", " "), ("unknown", "📚 他"))
+
+        summaries = asyncio.run(agenerate_category_summaries(self.requests, batch=True))
+
+        self.assertEqual(
+            summaries, {"category0": "📚 要約0", "category1": "📚 個別1位 書籍1", "category2": "📚 個別1位 書籍2"}
+        )
+        self.assertEqual(self.async_generate.await_count, 3)
+
+    def test_invalid_json_retries_all(self):
+        """応答がJSONとして解析できない場合は全カテゴリを個別に生成することを確認"""
+        self.batch_text = '{"summaries": [壊れたJSON'
+
+        summaries = asyncio.run(agenerate_category_summaries(self.requests, batch=True))
+
+        self.assertEqual(list(summaries.values()), [f"📚 個別1位 書籍{i}" for i in range(3)])
+        self.assertEqual(self.async_generate.await_count, 4)
+
+    def test_batch_setting(self):
+        """設定で一括要約を有効にでき、カテゴリが1つの場合は個別に生成することを確認"""
+        self.mock_config.gemini_batch_summaries = True
+        self.batch_text = self._batch(*((key, f"📚 {key}") for key in self.requests))
+
+        self.assertEqual(asyncio.run(agenerate_category_summaries(self.requests))["category1"], "📚 category1")
+        single = asyncio.run(agenerate_category_summaries({"category0": self.requests["category0"]}))
+        self.assertEqual(single, {"category0": "📚 個別1位 書籍0"})
+
+
+class TestHedgedRequests(_SummarizerTestCase):
+    """応答時間の予算と予備のモデルへの同時リクエストのテストクラス（スタブサーバーを使う）"""
+
+    mock_client = False
+
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _GeminiStubHandler)
+        self.server.behaviors = {}
+        self.server.requests = []
+        self.server.bodies = []
+        self.server.json_text = ""
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.mock_config.summary_cache_file = ""
+        self.mock_config.gemini_fallback_model = "gemini-2.5-flash"
+        self.mock_config.gemini_latency_budget_seconds = 0.2
+        self.mock_config.gemini_base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def test_primary_within_budget(self):
+        """メインのモデルが予算内に応答した場合は予備のモデルに依頼しないことを確認"""
+        summary = generate_first_ranking_summary(RANKINGS)
+
+        self.assertEqual(summary, "📚 gemini-2.5-proの要約")
+        self.assertEqual(self.server.requests, ["gemini-2.5-pro"])
+        self.assertEqual(get_latency_histograms()["gemini-2.5-pro"].count, 1)
+
+    def test_slow_primary_hedged(self):
+        """メインのモデルが予算を超えた場合は予備のモデルにも依頼し、先に応答した方を使うことを確認"""
+        self.server.behaviors["gemini-2.5-pro"] = (1.0, False)
+
+        start = time.perf_counter()
+        summary = generate_first_ranking_summary(RANKINGS)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(summary, "📚 gemini-2.5-flashの要約")
+        self.assertEqual(self.server.requests, ["gemini-2.5-pro", "gemini-2.5-flash"])
+        # メインのモデルの応答を待たずに、その呼び出しを取り消す
+        self.assertLess(elapsed, 0.8)
+        histograms = get_latency_histograms()
+        self.assertEqual(histograms["gemini-2.5-flash"].count, 1)
+        self.assertEqual(histograms["gemini-2.5-pro"].cancelled, 1)
+
+    def test_fallback_summary_not_cached(self):
+        """予備のモデルの要約はメインのモデルのキーでキャッシュしないことを確認"""
+        self.mock_config.summary_cache_file = os.path.join(self.temp_dir.name, "summary_cache.json")
+        self.server.behaviors["gemini-2.5-pro"] = (1.0, False)
+
+        self.assertEqual(generate_first_ranking_summary(RANKINGS), "📚 gemini-2.5-flashの要約")
+        self.assertEqual(get_summary_cache_stats()["entries"], 0)
+
+        # 次の実行（予算の計測をやり直す）ではメインのモデルに依頼し直し、その要約をキャッシュする
+        self.server.behaviors = {}
+        summarizer._budget_started = None
+        self.assertEqual(generate_first_ranking_summary(RANKINGS), "📚 gemini-2.5-proの要約")
+        self.assertEqual(get_summary_cache_stats()["entries"], 1)
+
+    def test_failed_primary_falls_back(self):
+        """メインのモデルが失敗した場合は予算を待たずに予備のモデルを使うことを確認"""
+        self.server.behaviors["gemini-2.5-pro"] = (0.0, True)
+        self.mock_config.gemini_latency_budget_seconds = 10.0
+
+        start = time.perf_counter()
+        summary = generate_first_ranking_summary(RANKINGS)
+
+        self.assertEqual(summary, "📚 gemini-2.5-flashの要約")
+        self.assertLess(time.perf_counter() - start, 5.0)
+        self.assertEqual(get_latency_histograms()["gemini-2.5-pro"].failures, 1)
+
+    def test_all_models_fail(self):
+        """すべてのモデルが失敗した場合は要約なしになることを確認"""
+        self.server.behaviors = {"gemini-2.5-pro": (0.0, True), "gemini-2.5-flash": (0.0, True)}
+
+        self.assertIsNone(generate_first_ranking_summary(RANKINGS))
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_async_loser_cancelled(self):
+        """非同期版では先に応答したモデルを使い、もう一方の呼び出しを取り消すことを確認"""
+        self.server.behaviors["gemini-2.5-pro"] = (1.0, False)
+        requests = {
+            "category0": CategorySummaryRequest(rankings=RANKINGS),
+            "category1": CategorySummaryRequest(rankings=RANKINGS, changes_analysis=CHANGES),
+        }
+
+        start = time.perf_counter()
+        summaries = generate_category_summaries(requests)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(set(summaries.values()), {"📚 gemini-2.5-flashの要約"})
+        self.assertLess(elapsed, 0.8)
+        histograms = get_latency_histograms()
+        self.assertEqual(histograms["gemini-2.5-pro"].cancelled, 2)
+        self.assertEqual(histograms["gemini-2.5-pro"].count, 0)
+        self.assertEqual(histograms["gemini-2.5-flash"].count, 2)
+
+    def test_budget_shared_across_run(self):
+        """予算は実行全体で共有し、使い切った後は最初から両方のモデルに依頼することを確認"""
+        self.server.behaviors["gemini-2.5-pro"] = (0.3, False)
+        with patch("summarizer._budget_started", time.monotonic() - 1.0):
+            summary = generate_first_ranking_summary(RANKINGS)
+
+        self.assertEqual(summary, "📚 gemini-2.5-flashの要約")
+        self.assertEqual(sorted(self.server.requests), ["gemini-2.5-flash", "gemini-2.5-pro"])
+
+    def test_batch_response_schema(self):
+        """一括要約ではJSONのスキーマを指定して依頼し、応答を解析できることを確認"""
+        self.server.json_text = json.dumps(
+            {"summaries": [{"category": "a", "summary": "📚 A"}, {"category": "b", "summary": "📚 B"}]}
+        )
+        requests = {key: CategorySummaryRequest(rankings=RANKINGS) for key in ("a", "b")}
+
+        summaries = generate_category_summaries(requests, batch=True)
+
+        self.assertEqual(summaries, {"a": "📚 A", "b": "📚 B"})
+        generation_config = self.server.bodies[0]["generationConfig"]
+        self.assertEqual(generation_config["responseMimeType"], "application/json")
+        self.assertIn("summaries", generation_config["responseSchema"]["properties"])
+
+    def test_latency_histogram(self):
+        """応答時間を区間ごとに数えることを確認"""
+        histogram = LatencyHistogram()
+        for seconds in (0.5, 1.0, 1.5, 100.0):
+            histogram.record(seconds)
+        histogram.record(3.0, failed=True)
+
+        self.assertEqual(len(histogram.counts), len(LATENCY_BUCKETS) + 1)
+        self.assertEqual(histogram.counts[:3], [2, 1, 1])
+        self.assertEqual(histogram.counts[-1], 1)
+        self.assertEqual((histogram.count, histogram.failures, histogram.max_seconds), (5, 1, 100.0))
+        self.assertEqual(histogram.format(), "≤1秒:2 ≤2秒:1 ≤5秒:1 >60秒:1")
+
+
+if __name__ == "__main__":
+    unittest.main()